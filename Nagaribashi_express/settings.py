@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.instrumentation.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'Nagaribashi_express.urls'
@@ -160,3 +161,61 @@ X_FRAME_OPTIONS = 'DENY'
 # Currency Settings
 CURRENCY_SYMBOL = '৳'
 CURRENCY_CODE = 'BDT'
+
+# Stock Reservation Settings
+STOCK_RESERVATION_TTL = 15 * 60  # seconds a cart holds stock
+CATALOG_CACHE_TIMEOUT = 60 * 60  # seconds a cached catalog page lives
+
+# Order Archive Settings
+ORDER_ARCHIVE_AFTER_DAYS = 365  # days a finished order stays in the live tables
+
+# Order Timeline Settings
+ORDER_TIMELINE_TIMEOUT = 10 * 60  # seconds a cached order timeline lives without writes
+
+# Dashboard Settings
+DASHBOARD_STATS_TIMEOUT = 30  # seconds dashboard figures are served from the cache, and the least between staff stats pushes
+ANALYTICS_MAX_POINTS = 400  # most points sent per chart series; longer ranges are bucketed more coarsely
+
+# Event Stream Settings
+EVENT_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+EVENT_STREAM_QUEUE_SIZE = 100  # events held for a slow stream before it is sent a fresh state instead
+EVENT_STREAM_RETRY = 30  # seconds browsers wait to reconnect when served over WSGI, which closes every stream
+
+# Notification Settings
+NOTIFICATION_COUNTER_TIMEOUT = 60 * 60  # seconds a cached unread count is kept before it is counted again
+
+# Scheduled Delivery Settings
+SCHEDULED_RELEASE_LEAD_MINUTES = 60  # minutes before the slot a scheduled order is released
+
+# Idempotency Key Settings
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds a stored response is replayed
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds before an unfinished request's key can be taken over
+IDEMPOTENCY_WAIT_TIMEOUT = 5  # seconds a duplicate waits for the first response
+
+# Payment Callback Settings
+# Shared secrets the gateways sign their callbacks with; callbacks of a gateway without one are refused
+PAYMENT_CALLBACK_SECRETS = {
+    'bkash': os.environ.get('BKASH_CALLBACK_SECRET', ''),
+    'nagad': os.environ.get('NAGAD_CALLBACK_SECRET', ''),
+    'rocket': os.environ.get('ROCKET_CALLBACK_SECRET', ''),
+}
+
+# Query Instrumentation Settings
+# QUERY_INSTRUMENTATION defaults to DEBUG: log query count/time per view
+QUERY_N_PLUS_ONE_THRESHOLD = 5  # identical SQL shapes per request flagged as N+1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'dashboard.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
@@ -34,14 +34,14 @@ class AnalyticsDataAdmin(admin.ModelAdmin):
     """
     Analytics Data Admin
     """
-    list_display = ('metric_type', 'date', 'value', 'created_at')
-    list_filter = ('metric_type', 'date', 'created_at')
-    search_fields = ('metric_type',)
+    list_display = ('metric_type', 'dimension', 'granularity', 'date', 'bucket', 'value', 'created_at')
+    list_filter = ('metric_type', 'granularity', 'date', 'created_at')
+    search_fields = ('metric_type', 'dimension')
     readonly_fields = ('created_at',)
     
     fieldsets = (
         (_('মেট্রিক তথ্য'), {
-            'fields': ('metric_type', 'date', 'value')
+            'fields': ('metric_type', 'dimension', 'granularity', 'bucket', 'date', 'value')
         }),
         (_('মেটাডেটা'), {
             'fields': ('metadata',),
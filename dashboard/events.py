@@ -0,0 +1,321 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from delivery.models import DeliveryAssignment, DeliveryStatus
+from orders.archive import order_customer
+from orders.models import Order
+from payments.models import Payment
+
+from . import stats
+
+STAFF = 'staff'
+
+# Put on a subscription's queue in place of the events it fell too far behind on
+RESYNC = object()
+
+HEARTBEAT = b': ping\n\n'
+
+# How soon a browser reconnects after an open stream drops, in milliseconds
+RECONNECT_DELAY = 3000
+
+DELIVERY_STATUS_LABELS = dict(DeliveryStatus.STATUS_CHOICES)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+
+
+def queue_size():
+    return getattr(settings, 'EVENT_STREAM_QUEUE_SIZE', 100)
+
+
+def poll_interval():
+    """
+    How long a browser waits between connections when streams cannot be held open
+    """
+    return getattr(settings, 'EVENT_STREAM_RETRY', 30)
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def channels_for(user):
+    """
+    The channels ``user``'s stream listens on
+    """
+    channels = [user_channel(user.pk)]
+    if user.is_admin:
+        channels.append(STAFF)
+    return channels
+
+
+def encode(event, data):
+    """
+    One Server-Sent Events frame
+    """
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f'event: {event}\ndata: {payload}\n\n'.encode()
+
+
+def retry(milliseconds):
+    return f'retry: {milliseconds}\n\n'.encode()
+
+
+class Subscription:
+    """
+    One open stream: the channels it listens on and the frames waiting for it
+    """
+    def __init__(self, channels, loop, size):
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def put(self, frame):
+        # Runs on self.loop
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too far behind for deltas to help; start over from a fresh state
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+def _deliver(subscriptions, frame):
+    for subscription in subscriptions:
+        subscription.put(frame)
+
+
+class Hub:
+    """
+    Fans published events out to the streams open in this process.
+
+    A published event is encoded once and the same frame is queued for
+    every subscription of its channels. Streams live on an event loop while
+    writes happen in worker threads, so each loop gets one
+    ``call_soon_threadsafe`` callback per event however many of its streams
+    listen. Streams held by other processes are not reached; they catch up
+    from the full state sent whenever they reconnect.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = defaultdict(set)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def listening(self, channel):
+        return channel in self.channels
+
+    def subscribe(self, channels, size=None):
+        subscription = Subscription(channels, asyncio.get_running_loop(), size or queue_size())
+        with self.lock:
+            for channel in subscription.channels:
+                self.channels[channel].add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                listeners = self.channels.get(channel)
+                if listeners is not None:
+                    listeners.discard(subscription)
+                    if not listeners:
+                        del self.channels[channel]
+            self.count -= 1
+
+    def publish(self, channels, event, data):
+        """
+        Queue ``event`` for every stream listening on any of ``channels``; returns how many
+        """
+        with self.lock:
+            targets = set().union(*(self.channels.get(channel, ()) for channel in channels))
+        if not targets:
+            return 0
+        frame = encode(event, data)
+        loops = defaultdict(list)
+        for subscription in targets:
+            loops[subscription.loop].append(subscription)
+        for loop, subscriptions in loops.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, subscriptions, frame)
+            except RuntimeError:
+                pass  # the loop has shut down along with its streams
+        return len(targets)
+
+
+hub = Hub()
+
+
+async def stream(user):
+    """
+    The frames of ``user``'s event stream: the full state, then deltas as they are published
+    """
+    subscription = hub.subscribe(channels_for(user))
+    state = sync_to_async(stats.dashboard_state)
+    try:
+        yield retry(RECONNECT_DELAY)
+        yield encode('state', await state(user))
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), heartbeat_interval())
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            if frame is RESYNC:
+                frame = encode('state', await state(user))
+            yield frame
+    finally:
+        hub.unsubscribe(subscription)
+
+
+# Changes made by the current transaction, per thread like the connections are
+_pending = threading.local()
+
+
+def _changed(kind, ids):
+    ids = set(ids)
+    if not ids:
+        return
+    batch = getattr(_pending, 'batch', None)
+    if batch is None:
+        batch = _pending.batch = defaultdict(set)
+    batch[kind] |= ids
+    # Every call registers the flush, so a rolled back transaction cannot
+    # leave the batch without one; the first flush to run empties it.
+    transaction.on_commit(_flush)
+
+
+def orders_changed(order_ids):
+    """
+    Publish the given orders and the figures they count towards once the transaction commits
+    """
+    _changed('orders', order_ids)
+
+
+def payments_changed(payment_ids):
+    _changed('payments', payment_ids)
+
+
+def delivery_updated(status_ids):
+    """
+    Publish the given DeliveryStatus updates once the transaction commits
+    """
+    _changed('updates', status_ids)
+
+
+def deliveries_assigned(order_ids):
+    _changed('assigned', order_ids)
+
+
+def _push_orders(ids):
+    # Dashboards list only their latest few orders, and among the changed
+    # ones only the newest few can be in such a list, so a bulk change of
+    # hundreds of orders is still one small frame per channel
+    rows = defaultdict(list)
+    for order in Order.objects.filter(pk__in=ids).order_by('-pk').only(
+        'order_number', 'customer_id', 'customer_name', 'status', 'total_amount', 'created_at'
+    ):
+        row = stats.order_row(order)
+        if len(rows[STAFF]) < stats.STAFF_RECENT_ORDERS:
+            rows[STAFF].append(row)
+        if len(rows[order.customer_id]) < stats.CUSTOMER_RECENT_ORDERS:
+            rows[order.customer_id].append(row)
+    staff = rows.pop(STAFF, None)
+    if staff:
+        hub.publish([STAFF], 'orders', staff)
+    for customer_id, customer_rows in rows.items():
+        hub.publish([user_channel(customer_id)], 'orders', customer_rows)
+    return set(rows)
+
+
+def _push_payments(ids):
+    customers = set()
+    rows = Payment.objects.filter(pk__in=ids).annotate(customer_id=order_customer()).values_list(
+        'pk', 'order_id', 'customer_id', 'status', 'amount'
+    )
+    for pk, order_id, customer_id, status, amount in rows:
+        hub.publish([STAFF, user_channel(customer_id)], 'payment',
+                    {'id': pk, 'order_id': order_id, 'status': status, 'amount': str(amount)})
+        customers.add(customer_id)
+    return customers
+
+
+def _push_delivery(order_id, customer_id, agent_id, data):
+    data['order_id'] = order_id
+    data['status_display'] = DELIVERY_STATUS_LABELS.get(data['status'], data['status'])
+    hub.publish([STAFF, user_channel(customer_id), user_channel(agent_id)], 'delivery', data)
+
+
+def _push_updates(ids):
+    rows = DeliveryStatus.objects.filter(pk__in=ids).order_by('timestamp').annotate(
+        customer_id=order_customer('delivery_assignment__order')
+    ).values_list(
+        'delivery_assignment__order_id', 'customer_id',
+        'delivery_assignment__delivery_agent_id', 'status', 'location', 'timestamp'
+    )
+    for order_id, customer_id, agent_id, status, location, timestamp in rows:
+        _push_delivery(order_id, customer_id, agent_id,
+                       {'status': status, 'location': location or '', 'timestamp': timestamp})
+    return set()
+
+
+def _push_assigned(order_ids):
+    rows = DeliveryAssignment.objects.filter(order_id__in=order_ids).annotate(
+        customer_id=order_customer()
+    ).values_list('order_id', 'customer_id', 'delivery_agent_id', 'assigned_at')
+    for order_id, customer_id, agent_id, assigned_at in rows:
+        _push_delivery(order_id, customer_id, agent_id,
+                       {'status': 'assigned', 'location': '', 'timestamp': assigned_at})
+    return set()
+
+
+PUSHERS = {
+    'orders': _push_orders,
+    'payments': _push_payments,
+    'updates': _push_updates,
+    'assigned': _push_assigned,
+}
+
+
+def _flush():
+    """
+    Publish what the committed transaction changed.
+
+    The rows are read once per kind for all listeners and the figures of
+    every listening customer come from one pair of grouped queries. Figures
+    are sent as fresh totals rather than increments, so a stream that
+    missed an event is put right by the next one. The shop figures are
+    rebuilt and sent to staff at most once per ``DASHBOARD_STATS_TIMEOUT``
+    however often orders change. Nothing is read when no stream is open.
+    """
+    batch = getattr(_pending, 'batch', None)
+    _pending.batch = None
+    if not batch:
+        return
+    if not len(hub):
+        return
+
+    customers = set()
+    for kind, ids in batch.items():
+        customers |= PUSHERS[kind](ids)
+    listening = {customer_id for customer_id in customers if hub.listening(user_channel(customer_id))}
+    stats.forget(customers - listening)
+
+    if hub.listening(STAFF):
+        figures = stats.refresh_shop_stats()
+        if figures is not None:
+            hub.publish([STAFF], 'stats', figures)
+    if listening:
+        for customer_id, figures in stats.customers_stats(listening).items():
+            hub.publish([user_channel(customer_id)], 'stats', figures)
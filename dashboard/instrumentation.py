@@ -0,0 +1,106 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+# Per-view totals for the lifetime of the process: {view: {'requests', 'queries', 'time'}}.
+# Keyed by URL pattern name only, so it cannot grow past the URLconf.
+view_stats = defaultdict(lambda: {'requests': 0, 'queries': 0, 'time': 0.0})
+
+# Where requests that matched no URL pattern are counted
+UNRESOLVED = '<unresolved>'
+
+
+def sql_shape(sql):
+    """
+    Reduce a SQL statement to its shape so repeats with other values match
+    """
+    return _NUMBER.sub('N', _IN_LIST.sub('(...)', sql))
+
+
+def n_plus_one_threshold():
+    return getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 5)
+
+
+class QueryRecorder:
+    """
+    Record every SQL statement run on a connection while the block executes
+    """
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.queries = []
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self._record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def _record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """
+        Return {shape: count} for statements repeated often enough to be an N+1
+        """
+        threshold = threshold or n_plus_one_threshold()
+        shapes = Counter(sql_shape(sql) for sql, _ in self.queries)
+        return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Log query count and time for every view and warn about N+1 patterns.
+
+    Enabled with ``QUERY_INSTRUMENTATION`` (defaults to ``DEBUG``). The numbers
+    are also returned in ``X-Query-Count`` and ``X-Query-Time`` headers.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+            # Streaming and lazily rendered responses run their queries now
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        stats = view_stats[view]
+        stats['requests'] += 1
+        stats['queries'] += recorder.count
+        stats['time'] += recorder.total_time
+
+        logger.info('%s: %d queries in %.1f ms', view, recorder.count, recorder.total_time * 1000)
+        for shape, count in recorder.repeated_shapes().items():
+            logger.warning('Possible N+1 in %s: %d x %s', view, count, shape)
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time'] = f'{recorder.total_time * 1000:.1f}ms'
+        return response
@@ -0,0 +1,125 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from dashboard import timeseries
+from dashboard.rollups import rebuild
+from orders.management.commands._bench import measure, sandbox
+from orders.models import Order
+from payments.models import Payment
+
+User = get_user_model()
+
+
+@contextmanager
+def backdated(*models):
+    """
+    Let bulk_create keep the created_at it is given instead of stamping now
+    """
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Compare the analytics chart queries on the source tables with the rollup time series'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=300000)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Calls measured per query')
+
+    def handle(self, *args, **options):
+        with sandbox():
+            self.setup(options)
+            with measure() as result:
+                rebuild(['orders', 'revenue'])
+            self.stdout.write(f"Rollups rebuilt in {result['seconds']:.2f}s")
+
+            today = timezone.localdate()
+            month_ago = today - timedelta(days=30)
+            first = today - timedelta(days=365 * options['years'])
+            self.stdout.write(f"{'query':<48} {'queries':>8} {'ms/call':>9} {'points':>7}")
+            self.run('30 days by day, .extra()', lambda: self.legacy(month_ago, today), options)
+            self.run(f"{options['years']} years by day, .extra()", lambda: self.legacy(first, today), options)
+            self.run(f"{options['years']} years by month, source tables", lambda: self.live_months(first), options)
+            for label, start, granularity in (
+                ('30 days by day', month_ago, 'day'),
+                ('7 days by hour', today - timedelta(days=7), 'hour'),
+                ('30 days by hour, served by day', month_ago, 'hour'),
+                ('1 year by week', today - timedelta(days=365), 'week'),
+                (f"{options['years']} years by day, served by week", first, 'day'),
+                (f"{options['years']} years by month", first, 'month'),
+            ):
+                self.run(f'{label}, rollups', lambda: self.series(start, today, granularity), options)
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all data rolled back'))
+
+    def setup(self, options):
+        rnd = random.Random(42)
+        now = timezone.now()
+        window = options['years'] * 365 * 24 * 60
+        customer = User.objects.create_user(username='bench_series', password='!', phone_number='01900009999')
+        with backdated(Order, Payment):
+            orders = Order.objects.bulk_create([
+                Order(order_number=f'SER{i:010d}', customer=customer, delivery_address='Bench',
+                      total_amount=Decimal('250.00'), created_at=now - timedelta(minutes=rnd.randrange(window)))
+                for i in range(options['orders'])
+            ], batch_size=2000)
+            Payment.objects.bulk_create([
+                Payment(order=order, payment_method='bkash', amount=order.total_amount,
+                        status='completed' if rnd.random() < 0.8 else 'failed', created_at=order.created_at)
+                for order in orders
+            ], batch_size=2000)
+        self.stdout.write(f"{len(orders)} orders over {options['years']} years")
+
+    def run(self, label, call, options):
+        queries, seconds = 0, 0.0
+        for _ in range(options['repeat']):
+            reset_queries()  # a full query log would hide the count
+            with measure() as result:
+                points = call()
+            queries += result['queries']
+            seconds += result['seconds']
+        self.stdout.write(
+            f"{label:<48} {queries / options['repeat']:>8.1f} "
+            f"{seconds * 1000 / options['repeat']:>9.2f} {points:>7}"
+        )
+
+    def legacy(self, start, end):
+        # What AnalyticsView ran on every load before the time series layer
+        orders = Order.objects.filter(created_at__date__range=[start, end]).extra(
+            select={'day': 'date(created_at)'}
+        ).values('day').annotate(count=Count('id')).order_by('day')
+        revenue = Payment.objects.filter(status='completed', created_at__date__range=[start, end]).extra(
+            select={'day': 'date(created_at)'}
+        ).values('day').annotate(total=Sum('amount')).order_by('day')
+        return len(list(orders)) + len(list(revenue))
+
+    def live_months(self, start):
+        tz = timezone.get_default_timezone()
+        orders = Order.objects.filter(created_at__date__gte=start).annotate(
+            month=TruncMonth('created_at', tzinfo=tz)
+        ).values('month').annotate(count=Count('id')).order_by('month')
+        revenue = Payment.objects.filter(status='completed', created_at__date__gte=start).annotate(
+            month=TruncMonth('created_at', tzinfo=tz)
+        ).values('month').annotate(total=Sum('amount')).order_by('month')
+        return len(list(orders)) + len(list(revenue))
+
+    def series(self, start, end, granularity):
+        return sum(
+            len(timeseries.series(name, start, end, granularity)['points']) for name in ('orders', 'revenue')
+        )
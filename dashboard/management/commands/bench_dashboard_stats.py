@@ -0,0 +1,122 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from dashboard.rollups import rebuild
+from dashboard.stats import customer_stats, shop_stats
+from orders.management.commands._bench import sandbox, measure
+from orders.models import Order, ProductService
+from payments.models import Payment
+
+User = get_user_model()
+
+STATUSES = ('pending', 'confirmed', 'processing', 'dispatched', 'delivered', 'cancelled')
+
+
+class Command(BaseCommand):
+    help = 'Compare the dashboard statistics queries before and after the shared statistics service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='Window the orders are spread over')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Calls measured per method')
+
+    def handle(self, *args, **options):
+        with sandbox():
+            customer = self.setup(options)
+            with measure() as result:
+                rebuild()
+            self.stdout.write(f"Rollups rebuilt in {result['seconds']:.2f}s")
+
+            self.stdout.write(f"{'figures':<10} {'method':<14} {'queries':>8} {'ms/call':>9}")
+            self.run('admin', 'live queries', self.legacy_shop, options)
+            self.run('admin', 'service cold', lambda: (cache.clear(), shop_stats()), options)
+            self.run('admin', 'service warm', shop_stats, options)
+            self.run('customer', 'live queries', lambda: self.legacy_customer(customer), options)
+            self.run('customer', 'service cold', lambda: (cache.clear(), customer_stats(customer)), options)
+            self.run('customer', 'service warm', lambda: customer_stats(customer), options)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all data rolled back'))
+
+    def setup(self, options):
+        rnd = random.Random(42)
+        now = timezone.now()
+        window = options['days'] * 24 * 60
+        customers = User.objects.bulk_create([
+            User(username=f'bench_stats_{i}', password='!', phone_number=f'0190000{i:04d}',
+                 date_joined=now - timedelta(minutes=rnd.randrange(window)))
+            for i in range(options['customers'])
+        ])
+        ProductService.objects.bulk_create([
+            ProductService(name=f'Bench {i}', description='', category='food', price=Decimal('10.00'),
+                           is_available=i % 4 != 0)
+            for i in range(100)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(order_number=f'STATS{i:010d}', customer=rnd.choice(customers), delivery_address='Bench',
+                  total_amount=Decimal('250.00'), status=rnd.choice(STATUSES))
+            for i in range(options['orders'])
+        ], batch_size=2000)
+        payments = Payment.objects.bulk_create([
+            Payment(order=order, payment_method='bkash', amount=order.total_amount,
+                    status='completed' if rnd.random() < 0.8 else 'failed')
+            for order in orders
+        ], batch_size=2000)
+        # auto_now_add gives every row the same timestamp; spread them over the window
+        step = window // (len(orders) // 1000 + 1)
+        for model, rows in ((Order, orders), (Payment, payments)):
+            for start in range(0, len(rows), 1000):
+                model.objects.filter(pk__in=[row.pk for row in rows[start:start + 1000]]).update(
+                    created_at=now - timedelta(minutes=start // 1000 * step)
+                )
+        return rnd.choice(customers)
+
+    def run(self, figures, method, call, options):
+        queries, seconds = 0, 0.0
+        for _ in range(options['repeat']):
+            with measure() as result:
+                call()
+            queries += result['queries']
+            seconds += result['seconds']
+        self.stdout.write(
+            f"{figures:<10} {method:<14} {queries / options['repeat']:>8.1f} "
+            f"{seconds * 1000 / options['repeat']:>9.2f}"
+        )
+
+    def legacy_shop(self):
+        # What the admin dashboard ran on every load before the service
+        today = timezone.now().date()
+        completed = Payment.objects.filter(status='completed')
+        return [
+            Order.objects.count(),
+            Order.objects.filter(status='pending').count(),
+            Order.objects.filter(status='delivered').count(),
+            Order.objects.filter(status='cancelled').count(),
+            completed.aggregate(total=Sum('amount'))['total'],
+            completed.filter(created_at__date__gte=today - timedelta(days=7)).aggregate(total=Sum('amount'))['total'],
+            completed.filter(created_at__date__gte=today - timedelta(days=30)).aggregate(total=Sum('amount'))['total'],
+            User.objects.filter(user_type='customer').count(),
+            User.objects.filter(user_type='customer', date_joined__date__gte=today - timedelta(days=7)).count(),
+            ProductService.objects.count(),
+            ProductService.objects.filter(is_available=True).count(),
+        ]
+
+    def legacy_customer(self, user):
+        # What the customer dashboard ran on every load before the service
+        orders = Order.objects.filter(customer=user)
+        return [
+            orders.count(),
+            orders.filter(status='pending').count(),
+            orders.filter(status='delivered').count(),
+            orders.filter(status='cancelled').count(),
+            Payment.objects.filter(order__customer=user, status='completed').aggregate(total=Sum('amount'))['total'],
+        ]
@@ -0,0 +1,176 @@
+import asyncio
+import resource
+import statistics
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from dashboard import events
+from dashboard.stats import dashboard_state
+from orders.management.commands._bench import scratch_database
+from orders.models import Order
+from orders.transitions import bulk_transition
+
+User = get_user_model()
+
+
+class Connection:
+    """
+    One browser tab holding the event stream open against the ASGI application
+    """
+    def __init__(self, app, path, cookie):
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream'), (b'cookie', cookie)],
+        }
+        self.app = app
+        self.closed = asyncio.Event()
+        self.frames = asyncio.Queue()
+        self.status = None
+        self.requested = False
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message.get('body'):
+            self.frames.put_nowait((time.perf_counter(), message['body']))
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.app(self.scope, self.receive, self.send))
+
+    async def expect(self, event):
+        # Skip the retry field and heartbeats up to the next frame of ``event``
+        while True:
+            at, frame = await self.frames.get()
+            if frame.startswith(f'event: {event}\n'.encode()):
+                return at
+
+
+class Command(BaseCommand):
+    help = 'Hold thousands of idle event streams open and time how fast writes reach them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--customers', type=int, default=200,
+                            help='Customers among the connections; the rest are staff tabs')
+        parser.add_argument('--events', type=int, default=20,
+                            help='Events published to every staff stream')
+        parser.add_argument('--idle', type=float, default=2.0,
+                            help='Seconds the streams sit idle, with a heartbeat each second')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            admin = User.objects.create_user(
+                username='bench_stream_admin', password='!', phone_number='01999999990', user_type='admin'
+            )
+            customers = User.objects.bulk_create([
+                User(username=f'bench_stream_{i}', password='!', phone_number=f'0180000{i:04d}')
+                for i in range(options['customers'])
+            ])
+            orders = Order.objects.bulk_create([
+                Order(order_number=f'STR{i:08d}', customer=customer, delivery_address='Bench',
+                      total_amount=Decimal('100.00'))
+                for i, customer in enumerate(customers)
+            ])
+            cookies = {}
+            for user in [admin] + customers:
+                client = Client()
+                client.force_login(user)
+                cookies[user.pk] = f"sessionid={client.cookies['sessionid'].value}".encode()
+            staff = [admin.pk] * (options['connections'] - len(customers))
+            users = staff + [customer.pk for customer in customers]
+            with override_settings(EVENT_STREAM_HEARTBEAT=1, ALLOWED_HOSTS=['localhost'], QUERY_INSTRUMENTATION=False):
+                asyncio.run(self.run(users, cookies, [order.pk for order in orders], options))
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, scratch database dropped'))
+
+    async def run(self, users, cookies, order_ids, options):
+        app = ASGIHandler()
+        path = reverse('dashboard:notification_stream')
+
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        tabs = [Connection(app, path, cookies[user]) for user in users]
+        for tab in tabs:
+            tab.start()
+        await asyncio.gather(*(tab.expect('state') for tab in tabs))
+        opened = time.perf_counter() - started
+        memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        self.stdout.write(
+            f'{len(tabs)} streams open in {opened:.2f}s; {len(events.hub)} subscriptions, '
+            f'{memory / len(tabs):.1f} KiB of resident memory each'
+        )
+
+        for tab in tabs:
+            while not tab.frames.empty():
+                tab.frames.get_nowait()
+        await asyncio.sleep(options['idle'])
+        beats = sum(tab.frames.qsize() for tab in tabs)
+        self.stdout.write(f"Idle {options['idle']:.0f}s: {beats} heartbeats, "
+                          f"{sum(tab.status == 200 for tab in tabs)} streams still open")
+
+        staff = [tab for tab, user in zip(tabs, users) if user == users[0]]
+        latencies = []
+        for number in range(options['events']):
+            # Published from a worker thread, as a sync view's on_commit would
+            published = await sync_to_async(self.publish, thread_sensitive=False)(number)
+            arrived = await asyncio.gather(*(tab.expect('orders') for tab in staff))
+            latencies.append(max(arrived) - published)
+        self.stdout.write(
+            f"Fan-out of {options['events']} events to {len(staff)} staff streams: "
+            f'median {statistics.median(latencies) * 1000:.1f} ms, '
+            f'max {max(latencies) * 1000:.1f} ms until the last stream had it'
+        )
+
+        queries, started = await sync_to_async(self.write)(order_ids)
+        arrived = await asyncio.gather(*(tab.expect('stats') for tab in tabs))
+        self.stdout.write(
+            f'bulk_transition of {len(order_ids)} orders: {queries} queries including rollups and '
+            f'publishing, {(max(arrived) - started) * 1000:.1f} ms until the last stream had its figures'
+        )
+        polled = await sync_to_async(self.poll)(users[0])
+        self.stdout.write(
+            f'Polling instead: {polled} queries per uncached request, '
+            f'{len(tabs) * polled / 30:.0f} queries/s for {len(tabs)} tabs every 30s'
+        )
+
+        for tab in tabs:
+            tab.closed.set()
+        await asyncio.gather(*(tab.task for tab in tabs), return_exceptions=True)
+        self.stdout.write(f'All streams closed; {len(events.hub)} subscriptions left')
+
+    def publish(self, number):
+        published = time.perf_counter()
+        events.hub.publish([events.STAFF], 'orders', [{'id': number, 'status': 'pending'}])
+        return published
+
+    def write(self, order_ids):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                bulk_transition(order_ids, 'confirmed')
+        return len(ctx.captured_queries), started
+
+    def poll(self, user_id):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            dashboard_state(User.objects.get(pk=user_id))
+        return len(ctx.captured_queries) - 1
@@ -0,0 +1,98 @@
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from dashboard import notifications
+from dashboard.models import Notification
+from orders.management.commands._bench import scratch_database
+
+User = get_user_model()
+
+
+@contextmanager
+def measure():
+    """
+    Like _bench.measure, but counting past the 9000 queries Django keeps in its log
+    """
+    result = {'queries': 0}
+
+    def count(execute, sql, params, many, context):
+        result['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Compare one-at-a-time notification writes, counts and reads with the batched service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=50000)
+        parser.add_argument('--unread', type=int, default=300,
+                            help='Unread notifications of the user who marks them all read')
+        parser.add_argument('--batch-size', type=int, default=notifications.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            User.objects.bulk_create([
+                User(username=f'bench_notify_{i}', password='!', phone_number=f'019{i:08d}')
+                for i in range(options['recipients'])
+            ], batch_size=5000)
+            recipients = User.objects.filter(username__startswith='bench_notify_')
+            reader = recipients.order_by('pk').first()
+
+            self.stdout.write(f"{'operation':<34} {'queries':>8} {'seconds':>9}")
+            with measure() as result:
+                for user_id in recipients.values_list('pk', flat=True).iterator():
+                    Notification.objects.create(
+                        recipient_id=user_id, title='অফার', message='আজ ডেলিভারি ফ্রি', notification_type='promotion'
+                    )
+            self.row("broadcast, one INSERT per user", result)
+            with measure() as result:
+                notifications.notify(recipients, 'অফার', 'আজ ডেলিভারি ফ্রি', notification_type='promotion',
+                                     batch_size=options['batch_size'])
+            self.row(f"broadcast, batches of {options['batch_size']}", result)
+
+            Notification.objects.bulk_create([
+                Notification(recipient=reader, title=f'Bench {i}', message='...', notification_type='system')
+                for i in range(options['unread'])
+            ])
+            cache.clear()
+            self.count('unread count, cold', reader, repeat=1)
+            self.count('unread count, counter', reader)
+
+            with measure() as result:
+                for notification in Notification.objects.filter(recipient=reader, is_read=False):
+                    notification.is_read = True
+                    notification.read_at = timezone.now()
+                    notification.save()
+            self.row("mark all read, one UPDATE per row", result)
+            Notification.objects.filter(recipient=reader).update(is_read=False, read_at=None)
+            cache.clear()
+            notifications.unread_count(reader.pk)
+            with measure() as result:
+                notifications.mark_read(reader)
+            self.row('mark all read, one UPDATE', result)
+            self.count('unread count after marking', reader)
+
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, scratch database dropped'))
+
+    def count(self, label, user, repeat=100):
+        with measure() as result:
+            for _ in range(repeat):
+                count = notifications.unread_count(user.pk)
+        result['seconds'] /= repeat
+        result['queries'] /= repeat
+        self.row(f'{label} ({count})', result)
+
+    def row(self, label, result):
+        self.stdout.write(f"{label:<34} {result['queries']:>8g} {result['seconds']:>9.4f}")
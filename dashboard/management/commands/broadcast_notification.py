@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from dashboard.models import Notification
+from dashboard.notifications import BATCH_SIZE, notify
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Send one notification to every active user, or to those of a type or city'
+
+    def add_arguments(self, parser):
+        parser.add_argument('title')
+        parser.add_argument('message')
+        parser.add_argument('--type', default='system', choices=[value for value, _ in Notification.NOTIFICATION_TYPES])
+        parser.add_argument('--priority', default='medium', choices=[value for value, _ in Notification.PRIORITY_CHOICES])
+        parser.add_argument('--action-url')
+        parser.add_argument('--user-type', action='append', choices=[value for value, _ in User.USER_TYPE_CHOICES],
+                            help='Only users of this type (repeatable)')
+        parser.add_argument('--city', help='Only users living in this city')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Notifications written per INSERT')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the recipients')
+
+    def handle(self, *args, **options):
+        recipients = User.objects.filter(is_active=True)
+        if options['user_type']:
+            recipients = recipients.filter(user_type__in=options['user_type'])
+        if options['city']:
+            recipients = recipients.filter(city=options['city'])
+
+        if options['dry_run']:
+            self.stdout.write(f'{recipients.count()} user(s) would be notified')
+            return
+        sent = notify(
+            recipients, options['title'], options['message'], notification_type=options['type'],
+            priority=options['priority'], action_url=options['action_url'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{sent} notification(s) sent'))
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.rollups import SERIES, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard rollups in AnalyticsData from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--series', action='append', choices=sorted(SERIES),
+                            help='Series to recount (repeatable); all by default')
+        parser.add_argument('--since', help='Only recount from this date (YYYY-MM-DD) on')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.fromisoformat(options['since']))
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+        names = options['series'] or sorted(SERIES)
+        rebuild(names, since=since)
+        self.stdout.write(self.style.SUCCESS(f'{len(names)} series rebuilt'))
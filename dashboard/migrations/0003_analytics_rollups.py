@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:21
+
+from django.db import migrations, models
+
+from dashboard.rollups import rebuild
+
+
+def backfill_rollups(apps, schema_editor):
+    rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_hot_filter_indexes'),
+        ('orders', '0015_timeline_indexes'),
+        ('payments', '0003_timeline_indexes'),
+        ('delivery', '0003_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='analyticsdata',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='analyticsdata',
+            name='bucket',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='সময়কালের শুরু'),
+        ),
+        migrations.AddField(
+            model_name='analyticsdata',
+            name='dimension',
+            field=models.CharField(blank=True, default='', max_length=30, verbose_name='উপবিভাগ'),
+        ),
+        migrations.AddField(
+            model_name='analyticsdata',
+            name='granularity',
+            field=models.CharField(choices=[('hour', 'ঘণ্টা'), ('day', 'দিন'), ('total', 'সর্বমোট')], default='day', max_length=10, verbose_name='সময়কাল'),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsdata',
+            index=models.Index(fields=['metric_type', 'granularity', 'date'], name='analytics_metric_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='analyticsdata',
+            constraint=models.UniqueConstraint(fields=('metric_type', 'dimension', 'granularity', 'bucket'), name='analytics_bucket_unique'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_notification_unread_index'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationStamp',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='ব্যবহারকারী')),
+                ('stamp', models.BigIntegerField(verbose_name='স্ট্যাম্প')),
+            ],
+            options={
+                'verbose_name': 'নোটিফিকেশন স্ট্যাম্প',
+                'verbose_name_plural': 'নোটিফিকেশন স্ট্যাম্প',
+            },
+        ),
+    ]
@@ -76,12 +76,38 @@ class AnalyticsData(models.Model):
         ('reviews', 'রিভিউ'),
     ]
     
+    GRANULARITY_CHOICES = [
+        ('hour', 'ঘণ্টা'),
+        ('day', 'দিন'),
+        ('total', 'সর্বমোট'),
+    ]
+    
     metric_type = models.CharField(
         max_length=20,
         choices=METRIC_TYPES,
         verbose_name=_('মেট্রিক ধরন')
     )
     
+    dimension = models.CharField(
+        max_length=30,
+        blank=True,
+        default='',
+        verbose_name=_('উপবিভাগ')
+    )
+    
+    granularity = models.CharField(
+        max_length=10,
+        choices=GRANULARITY_CHOICES,
+        default='day',
+        verbose_name=_('সময়কাল')
+    )
+    
+    bucket = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('সময়কালের শুরু')
+    )
+    
     date = models.DateField(
         verbose_name=_('তারিখ')
     )
@@ -107,7 +133,14 @@ class AnalyticsData(models.Model):
         verbose_name = _('এনালিটিক্স ডেটা')
         verbose_name_plural = _('এনালিটিক্স ডেটা')
         ordering = ['-date', 'metric_type']
-        unique_together = ['metric_type', 'date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric_type', 'dimension', 'granularity', 'bucket'], name='analytics_bucket_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['metric_type', 'granularity', 'date'], name='analytics_metric_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_metric_type_display()} - {self.date} - {self.value}"
@@ -194,11 +227,43 @@ class Notification(models.Model):
         verbose_name = _('নোটিফিকেশন')
         verbose_name_plural = _('নোটিফিকেশন')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+            # Unread counts only ever touch the few unread rows
+            models.Index(fields=['recipient'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.recipient.get_full_name()}"
 
 
+class NotificationStamp(models.Model):
+    """
+    Changes with every write to a user's unread notifications.
+
+    Cached unread counts are keyed by it, so a change made by any process
+    invalidates the counts every other process cached.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name=_('ব্যবহারকারী')
+    )
+    
+    stamp = models.BigIntegerField(
+        verbose_name=_('স্ট্যাম্প')
+    )
+    
+    class Meta:
+        verbose_name = _('নোটিফিকেশন স্ট্যাম্প')
+        verbose_name_plural = _('নোটিফিকেশন স্ট্যাম্প')
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.stamp}"
+
+
 class SystemLog(models.Model):
     """
     Model for system activity logs
@@ -0,0 +1,169 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from . import events
+from .models import Notification, NotificationStamp
+
+# Notifications written per INSERT when fanning out
+BATCH_SIZE = 1000
+
+# Most notifications one request may mark read by id
+MAX_MARK_READ = 500
+
+
+def counter_timeout():
+    """
+    How long an unread counter is trusted before it is counted again
+    """
+    return getattr(settings, 'NOTIFICATION_COUNTER_TIMEOUT', 60 * 60)
+
+
+def _key(user_id, stamp):
+    return f'notifications_unread:{user_id}:{stamp}'
+
+
+def unread_count(user_id):
+    """
+    How many unread notifications the user has.
+
+    Counted once per stamp and cached under it: the stamp lives in the
+    database, so a count cached by one process goes stale as soon as any
+    other process changes the user's notifications.
+    """
+    stamp = NotificationStamp.objects.filter(user_id=user_id).values_list('stamp', flat=True).first()
+    key = _key(user_id, stamp)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.add(key, count, counter_timeout())
+    return count
+
+
+def _restamp(user_ids):
+    # Written in the same transaction as the change itself: whoever sees
+    # the new stamp also sees the change, and a count cached under the old
+    # stamp is never read again. One upsert however many users there are.
+    stamp = random.getrandbits(63)
+    NotificationStamp.objects.bulk_create(
+        [NotificationStamp(user_id=user_id, stamp=stamp) for user_id in user_ids],
+        update_conflicts=True, unique_fields=['user'], update_fields=['stamp'],
+    )
+
+
+def _payload(notification):
+    return {
+        'id': notification.pk,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'priority': notification.priority,
+        'action_url': notification.action_url,
+    }
+
+
+def _push_unread(user_ids):
+    for user_id in user_ids:
+        channel = events.user_channel(user_id)
+        if events.hub.listening(channel):
+            events.hub.publish([channel], 'unread', {'unread': unread_count(user_id)})
+
+
+def _sent(notifications):
+    """
+    Restamp the recipients' counters and stream the given new notifications once they commit
+    """
+    _restamp({notification.recipient_id for notification in notifications})
+
+    def commit():
+        for notification in notifications:
+            channel = events.user_channel(notification.recipient_id)
+            if events.hub.listening(channel):
+                payload = _payload(notification)
+                payload['unread'] = unread_count(notification.recipient_id)
+                events.hub.publish([channel], 'notification', payload)
+    transaction.on_commit(commit)
+
+
+def _recipient_batches(recipients, batch_size):
+    if not isinstance(recipients, QuerySet):
+        user_ids = list(dict.fromkeys(recipients))
+        for start in range(0, len(user_ids), batch_size):
+            yield user_ids[start:start + batch_size]
+        return
+    last_pk = 0
+    while True:
+        user_ids = list(
+            recipients.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if user_ids:
+            yield user_ids
+        if len(user_ids) < batch_size:
+            return
+        last_pk = user_ids[-1]
+
+
+def notify(recipients, title, message, notification_type='system', priority='medium',
+           action_url=None, metadata=None, batch_size=BATCH_SIZE):
+    """
+    Send one notification to many users; returns how many were created.
+
+    ``recipients`` is a queryset of users or a list of user ids. Recipients
+    are read in primary key batches and each batch is written with one
+    bulk INSERT in its own transaction, so a broadcast to every customer
+    neither holds all of them in memory nor one long write lock. Each
+    batch restamps its recipients' unread counters, and open streams are
+    updated as it commits.
+    """
+    sent = 0
+    for user_ids in _recipient_batches(recipients, batch_size):
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=user_id, title=title, message=message,
+                    notification_type=notification_type, priority=priority,
+                    action_url=action_url, metadata=metadata
+                )
+                for user_id in user_ids
+            ])
+            _sent(notifications)
+        sent += len(notifications)
+    return sent
+
+
+def mark_read(user, ids=None):
+    """
+    Mark the user's notifications with the given ids, or all of them, read; returns how many changed.
+
+    One UPDATE restricted to the user's unread rows, so ids of other
+    users' or already read notifications are ignored.
+    """
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    if ids is not None:
+        ids = [int(pk) for pk in ids]
+        if len(ids) > MAX_MARK_READ:
+            raise ValueError(f'At most {MAX_MARK_READ} notifications per request')
+        unread = unread.filter(pk__in=ids)
+    with transaction.atomic():
+        updated = unread.update(is_read=True, read_at=timezone.now())
+        if updated:
+            _restamp([user.pk])
+            transaction.on_commit(lambda: _push_unread([user.pk]))
+    return updated
+
+
+def notification_saved(notification, created):
+    """
+    Keep the counter and streams right after a notification is saved on its own
+    """
+    if created:
+        _sent([notification])
+        return
+
+    # Whether is_read changed is not known here, so count again
+    _restamp([notification.recipient_id])
+    transaction.on_commit(lambda: _push_unread([notification.recipient_id]))
@@ -0,0 +1,233 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+# Bucket of the all-time rows, which cover no period of their own
+TOTAL_BUCKET = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+HOUR = timedelta(hours=1)
+
+
+class Series:
+    """
+    One figure kept in AnalyticsData and how to count it from its source tables.
+
+    Rows are bucketed by the local hour of ``field``. With ``split`` the
+    figure is also kept per value of that column (orders per status), next
+    to the overall figure under the empty dimension.
+    """
+    def __init__(self, metric_type, field, value, sources, filter=None, dimension='', split=None):
+        self.metric_type = metric_type
+        self.field = field
+        self.value = value
+        self.sources = sources
+        self.filter = filter or Q()
+        self.dimension = dimension
+        self.split = split
+
+    def owned(self):
+        """
+        The AnalyticsData rows this series writes
+        """
+        if self.split:
+            return Q(metric_type=self.metric_type)
+        return Q(metric_type=self.metric_type, dimension=self.dimension)
+
+
+SERIES = {
+    # Archived orders still count: archiving moves them, it does not undo them
+    'orders': Series('orders', 'created_at', Count('pk'), ('orders.Order', 'orders.ArchivedOrder'), split='status'),
+    'revenue': Series('revenue', 'created_at', Sum('amount'), ('payments.Payment',), Q(status='completed')),
+    'customers': Series('customers', 'date_joined', Count('pk'), (settings.AUTH_USER_MODEL,), Q(user_type='customer')),
+    'deliveries': Series('deliveries', 'assigned_at', Count('pk'), ('delivery.DeliveryAssignment',)),
+    'completed_deliveries': Series(
+        'deliveries', 'actual_delivery_time', Count('pk'), ('delivery.DeliveryAssignment',),
+        Q(actual_delivery_time__isnull=False), dimension='completed'
+    ),
+}
+
+
+def hour_start(value):
+    """
+    The start of the local hour ``value`` falls in
+    """
+    return timezone.localtime(value, timezone.get_default_timezone()).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def _ranges(hours):
+    # Consecutive hours become one range, so a busy day is one condition
+    ranges = []
+    for hour in sorted(hours):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1][1] = hour + HOUR
+        else:
+            ranges.append([hour, hour + HOUR])
+    return ranges
+
+
+def _condition(field, hours=None, since=None):
+    if hours is not None:
+        condition = Q()
+        for start, end in _ranges(hours):
+            condition |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+        return condition
+    if since is not None:
+        return Q(**{f'{field}__gte': since})
+    return Q(**{f'{field}__isnull': False})
+
+
+def _count(series, condition, apps):
+    values = defaultdict(int)
+    keys = ['hour', series.split] if series.split else ['hour']
+    for label in series.sources:
+        rows = (
+            apps.get_model(label)._base_manager.filter(series.filter, condition)
+            .annotate(hour=TruncHour(series.field, tzinfo=timezone.get_default_timezone()))
+            .values(*keys).annotate(value=series.value).order_by()
+        )
+        for row in rows.iterator():
+            if series.split:
+                values[row['hour'], row[series.split]] += row['value'] or 0
+                values[row['hour'], ''] += row['value'] or 0
+            else:
+                values[row['hour'], series.dimension] += row['value'] or 0
+    return values
+
+
+def _store(series, granularity, values, scope, apps):
+    """
+    Make the ``granularity`` rows within ``scope`` equal ``{(bucket, dimension): value}``
+    """
+    AnalyticsData = apps.get_model('dashboard', 'AnalyticsData')
+    rows = AnalyticsData._base_manager.filter(series.owned(), scope, granularity=granularity)
+    stale = [
+        pk for pk, bucket, dimension in rows.values_list('pk', 'bucket', 'dimension').iterator()
+        if (bucket, dimension) not in values
+    ]
+    for start in range(0, len(stale), 1000):
+        AnalyticsData._base_manager.filter(pk__in=stale[start:start + 1000]).delete()
+    tz = timezone.get_default_timezone()
+    AnalyticsData._base_manager.bulk_create(
+        [
+            AnalyticsData(
+                metric_type=series.metric_type, dimension=dimension, granularity=granularity,
+                bucket=bucket, date=timezone.localtime(bucket, tz).date(), value=value
+            )
+            for (bucket, dimension), value in values.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['metric_type', 'dimension', 'granularity', 'bucket'],
+        update_fields=['value', 'date'],
+    )
+
+
+def refresh(name, hours=None, since=None, apps=global_apps):
+    """
+    Recount series ``name`` for the given local hours, from the day of ``since``, or for all time.
+
+    The hours are recounted from the source tables with one grouped query
+    per source. Their days are then re-added from the hour rows and the
+    all-time row from the day rows, so every level is derived from the one
+    below it and a refresh is correct whatever happened before it.
+    """
+    series = SERIES[name]
+    AnalyticsData = apps.get_model('dashboard', 'AnalyticsData')
+    tz = timezone.get_default_timezone()
+    if hours is not None:
+        hours = {hour_start(hour) for hour in hours}
+        hour_scope = Q(bucket__in=hours)
+        day_scope = Q(date__in={timezone.localtime(hour, tz).date() for hour in hours})
+    elif since is not None:
+        since = day_start(timezone.localtime(since, tz).date())
+        hour_scope = Q(bucket__gte=since)
+        day_scope = Q(date__gte=since.date())
+    else:
+        hour_scope = day_scope = Q()
+
+    with transaction.atomic():
+        _store(series, 'hour', _count(series, _condition(series.field, hours, since), apps), hour_scope, apps)
+
+        days = (
+            AnalyticsData._base_manager.filter(series.owned(), day_scope, granularity='hour')
+            .values('date', 'dimension').annotate(total=Sum('value')).order_by()
+        )
+        _store(series, 'day', {(day_start(row['date']), row['dimension']): row['total'] for row in days},
+               day_scope, apps)
+
+        totals = (
+            AnalyticsData._base_manager.filter(series.owned(), granularity='day')
+            .values('dimension').annotate(total=Sum('value')).order_by()
+        )
+        _store(series, 'total', {(TOTAL_BUCKET, row['dimension']): row['total'] for row in totals}, Q(), apps)
+
+
+def rebuild(names=None, since=None, apps=global_apps):
+    """
+    Recount the given series (all by default) from the day of ``since``, or from scratch
+    """
+    for name in names or SERIES:
+        refresh(name, since=since, apps=apps)
+
+
+def touch(name, *timestamps):
+    """
+    Refresh the hours of ``timestamps`` in series ``name`` once the current transaction commits
+    """
+    hours = {hour_start(value) for value in timestamps if value is not None}
+    if hours:
+        transaction.on_commit(lambda: refresh(name, hours))
+
+
+def dashboard_figures(today=None):
+    """
+    The shop-wide dashboard numbers, read from a few rollup rows.
+
+    Totals come from the all-time rows and the weekly and monthly figures
+    from the day rows of the last 30 days, all in one query.
+    """
+    AnalyticsData = global_apps.get_model('dashboard', 'AnalyticsData')
+    today = today or timezone.localdate()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    totals = defaultdict(int)
+    revenue = {'weekly': 0, 'monthly': 0}
+    new_customers_week = 0
+    rows = AnalyticsData.objects.filter(
+        Q(granularity='total')
+        | Q(granularity='day', metric_type__in=('revenue', 'customers'), dimension='', date__gte=month_ago)
+    ).order_by().values_list('metric_type', 'dimension', 'granularity', 'date', 'value')
+    for metric_type, dimension, granularity, date, value in rows:
+        if granularity == 'total':
+            totals[metric_type, dimension] = value
+        elif metric_type == 'revenue':
+            revenue['monthly'] += value
+            if date >= week_ago:
+                revenue['weekly'] += value
+        elif date >= week_ago:
+            new_customers_week += value
+
+    return {
+        'total_orders': int(totals['orders', '']),
+        'pending_orders': int(totals['orders', 'pending']),
+        'confirmed_orders': int(totals['orders', 'confirmed']),
+        'completed_orders': int(totals['orders', 'delivered']),
+        'cancelled_orders': int(totals['orders', 'cancelled']),
+        'total_revenue': totals['revenue', ''],
+        'weekly_revenue': revenue['weekly'],
+        'monthly_revenue': revenue['monthly'],
+        'total_customers': int(totals['customers', '']),
+        'new_customers_week': int(new_customers_week),
+        'total_deliveries': int(totals['deliveries', '']),
+        'completed_deliveries': int(totals['deliveries', 'completed']),
+    }
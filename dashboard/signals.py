@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import events, notifications, rollups
+
+
+@receiver(post_save, sender='orders.Order')
+@receiver(post_delete, sender='orders.Order')
+def roll_up_order(sender, instance, raw=False, **kwargs):
+    """
+    Recount the hour an order was placed in
+    """
+    if not raw:
+        rollups.touch('orders', instance.created_at)
+
+
+@receiver(post_save, sender='payments.Payment')
+@receiver(post_delete, sender='payments.Payment')
+def roll_up_payment(sender, instance, raw=False, **kwargs):
+    """
+    Recount the revenue of the hour a payment was made in
+    """
+    if not raw:
+        rollups.touch('revenue', instance.created_at)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def roll_up_customer(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    """
+    Recount the hour a customer joined in; logins and profile edits are skipped
+    """
+    if raw or (update_fields is not None and 'user_type' not in update_fields):
+        return
+    rollups.touch('customers', instance.date_joined)
+
+
+@receiver(post_save, sender='delivery.DeliveryAssignment')
+@receiver(post_delete, sender='delivery.DeliveryAssignment')
+def roll_up_delivery(sender, instance, raw=False, **kwargs):
+    """
+    Recount the hours a delivery was assigned and completed in
+    """
+    if not raw:
+        rollups.touch('deliveries', instance.assigned_at)
+        rollups.touch('completed_deliveries', instance.actual_delivery_time)
+
+
+@receiver(post_save, sender='orders.Order')
+def stream_order(sender, instance, raw=False, **kwargs):
+    """
+    Tell the event streams about a saved order
+    """
+    if not raw:
+        events.orders_changed([instance.pk])
+
+
+@receiver(post_save, sender='payments.Payment')
+def stream_payment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        events.payments_changed([instance.pk])
+
+
+@receiver(post_save, sender='delivery.DeliveryAssignment')
+def stream_assignment(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        events.deliveries_assigned([instance.order_id])
+
+
+@receiver(post_save, sender='delivery.DeliveryStatus')
+def stream_delivery_status(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        events.delivery_updated([instance.pk])
+
+
+@receiver(post_save, sender='dashboard.Notification')
+def count_notification(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Keep unread counters and streams in step with notifications saved one at a time
+    """
+    if not raw:
+        notifications.notification_saved(instance, created)
@@ -0,0 +1,230 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from orders.archive import customer_orders_q, order_customer
+from orders.models import Order, ProductService
+from payments.models import Payment
+
+from . import notifications
+from .rollups import dashboard_figures
+
+# How long callers wait for another process to finish building a figure
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+# How long past its expiry a figure may still be served while it is rebuilt
+STALE_GRACE = 5 * 60
+
+SHOP_KEY = 'dashboard_stats:shop'
+
+# How many of the latest orders the admin and customer dashboards list
+STAFF_RECENT_ORDERS = 10
+CUSTOMER_RECENT_ORDERS = 5
+
+
+def _user_key(user_id):
+    return f'dashboard_stats:user:{user_id}'
+
+
+def stats_timeout():
+    """
+    How long dashboard figures are served from the cache
+    """
+    return getattr(settings, 'DASHBOARD_STATS_TIMEOUT', 30)
+
+
+def cached(key, build, timeout=None):
+    """
+    ``build()``, cached for ``timeout`` seconds and rebuilt by one caller at a time.
+
+    Entries carry their own expiry and stay in the cache ``STALE_GRACE``
+    longer. When one expires, the caller that takes the lock rebuilds it
+    while everybody else keeps getting the stale copy. When there is nothing
+    to serve yet, the others poll for the builder's result instead of all
+    running the same queries at once.
+    """
+    timeout = stats_timeout() if timeout is None else timeout
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            _store({key: value}, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+    if entry is not None:
+        return entry[1]
+
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[1]
+    return build()
+
+
+def _store(values, timeout=None):
+    # In the (expires at, value) form ``cached`` reads
+    timeout = stats_timeout() if timeout is None else timeout
+    expires_at = time.time() + timeout
+    cache.set_many({key: (expires_at, value) for key, value in values.items()}, timeout + STALE_GRACE)
+
+
+def _status_figures(counts):
+    return {
+        'total_orders': sum(counts.values()),
+        'pending_orders': counts.get('pending', 0),
+        'confirmed_orders': counts.get('confirmed', 0),
+        'completed_orders': counts.get('delivered', 0),
+        'cancelled_orders': counts.get('cancelled', 0),
+    }
+
+
+def order_counts(orders):
+    """
+    Total and per-status counts of ``orders`` from one GROUP BY
+    """
+    return _status_figures(dict(orders.order_by().values_list('status').annotate(count=Count('pk'))))
+
+
+def _revenue_sums(today=None):
+    today = today or timezone.localdate()
+    return {
+        'total': Sum('amount'),
+        'weekly': Sum('amount', filter=Q(created_at__date__gte=today - timedelta(days=7))),
+        'monthly': Sum('amount', filter=Q(created_at__date__gte=today - timedelta(days=30))),
+    }
+
+
+def revenue_totals(payments, today=None):
+    """
+    All-time, weekly and monthly sums of the completed ``payments`` in one query
+    """
+    totals = payments.filter(status='completed').order_by().aggregate(**_revenue_sums(today))
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def _spending(totals):
+    return {
+        'total_spent': totals.get('total') or 0,
+        'spent_week': totals.get('weekly') or 0,
+        'spent_month': totals.get('monthly') or 0,
+    }
+
+
+def _shop_figures():
+    stats = dashboard_figures()
+    stats.update(ProductService.objects.order_by().aggregate(
+        total_products=Count('pk'),
+        available_products=Count('pk', filter=Q(is_available=True)),
+    ))
+    return stats
+
+
+def shop_stats():
+    """
+    The admin dashboard figures: order, revenue, customer and delivery
+    rollups plus product counts
+    """
+    return cached(SHOP_KEY, _shop_figures)
+
+
+def refresh_shop_stats():
+    """
+    Rebuild the shop figures now, at most once per ``stats_timeout()`` across processes.
+
+    Returns the fresh figures, or None when they were rebuilt too recently.
+    """
+    if not cache.add(f'{SHOP_KEY}:refreshed', 1, stats_timeout()):
+        return None
+    figures = _shop_figures()
+    _store({SHOP_KEY: figures})
+    return figures
+
+
+def customer_stats(user):
+    """
+    A customer's own order counts and spending
+    """
+    def build():
+        stats = order_counts(Order.objects.filter(customer=user))
+        stats.update(_spending(revenue_totals(Payment.objects.filter(customer_orders_q(customer=user)))))
+        return stats
+    return cached(_user_key(user.pk), build)
+
+
+def customers_stats(user_ids):
+    """
+    ``customer_stats`` of many customers from the same two queries grouped by
+    customer; the cached copies are replaced with the fresh figures
+    """
+    user_ids = set(user_ids)
+    counts = defaultdict(dict)
+    rows = (
+        Order.objects.filter(customer_id__in=user_ids).order_by()
+        .values_list('customer_id', 'status').annotate(count=Count('pk'))
+    )
+    for customer_id, status, count in rows:
+        counts[customer_id][status] = count
+    revenue = {
+        row.pop('customer_id'): row
+        for row in Payment.objects.filter(customer_orders_q(customer_id__in=user_ids), status='completed')
+        .order_by().annotate(customer_id=order_customer()).values('customer_id').annotate(**_revenue_sums())
+    }
+    stats = {}
+    for user_id in user_ids:
+        stats[user_id] = _status_figures(counts[user_id])
+        stats[user_id].update(_spending(revenue.get(user_id, {})))
+    _store({_user_key(user_id): figures for user_id, figures in stats.items()})
+    return stats
+
+
+def forget(user_ids):
+    """
+    Drop the cached figures of the given customers after a write.
+
+    The shop figures are left to expire: every write touches them, so
+    dropping them would rebuild them on nearly every request.
+    """
+    cache.delete_many([_user_key(user_id) for user_id in user_ids])
+
+
+def order_row(order):
+    """
+    An order as the dashboards list it among the recent orders
+    """
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'customer_name': order.customer_name,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'total_amount': str(order.total_amount),
+        'created_at': order.created_at.strftime('%d %b %Y, %I:%M %p')
+    }
+
+
+def dashboard_state(user):
+    """
+    Everything a dashboard shows of ``user``'s view of the shop, as JSON-ready data
+    """
+    if user.is_admin:
+        state = {'user_type': 'admin', **shop_stats()}
+        recent_orders = Order.objects.order_by('-created_at')[:STAFF_RECENT_ORDERS]
+    else:
+        state = {'user_type': 'user', **customer_stats(user)}
+        recent_orders = Order.objects.filter(customer=user).order_by('-created_at')[:CUSTOMER_RECENT_ORDERS]
+    state['recent_orders'] = [order_row(order) for order in recent_orders]
+    state['unread_notifications'] = notifications.unread_count(user.pk)
+    return state
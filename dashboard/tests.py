@@ -1,3 +1,553 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.template import TemplateDoesNotExist
+from django.test import RequestFactory, TestCase
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from delivery.models import DeliveryAgentLocation, DeliveryAssignment, DeliveryRating, DeliveryStatus
+from orders.models import Order, OrderItem, OrderStatusHistory, ProductService
+from orders.transitions import bulk_transition
+from orders.tests import QueryPlanMixin
+from payments.models import Payment, Refund
+from reviews.models import Review
+from . import events, notifications, timeseries
+from .instrumentation import QueryRecorder
+from .models import AnalyticsData, Notification
+from .rollups import dashboard_figures, day_start, hour_start
+from .stats import cached, customer_stats, customers_stats
+from .views import HomeView, NotificationListView
+
+User = get_user_model()
+
+
+class DashboardQueryPlanTests(QueryPlanMixin, TestCase):
+    """
+    Notification and review queries must stay on their indexes
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000071'
+        )
+
+    def test_notification_list(self):
+        # OFFSET pagination skips the page query when COUNT(*) finds nothing
+        Notification.objects.create(
+            title='Hello', message='Hello', notification_type='system', recipient=self.customer
+        )
+        self.assertIndexed(
+            self.list_view_sql(NotificationListView, self.customer),
+            ['dashboard_notification'], index='notification_recipient_idx'
+        )
+
+    def test_home_recent_reviews(self):
+        request = RequestFactory().get('/')
+        request.user = self.customer
+        view = HomeView()
+        view.setup(request)
+        with self.capture_sql() as statements:
+            context = view.get_context_data()
+            list(context['recent_reviews'])
+        self.assertIndexed(statements, ['reviews_review'], index='review_public_created_idx')
+
+    def test_unread_count(self):
+        with self.capture_sql() as statements:
+            notifications.unread_count(self.customer.pk)
+        self.assertIndexed(statements, ['dashboard_notification'], index='notification_unread_idx')
+
+    def test_analytics_series(self):
+        with self.capture_sql() as statements:
+            timeseries.series('orders', date(2022, 1, 1), date(2026, 12, 31), 'month')
+        # The unique constraint on the bucket; SQLite names its index itself
+        self.assertIndexed(statements, ['dashboard_analyticsdata'])
+
+
+class RollupTests(TestCase):
+    """
+    AnalyticsData rollups follow writes and can be rebuilt from the source tables
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000091'
+        )
+        self.yesterday = timezone.now() - timedelta(days=1)
+
+    def place(self, amount, status='completed'):
+        order = Order.objects.create(
+            customer=self.customer, delivery_address='Mirpur', total_amount=Decimal(amount)
+        )
+        Payment.objects.create(order=order, payment_method='bkash', amount=Decimal(amount), status=status)
+        return order
+
+    def figures(self, *names):
+        figures = dashboard_figures()
+        return [figures[name] for name in names]
+
+    def test_writes_update_the_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username='new', password='pass', phone_number='01700000092')
+            orders = [self.place('100.00'), self.place('50.00', status='pending'), self.place('25.00')]
+        self.assertEqual(
+            self.figures('total_orders', 'pending_orders', 'total_revenue', 'weekly_revenue', 'total_customers'),
+            [3, 3, Decimal('125.00'), Decimal('125.00'), 2]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_transition([orders[0].pk, orders[1].pk], 'confirmed')
+            Payment.objects.filter(order=orders[2]).get().delete()
+        self.assertEqual(
+            self.figures('pending_orders', 'confirmed_orders', 'total_revenue'), [1, 2, Decimal('100.00')]
+        )
+        self.assertEqual(
+            AnalyticsData.objects.get(metric_type='orders', dimension='confirmed', granularity='hour').bucket,
+            hour_start(orders[0].created_at)
+        )
+
+    def test_rebuild_recounts_from_the_source_tables(self):
+        # Without on_commit callbacks nothing is rolled up as it happens
+        old = self.place('300.00')
+        Order.objects.filter(pk=old.pk).update(created_at=self.yesterday)
+        Payment.objects.filter(order=old).update(created_at=self.yesterday - timedelta(days=10))
+        self.place('20.00')
+        self.assertEqual(self.figures('total_orders'), [0])
+
+        call_command('rebuild_rollups', stdout=io.StringIO())
+
+        self.assertEqual(
+            self.figures('total_orders', 'total_revenue', 'weekly_revenue', 'monthly_revenue'),
+            [2, Decimal('320.00'), Decimal('20.00'), Decimal('320.00')]
+        )
+        self.assertEqual(self.figures('total_customers'), [1])
+        days = AnalyticsData.objects.filter(metric_type='orders', dimension='', granularity='day')
+        self.assertEqual(
+            sorted((row.date, int(row.value)) for row in days),
+            [(timezone.localtime(self.yesterday).date(), 1), (timezone.localdate(), 1)]
+        )
+
+
+class DashboardStatsTests(TestCase):
+    """
+    Dashboard figures are computed in single passes and cached without stampedes
+    """
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000101'
+        )
+
+    def test_customer_stats_in_two_queries(self):
+        for status, paid in (('pending', 'completed'), ('delivered', 'completed'), ('delivered', 'failed')):
+            order = Order.objects.create(
+                customer=self.customer, delivery_address='Mirpur', total_amount=Decimal('40.00'), status=status
+            )
+            Payment.objects.create(order=order, payment_method='bkash', amount=Decimal('40.00'), status=paid)
+        old = Payment.objects.filter(status='completed').first()
+        Payment.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+
+        with self.assertNumQueries(2):
+            stats = customer_stats(self.customer)
+        self.assertEqual(
+            [stats[name] for name in ('total_orders', 'pending_orders', 'completed_orders', 'total_spent', 'spent_week')],
+            [3, 1, 2, Decimal('80.00'), Decimal('40.00')]
+        )
+        with self.assertNumQueries(0):
+            customer_stats(self.customer)
+
+        other = User.objects.create_user(username='other', password='pass', phone_number='01700000102')
+        cache.clear()
+        with self.assertNumQueries(2):
+            many = customers_stats([self.customer.pk, other.pk])
+        self.assertEqual(many[self.customer.pk], stats)
+        self.assertEqual((many[other.pk]['total_orders'], many[other.pk]['total_spent']), (0, 0))
+        with self.assertNumQueries(0):
+            self.assertEqual(customer_stats(other), many[other.pk])
+
+    def test_one_caller_builds_a_cold_key(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return len(calls)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cached('stats:test', build))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(calls), results), (1, [1] * 8))
+
+    def test_stale_value_served_while_rebuilding(self):
+        cache.set('stats:test', (time.time() - 1, 'stale'), 60)
+        cache.add('stats:test:lock', 1, 60)  # someone else is rebuilding
+        self.assertEqual(cached('stats:test', lambda: 'fresh'), 'stale')
+        cache.delete('stats:test:lock')
+        self.assertEqual(cached('stats:test', lambda: 'fresh'), 'fresh')
+
+
+class EventStreamTests(TestCase):
+    """
+    The event stream sends the dashboard state once, then deltas published on commit
+    """
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000111', user_type='admin'
+        )
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000112'
+        )
+        self.order = Order.objects.create(
+            customer=self.customer, delivery_address='Mirpur', total_amount=Decimal('60.00')
+        )
+
+    def frame(self, chunk):
+        event, data = chunk.decode().strip().split('\n')
+        return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    def test_wsgi_gets_the_state_and_a_retry_delay(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('dashboard:notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        retry, state = response.content.split(b'\n\n', 1)
+        self.assertEqual(retry, b'retry: 30000')
+        event, data = self.frame(state)
+        self.assertEqual((event, data['user_type'], data['total_orders']), ('state', 'user', 1))
+        self.assertEqual(data['recent_orders'][0]['order_number'], self.order.order_number)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('dashboard:notification_stream')).status_code, 401)
+
+    def confirm(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_transition([self.order.pk], 'confirmed')
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(
+                title='অর্ডার নিশ্চিত', message='...', notification_type='order', recipient=self.customer
+            )
+
+    async def test_stream_sends_deltas_to_listening_channels(self):
+        staff, customer = events.stream(self.admin), events.stream(self.customer)
+        for stream in (staff, customer):
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            self.assertEqual(self.frame(await anext(stream))[0], 'state')
+        self.assertEqual(len(events.hub), 2)
+
+        await sync_to_async(self.confirm)()
+        for stream, figures in ((staff, 'pending_orders'), (customer, 'pending_orders')):
+            event, orders = self.frame(await asyncio.wait_for(anext(stream), 1))
+            self.assertEqual((event, orders[0]['id'], orders[0]['status']), ('orders', self.order.pk, 'confirmed'))
+            event, stats = self.frame(await asyncio.wait_for(anext(stream), 1))
+            self.assertEqual((event, stats[figures]), ('stats', 0))
+
+        await sync_to_async(self.notify)()
+        event, notification = self.frame(await asyncio.wait_for(anext(customer), 1))
+        self.assertEqual((event, notification['title'], notification['unread']), ('notification', 'অর্ডার নিশ্চিত', 1))
+        self.assertTrue(next(iter(events.hub.channels[events.STAFF])).queue.empty())
+
+        for stream in (staff, customer):
+            await stream.aclose()
+        self.assertEqual(len(events.hub), 0)
+
+    async def test_staff_figures_are_pushed_at_most_once_per_timeout(self):
+        staff = events.stream(self.admin)
+        await anext(staff)
+        await anext(staff)
+
+        await sync_to_async(self.confirm)()
+        self.assertEqual(self.frame(await asyncio.wait_for(anext(staff), 1))[0], 'orders')
+        self.assertEqual(self.frame(await asyncio.wait_for(anext(staff), 1))[0], 'stats')
+
+        def process():
+            with self.captureOnCommitCallbacks(execute=True):
+                bulk_transition([self.order.pk], 'processing')
+        await sync_to_async(process)()
+        self.assertEqual(self.frame(await asyncio.wait_for(anext(staff), 1))[0], 'orders')
+        self.assertTrue(next(iter(events.hub.channels[events.STAFF])).queue.empty())
+        await staff.aclose()
+
+    async def test_slow_stream_is_resynced(self):
+        subscription = events.hub.subscribe(['test'], size=2)
+        try:
+            for number in range(3):
+                events.hub.publish(['test'], 'ping', number)
+            await asyncio.sleep(0)
+            self.assertEqual(subscription.queue.qsize(), 1)
+            self.assertIs(subscription.queue.get_nowait(), events.RESYNC)
+        finally:
+            events.hub.unsubscribe(subscription)
+
+
+class NotificationFanoutTests(TestCase):
+    """
+    Broadcasts are written in batches and unread counters follow creates and reads
+    """
+    def setUp(self):
+        cache.clear()
+        self.users = User.objects.bulk_create([
+            User(username=f'reader{i}', password='!', phone_number=f'0170000030{i}', city='Dhaka' if i % 2 else 'Khulna')
+            for i in range(5)
+        ])
+        self.user = self.users[0]
+
+    def notify(self, recipients, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return notifications.notify(recipients, 'অফার', 'আজ ডেলিভারি ফ্রি', **kwargs)
+
+    def test_notify_writes_in_batches(self):
+        # Per batch of two: the keyset read of ids, and the bulk INSERT and
+        # the stamp upsert in a savepoint; the short last batch ends the reads
+        with self.assertNumQueries(3 * 5):
+            sent = self.notify(User.objects.filter(pk__in=[u.pk for u in self.users]), batch_size=2)
+        self.assertEqual(sent, 5)
+        self.assertEqual(Notification.objects.filter(title='অফার').count(), 5)
+
+        with self.assertNumQueries(4):
+            self.assertEqual(self.notify([self.user.pk, self.user.pk, self.users[1].pk]), 2)
+
+    def test_counter_follows_creates_and_reads(self):
+        self.assertEqual(notifications.unread_count(self.user.pk), 0)
+        self.notify([self.user.pk])
+        self.notify([self.user.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            single = Notification.objects.create(
+                title='Hello', message='Hello', notification_type='system', recipient=self.user
+            )
+        self.assertEqual(notifications.unread_count(self.user.pk), 3)
+        # Only the stamp is read until the user's notifications change
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.unread_count(self.user.pk), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(notifications.mark_read(self.user, [single.pk, single.pk + 1000]), 1)
+        self.assertEqual(notifications.unread_count(self.user.pk), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(notifications.mark_read(self.user), 2)
+        self.assertEqual(notifications.unread_count(self.user.pk), 0)
+
+    def test_counter_sees_writes_of_other_processes(self):
+        self.assertEqual(notifications.unread_count(self.user.pk), 0)
+        # A broadcast command and an admin edit, each with a cache of its own
+        with mock.patch.object(notifications, 'cache', LocMemCache('other-process', {})):
+            self.notify([self.user.pk])
+            self.assertEqual(notifications.unread_count(self.user.pk), 1)
+            Notification.objects.create(
+                title='Hello', message='Hello', notification_type='system', recipient=self.user
+            )
+        self.assertEqual(notifications.unread_count(self.user.pk), 2)
+
+    def test_mark_read_endpoints(self):
+        self.notify([u.pk for u in self.users])
+        theirs = Notification.objects.get(recipient=self.users[1])
+        mine = Notification.objects.get(recipient=self.user)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('dashboard:unread_notification_count'))
+        self.assertEqual(response.json(), {'success': True, 'unread': 1})
+        self.assertEqual(self.client.post(reverse('dashboard:mark_notification_read', args=[theirs.pk])).status_code, 404)
+
+        url = reverse('dashboard:mark_notifications_read')
+        for body in ('nope', '{"ids": []}', '{"ids": ["x"]}', json.dumps({'ids': list(range(notifications.MAX_MARK_READ + 1))})):
+            self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'ids': [mine.pk, theirs.pk]}, content_type='application/json')
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(self.client.get(reverse('dashboard:unread_notification_count')).json()['unread'], 0)
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.is_read)
+
+        self.notify([self.user.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('dashboard:mark_all_notifications_read'))
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(notifications.unread_count(self.user.pk), 0)
+
+    def test_broadcast_command_filters_recipients(self):
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('broadcast_notification', 'অফার', 'আজ ডেলিভারি ফ্রি', '--city', 'Dhaka',
+                         '--type', 'promotion', stdout=out)
+        self.assertIn('2 notification(s) sent', out.getvalue())
+        self.assertEqual(
+            set(Notification.objects.values_list('recipient__city', 'notification_type').distinct()),
+            {('Dhaka', 'promotion')}
+        )
+
+
+class TimeSeriesTests(TestCase):
+    """
+    Chart series come from the rollups in local time, gap-filled and capped in length
+    """
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000121', user_type='admin'
+        )
+        customer = User.objects.create_user(username='customer', password='pass', phone_number='01700000122')
+        # 00:30 in Dhaka is still the previous day in UTC
+        for day, amount in ((6, '100.00'), (20, '50.00'), (34, '25.50')):
+            placed = timezone.make_aware(datetime(2026, 1, 1, 0, 30) + timedelta(days=day - 1))
+            order = Order.objects.create(customer=customer, delivery_address='Mirpur', total_amount=Decimal(amount))
+            payment = Payment.objects.create(order=order, payment_method='bkash', amount=Decimal(amount),
+                                             status='completed')
+            Order.objects.filter(pk=order.pk).update(created_at=placed)
+            Payment.objects.filter(pk=payment.pk).update(created_at=placed)
+        call_command('rebuild_rollups', stdout=io.StringIO())
+
+    def values(self, name, start, end, granularity, **kwargs):
+        data = timeseries.series(name, start, end, granularity, **kwargs)
+        return data['granularity'], [(point['bucket'], point['value']) for point in data['points']]
+
+    def test_buckets_are_local_and_gaps_are_filled(self):
+        granularity, points = self.values('orders', date(2026, 1, 5), date(2026, 1, 7), 'day')
+        self.assertEqual(points, [(day_start(date(2026, 1, day)), count) for day, count in ((5, 0), (6, 1), (7, 0))])
+
+        granularity, points = self.values('orders', date(2026, 1, 6), date(2026, 1, 6), 'hour')
+        self.assertEqual(len(points), 24)
+        self.assertEqual([value for _, value in points[:2]], [1, 0])
+        self.assertEqual(timezone.localtime(points[0][0]).hour, 0)
+
+        # Mondays, the first one before the range starts
+        granularity, points = self.values('orders', date(2026, 1, 6), date(2026, 2, 3), 'week')
+        self.assertEqual(
+            [(timezone.localtime(bucket).date(), value) for bucket, value in points],
+            [(date(2026, 1, 5), 1), (date(2026, 1, 12), 0), (date(2026, 1, 19), 1),
+             (date(2026, 1, 26), 0), (date(2026, 2, 2), 1)]
+        )
+        granularity, points = self.values('revenue', date(2025, 12, 1), date(2026, 2, 28), 'month')
+        self.assertEqual([value for _, value in points], [Decimal('0.00'), Decimal('150.00'), Decimal('25.50')])
+
+    def test_long_ranges_are_capped(self):
+        start, end = date(2022, 1, 1), date(2026, 12, 31)
+        granularity, points = self.values('orders', start, end, 'hour')
+        self.assertEqual((granularity, len(points)), ('week', 262))
+        with self.assertNumQueries(1):
+            granularity, points = self.values('revenue', start, end, 'day', limit=24)
+        self.assertEqual((granularity, len(points)), ('month', 20))
+        self.assertEqual(points[16], (day_start(date(2026, 1, 1)), Decimal('175.50')))
+
+    def test_series_endpoint(self):
+        url = reverse('dashboard:analytics_series', args=['orders'])
+        self.client.force_login(self.admin)
+        data = self.client.get(url, {'start': '2026-01-01', 'end': '2026-02-28', 'granularity': 'month'}).json()
+        self.assertEqual((data['granularity'], [point['value'] for point in data['points']]), ('month', [2, 1]))
+        self.assertEqual(self.client.get(url, {'granularity': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2026-02-01', 'end': '2026-01-01'}).status_code, 400)
+        for window in ({'end': '0001-01-03'}, {'start': '0001-01-01'}, {'end': '9999-12-31'}):
+            self.assertEqual(self.client.get(url, window).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '1900-01-01', 'end': '2200-12-31'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('dashboard:analytics_series', args=['nope'])).status_code, 404)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every URL must stay within its SQL query budget and be free of N+1 patterns
+    """
+    DEFAULT_BUDGET = 15
+    BUDGETS = {
+        'dashboard:admin_panel': 25,
+        'dashboard:admin_dashboard': 20,
+    }
+    ROWS = 12  # more than the N+1 threshold, so per-row queries are caught
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000081',
+            user_type='admin', is_staff=True, is_superuser=True
+        )
+        cls.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000082',
+            first_name='Rahim'
+        )
+        cls.agent = User.objects.create_user(
+            username='agent', password='pass', phone_number='01700000083',
+            user_type='delivery_agent'
+        )
+        products = ProductService.objects.bulk_create([
+            ProductService(name=f'Product {i}', description='', category='food',
+                           price=Decimal('10.00'), stock_quantity=10)
+            for i in range(cls.ROWS)
+        ])
+        for i in range(cls.ROWS):
+            order = Order.objects.create(
+                customer=cls.customer, delivery_address='Mirpur', delivery_city='ঢাকা',
+                total_amount=Decimal('10.00')
+            )
+            OrderItem.objects.create(order=order, product=products[i], quantity=1, unit_price=Decimal('10.00'))
+            OrderStatusHistory.objects.create(order=order, status='pending', created_by=cls.customer)
+            payment = Payment.objects.create(order=order, payment_method='bkash', amount=Decimal('10.00'))
+            Refund.objects.create(payment=payment, amount=Decimal('1.00'), reason='test')
+            assignment = DeliveryAssignment.objects.create(order=order, delivery_agent=cls.agent)
+            DeliveryStatus.objects.create(delivery_assignment=assignment, status='assigned')
+            DeliveryRating.objects.create(delivery_assignment=assignment, rating=5)
+            DeliveryAgentLocation.objects.create(delivery_agent=cls.agent, latitude=23.8, longitude=90.4)
+            Review.objects.create(customer=cls.customer, order=order, product=products[i], rating=5)
+            Notification.objects.create(title='Hi', message='Hi', notification_type='order', recipient=cls.customer)
+        cls.order = order
+
+    def iter_urls(self, patterns=None, prefix='', namespace=None):
+        for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.namespace == 'admin':
+                    continue  # Django's own admin site
+                yield from self.iter_urls(
+                    pattern.url_patterns, prefix + str(pattern.pattern),
+                    pattern.namespace or namespace
+                )
+            else:
+                yield f'{namespace}:{pattern.name}', pattern, prefix + str(pattern.pattern)
+
+    def kwargs_for(self, pattern, route):
+        view_class = getattr(pattern.callback, 'view_class', None)
+        model = getattr(view_class, 'model', None)
+        values = {
+            'pk': model.objects.first().pk if model and model.objects.exists() else self.order.pk,
+            'order_pk': self.order.pk,
+            'product_id': ProductService.objects.first().pk,
+            'order_id': self.order.order_number,
+            'category': 'food',
+            'name': 'orders',
+            'uidb64': 'MQ',
+            'token': 'token',
+        }
+        return {name: values[name] for name in re.findall(r'<(?:\w+:)?(\w+)>', route)}
+
+    def test_every_url_within_budget(self):
+        cache.clear()
+        self.client.raise_request_exception = False
+        checked = 0
+        for name, pattern, route in self.iter_urls():
+            url = reverse(name, kwargs=self.kwargs_for(pattern, route))
+            budget = self.BUDGETS.get(name, self.DEFAULT_BUDGET)
+            for user in (self.admin, self.customer, self.agent):
+                self.client.force_login(user)
+                with self.subTest(url=url, user=user.username):
+                    with QueryRecorder() as recorder:
+                        response = self.client.get(url)
+                    error = response.exc_info[1] if response.exc_info else None
+                    # Pages whose templates are not written yet are the only failures allowed
+                    if not isinstance(error, TemplateDoesNotExist):
+                        self.assertLess(response.status_code, 500, f'{name} failed: {error!r}')
+                    self.assertLessEqual(
+                        recorder.count, budget,
+                        f'{name} ran {recorder.count} queries (budget {budget})'
+                    )
+                    self.assertEqual(recorder.repeated_shapes(), {}, f'N+1 in {name}')
+            checked += 1
+        self.assertGreater(checked, 50)
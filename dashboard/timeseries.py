@@ -0,0 +1,150 @@
+from datetime import date, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import AnalyticsData
+from .rollups import HOUR, SERIES, day_start
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# Range shown when a chart asks for none
+DEFAULT_DAYS = 30
+
+TRUNCATE = {'week': TruncWeek, 'month': TruncMonth}
+
+
+def max_points():
+    """
+    Most points one chart series is sent, however long its range
+    """
+    return getattr(settings, 'ANALYTICS_MAX_POINTS', 400)
+
+
+def period_start(day, granularity):
+    """
+    The first day of the week (Monday) or month ``day`` falls in
+    """
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def periods(start, end, granularity):
+    """
+    Every bucket from the local date ``start`` to ``end`` inclusive, oldest first.
+
+    Hours are aware datetimes, stepped in UTC so a changed offset neither
+    skips nor repeats one; days, weeks and months are the dates they start on.
+    """
+    if granularity == 'hour':
+        hour, stop = day_start(start), day_start(end + timedelta(days=1))
+        result = []
+        while hour < stop:
+            result.append(hour)
+            hour += HOUR
+        return result
+    result = []
+    day = period_start(start, granularity)
+    while day <= end:
+        result.append(day)
+        if granularity == 'month':
+            day = (day + timedelta(days=32)).replace(day=1)
+        else:
+            day += timedelta(days=7 if granularity == 'week' else 1)
+    return result
+
+
+def _length(start, end, granularity):
+    # How many buckets periods() would return, without building them
+    if granularity == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    if granularity == 'week':
+        return (period_start(end, 'week') - period_start(start, 'week')).days // 7 + 1
+    days = (end - start).days + 1
+    return days * 24 if granularity == 'hour' else days
+
+
+def _values(series, dimension, start, end, granularity):
+    # Served from the AnalyticsData rollups: hour rows for hours, day rows
+    # added up by the database for everything coarser. Filtering on the
+    # bucket keeps the query on analytics_bucket_unique.
+    rows = AnalyticsData.objects.filter(
+        metric_type=series.metric_type, dimension=dimension,
+        granularity='hour' if granularity == 'hour' else 'day',
+        bucket__gte=day_start(start), bucket__lt=day_start(end + timedelta(days=1)),
+    ).order_by()
+    if granularity == 'hour':
+        return dict(rows.values_list('bucket', 'value'))
+    if granularity == 'day':
+        return dict(rows.values_list('date', 'value'))
+    rows = rows.annotate(period=TRUNCATE[granularity]('date')).values('period').annotate(total=Sum('value'))
+    return {row['period']: row['total'] for row in rows}
+
+
+def _downsample(points, limit):
+    # Consecutive buckets are added together, so totals survive the merge
+    size = -(-len(points) // limit)
+    if size <= 1:
+        return points
+    return [
+        {'bucket': points[i]['bucket'], 'value': sum(point['value'] for point in points[i:i + size])}
+        for i in range(0, len(points), size)
+    ]
+
+
+def series(name, start, end, granularity='day', dimension=None, limit=None):
+    """
+    Series ``name`` of dashboard.rollups bucketed by ``granularity`` over local dates ``start`` to ``end``.
+
+    Empty buckets are filled with zero. A range with more than ``limit``
+    buckets (``max_points()`` by default) is first moved to a coarser
+    granularity and, past months, to runs of consecutive months, so a
+    multi-year chart stays small. Returns the granularity used and the
+    points as ``{'bucket': local start, 'value': ...}``.
+    """
+    rollup = SERIES[name]
+    limit = limit or max_points()
+    for granularity in GRANULARITIES[GRANULARITIES.index(granularity):]:
+        if _length(start, end, granularity) <= limit:
+            break
+    buckets = periods(start, end, granularity)
+
+    values = _values(rollup, rollup.dimension if dimension is None else dimension, start, end, granularity)
+    count = isinstance(rollup.value, Count)
+    zero = 0 if count else Decimal('0.00')
+    points = []
+    for bucket in buckets:
+        value = values.get(bucket, zero)
+        points.append({
+            'bucket': bucket if granularity == 'hour' else day_start(bucket),
+            'value': int(value) if count else value,
+        })
+    return {'granularity': granularity, 'points': _downsample(points, limit)}
+
+
+def parse_window(params, today=None):
+    """
+    The ``start``, ``end`` (YYYY-MM-DD) and ``granularity`` a chart asked for; raises ValueError
+    """
+    today = today or timezone.localdate()
+    end = date.fromisoformat(params['end']) if params.get('end') else today
+    try:
+        start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=DEFAULT_DAYS)
+        # series() reaches back to the week's Monday and past the last
+        # month, and the database is queried in UTC
+        for day in (start - timedelta(days=7), end + timedelta(days=32)):
+            day_start(day).astimezone(dt_timezone.utc)
+    except OverflowError:
+        raise ValueError('Dates out of range')
+    granularity = params.get('granularity') or 'day'
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Granularity must be one of {", ".join(GRANULARITIES)}')
+    if start > end:
+        raise ValueError('Start must not be after end')
+    return start, end, granularity
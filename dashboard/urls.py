@@ -25,10 +25,14 @@ urlpatterns = [
     
     # Analytics
     path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('analytics/series/<str:name>/', views.AnalyticsSeriesView.as_view(), name='analytics_series'),
     
     # Notifications
     path('notifications/', views.NotificationListView.as_view(), name='notifications'),
     path('notifications/<int:pk>/read/', views.MarkNotificationReadView.as_view(), name='mark_notification_read'),
+    path('notifications/unread-count/', views.UnreadNotificationCountView.as_view(), name='unread_notification_count'),
+    path('notifications/mark-read/', views.MarkNotificationsReadView.as_view(), name='mark_notifications_read'),
+    path('notifications/mark-all-read/', views.MarkAllNotificationsReadView.as_view(), name='mark_all_notifications_read'),
     
     # FAQ
     path('faq/', views.FAQListView.as_view(), name='faq'),
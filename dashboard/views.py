@@ -1,16 +1,25 @@
+import json
+
 from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.views import View
 from django.views.generic import TemplateView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import get_user_model
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from datetime import datetime, timedelta
 from orders.models import Order, ProductService
+from orders import catalog
 from payments.models import Payment
 from delivery.models import DeliveryAssignment
 from reviews.models import Review
 from .models import Notification, AnalyticsData, FAQ
+from . import events, notifications, timeseries
+from .rollups import SERIES
+from .stats import customer_stats, dashboard_state, shop_stats
 
 User = get_user_model()
 
@@ -40,7 +49,7 @@ class DatabaseViewerView(TemplateView):
             
             context['users'] = User.objects.all()
             context['products'] = ProductService.objects.all()
-            context['orders'] = Order.objects.all()
+            context['orders'] = Order.objects.select_related('customer')
             context['now'] = timezone.now()
         except Exception as e:
             context['users'] = []
@@ -51,20 +60,31 @@ class DatabaseViewerView(TemplateView):
         return context
 
 
-class NotificationStreamView(TemplateView):
+class NotificationStreamView(View):
     """
-    Notification stream view for real-time updates
+    Server-Sent Events stream of dashboard figures, orders and notifications.
+
+    The browser gets its whole dashboard state once and then only the
+    changes published to its channels, instead of polling for everything.
+    Held open under ASGI; a WSGI worker would be tied up for as long as
+    the tab stays open, so there the state is sent alone and the browser
+    told to reconnect after EVENT_STREAM_RETRY seconds.
     """
-    template_name = 'dashboard/notifications.html'
-    
-    def get(self, request, *args, **kwargs):
-        # Return a simple JSON response for now
-        from django.http import JsonResponse
-        return JsonResponse({
-            'notifications': [],
-            'status': 'success',
-            'message': 'No new notifications'
-        })
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
+        if isinstance(request, ASGIRequest):
+            response = StreamingHttpResponse(events.stream(user), content_type='text/event-stream')
+        else:
+            state = await sync_to_async(dashboard_state)(user)
+            response = HttpResponse(
+                events.retry(events.poll_interval() * 1000) + events.encode('state', state),
+                content_type='text/event-stream'
+            )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 class HomeView(TemplateView):
@@ -78,13 +98,16 @@ class HomeView(TemplateView):
         
         try:
             # Get featured products
-            context['featured_products'] = ProductService.objects.filter(is_available=True)[:6]
+            version = catalog.catalog_version()
+            context['featured_products'] = catalog.featured_products(version=version)
             
             # Get recent reviews
-            context['recent_reviews'] = Review.objects.filter(is_public=True).order_by('-created_at')[:5]
+            context['recent_reviews'] = Review.objects.filter(is_public=True).select_related(
+                'customer', 'product'
+            ).order_by('-created_at')[:5]
             
             # Get statistics - real-time data
-            context['total_products'] = ProductService.objects.filter(is_available=True).count()
+            context['total_products'] = catalog.CachedProductList(version=version).count()
             context['total_orders'] = Order.objects.count()
             context['total_customers'] = User.objects.filter(user_type='customer').count()
             context['total_delivery_agents'] = User.objects.filter(user_type='delivery_agent').count()
@@ -115,45 +138,11 @@ class AdminDashboardView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         try:
-            # Real-time admin statistics
-            today = timezone.now().date()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-            
-            # Order statistics
-            context['total_orders'] = Order.objects.count()
-            context['pending_orders'] = Order.objects.filter(status='pending').count()
-            context['completed_orders'] = Order.objects.filter(status='delivered').count()
-            context['cancelled_orders'] = Order.objects.filter(status='cancelled').count()
+            # Order, revenue, customer and product figures
+            context.update(shop_stats())
             
             # Recent orders
-            context['recent_orders'] = Order.objects.all().order_by('-created_at')[:10]
-            
-            # Revenue statistics
-            context['total_revenue'] = Payment.objects.filter(status='completed').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            context['weekly_revenue'] = Payment.objects.filter(
-                status='completed',
-                created_at__date__gte=week_ago
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            context['monthly_revenue'] = Payment.objects.filter(
-                status='completed',
-                created_at__date__gte=month_ago
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Customer statistics
-            context['total_customers'] = User.objects.filter(user_type='customer').count()
-            context['new_customers_week'] = User.objects.filter(
-                user_type='customer',
-                date_joined__date__gte=week_ago
-            ).count()
-            
-            # Product statistics
-            context['total_products'] = ProductService.objects.count()
-            context['available_products'] = ProductService.objects.filter(is_available=True).count()
+            context['recent_orders'] = Order.objects.order_by('-created_at')[:10]
             
             context['last_updated'] = timezone.now()
             
@@ -187,24 +176,16 @@ class UserDashboardView(LoginRequiredMixin, TemplateView):
         user = self.request.user
         
         try:
-            # User-specific order statistics
-            user_orders = Order.objects.filter(customer=user)
-            context['total_orders'] = user_orders.count()
-            context['pending_orders'] = user_orders.filter(status='pending').count()
-            context['completed_orders'] = user_orders.filter(status='delivered').count()
-            context['cancelled_orders'] = user_orders.filter(status='cancelled').count()
+            # User-specific order statistics and total amount spent
+            context.update(customer_stats(user))
             
             # Recent orders for this user
-            context['recent_orders'] = user_orders.order_by('-created_at')[:5]
-            
-            # Total amount spent
-            context['total_spent'] = Payment.objects.filter(
-                order__customer=user,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            context['recent_orders'] = Order.objects.filter(customer=user).prefetch_related(
+                'items__product'
+            ).order_by('-created_at')[:5]
             
             # User's reviews
-            context['user_reviews'] = Review.objects.filter(user=user).order_by('-created_at')[:3]
+            context['user_reviews'] = Review.objects.filter(customer=user).select_related('product').order_by('-created_at')[:3]
             
             context['last_updated'] = timezone.now()
             
@@ -235,50 +216,14 @@ class AdminPanelView(TemplateView):
             # Get all products for management
             context['products'] = ProductService.objects.all().order_by('-created_at')
             
-            # Get date ranges
-            today = timezone.now().date()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-            
-            # Order statistics for analysis
-            context['total_orders'] = Order.objects.count()
-            context['pending_orders'] = Order.objects.filter(status='pending').count()
-            context['completed_orders'] = Order.objects.filter(status='delivered').count()
-            context['cancelled_orders'] = Order.objects.filter(status='cancelled').count()
-            
-            # Revenue statistics for analysis
-            context['total_revenue'] = Payment.objects.filter(status='completed').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            context['weekly_revenue'] = Payment.objects.filter(
-                status='completed',
-                created_at__date__gte=week_ago
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            context['monthly_revenue'] = Payment.objects.filter(
-                status='completed',
-                created_at__date__gte=month_ago
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Customer statistics for analysis
-            context['total_customers'] = User.objects.filter(user_type='customer').count()
-            context['new_customers_week'] = User.objects.filter(
-                user_type='customer',
-                date_joined__date__gte=week_ago
-            ).count()
-            
-            # Delivery statistics for analysis
-            context['total_deliveries'] = DeliveryAssignment.objects.count()
-            context['completed_deliveries'] = DeliveryAssignment.objects.filter(
-                actual_delivery_time__isnull=False
-            ).count()
+            # Order, revenue, customer and delivery figures
+            context.update(shop_stats())
             
             # Recent orders for analysis (read-only)
-            context['recent_orders'] = Order.objects.all().order_by('-created_at')[:10]
+            context['recent_orders'] = Order.objects.order_by('-created_at')[:10]
             
             # Recent payments
-            context['recent_payments'] = Payment.objects.order_by('-created_at')[:10]
+            context['recent_payments'] = Payment.objects.prefetch_related('order').order_by('-created_at')[:10]
             
             # Top products
             context['top_products'] = ProductService.objects.annotate(
@@ -319,28 +264,15 @@ class AnalyticsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get analytics data for the last 30 days
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        # Order analytics
-        orders_by_date = Order.objects.filter(
-            created_at__date__range=[start_date, end_date]
-        ).extra(
-            select={'day': 'date(created_at)'}
-        ).values('day').annotate(count=Count('id')).order_by('day')
-        
-        context['orders_by_date'] = list(orders_by_date)
-        
-        # Revenue analytics
-        revenue_by_date = Payment.objects.filter(
-            status='completed',
-            created_at__date__range=[start_date, end_date]
-        ).extra(
-            select={'day': 'date(created_at)'}
-        ).values('day').annotate(total=Sum('amount')).order_by('day')
-        
-        context['revenue_by_date'] = list(revenue_by_date)
+        # Orders and revenue per day over the last 30 days, or the range and granularity asked for
+        try:
+            start, end, granularity = timeseries.parse_window(self.request.GET)
+        except ValueError:
+            start, end, granularity = timeseries.parse_window({})
+        orders = timeseries.series('orders', start, end, granularity)
+        context['granularity'] = orders['granularity']
+        context['orders_by_date'] = orders['points']
+        context['revenue_by_date'] = timeseries.series('revenue', start, end, granularity)['points']
         
         # Product category analytics
         category_stats = ProductService.objects.values('category').annotate(
@@ -353,6 +285,25 @@ class AnalyticsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         return context
 
 
+class AnalyticsSeriesView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    One chart series for the analytics page (AJAX)
+    """
+    def test_func(self):
+        return self.request.user.is_admin
+    
+    def get(self, request, *args, **kwargs):
+        name = kwargs['name']
+        if name not in SERIES:
+            return JsonResponse({'success': False, 'message': 'Unknown series'}, status=404)
+        try:
+            start, end, granularity = timeseries.parse_window(request.GET)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        data = timeseries.series(name, start, end, granularity, dimension=request.GET.get('dimension'))
+        return JsonResponse({'success': True, 'series': name, 'start': start, 'end': end, **data})
+
+
 class NotificationListView(LoginRequiredMixin, ListView):
     """
     Notification list view
@@ -366,20 +317,59 @@ class NotificationListView(LoginRequiredMixin, ListView):
         return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
 
 
-class MarkNotificationReadView(LoginRequiredMixin, TemplateView):
+class UnreadNotificationCountView(LoginRequiredMixin, View):
+    """
+    Unread notification count for the navbar badge (AJAX)
+    """
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'success': True, 'unread': notifications.unread_count(request.user.pk)})
+
+
+class MarkNotificationReadView(LoginRequiredMixin, View):
     """
     Mark notification as read
     """
     def post(self, request, *args, **kwargs):
-        notification = Notification.objects.get(
-            pk=kwargs['pk'],
-            recipient=request.user
-        )
-        notification.is_read = True
-        notification.read_at = timezone.now()
-        notification.save()
-        
-        return JsonResponse({'success': True})
+        if not Notification.objects.filter(pk=kwargs['pk'], recipient=request.user).exists():
+            return JsonResponse({'success': False, 'message': 'নোটিফিকেশন পাওয়া যায়নি'}, status=404)
+        notifications.mark_read(request.user, [kwargs['pk']])
+        return JsonResponse({'success': True, 'unread': notifications.unread_count(request.user.pk)})
+
+
+class MarkNotificationsReadView(LoginRequiredMixin, View):
+    """
+    Mark the notifications whose ids are posted as read (AJAX)
+    """
+    def post(self, request, *args, **kwargs):
+        try:
+            ids = json.loads(request.body).get('ids')
+        except (ValueError, AttributeError):
+            ids = None
+        if not isinstance(ids, list) or not ids:
+            return JsonResponse({'success': False, 'message': 'Notification IDs required'}, status=400)
+        if len(ids) > notifications.MAX_MARK_READ:
+            return JsonResponse({
+                'success': False,
+                'message': f'At most {notifications.MAX_MARK_READ} notifications per request',
+            }, status=400)
+        try:
+            updated = notifications.mark_read(request.user, ids)
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'message': 'Invalid notification IDs'}, status=400)
+        return JsonResponse({
+            'success': True,
+            'updated': updated,
+            'unread': notifications.unread_count(request.user.pk),
+        })
+
+
+class MarkAllNotificationsReadView(LoginRequiredMixin, View):
+    """
+    Mark all of the user's notifications as read (AJAX)
+    """
+    def post(self, request, *args, **kwargs):
+        updated = notifications.mark_read(request.user)
+        return JsonResponse({'success': True, 'updated': updated, 'unread': 0})
 
 
 class FAQListView(ListView):
@@ -439,7 +429,7 @@ class OrderReportView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
                 created_at__date__range=[start_date, end_date]
             )
         
-        context['orders'] = orders.order_by('-created_at')
+        context['orders'] = orders.select_related('customer').order_by('-created_at')
         context['start_date'] = start_date
         context['end_date'] = end_date
         
@@ -476,7 +466,7 @@ class RevenueReportView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
                 created_at__date__range=[start_date, end_date]
             )
         
-        context['payments'] = payments.order_by('-created_at')
+        context['payments'] = payments.prefetch_related('order__customer').order_by('-created_at')
         context['total_revenue'] = payments.aggregate(total=Sum('amount'))['total'] or 0
         context['start_date'] = start_date
         context['end_date'] = end_date
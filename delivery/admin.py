@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
+from orders.admin import ArchivedOrderRowsMixin
 from .models import DeliveryAssignment, DeliveryStatus, DeliveryArea, DeliveryAgentLocation, DeliveryRating
 
 
@@ -12,11 +13,11 @@ class DeliveryStatusInline(admin.TabularInline):
 
 
 @admin.register(DeliveryAssignment)
-class DeliveryAssignmentAdmin(admin.ModelAdmin):
+class DeliveryAssignmentAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Delivery Assignment Admin
     """
-    list_display = ('order', 'delivery_agent', 'assigned_at', 'estimated_delivery_time', 'actual_delivery_time')
+    list_display = ('order_number', 'delivery_agent', 'assigned_at', 'estimated_delivery_time', 'actual_delivery_time')
     list_filter = ('assigned_at', 'delivery_agent__user_type')
     search_fields = ('order__order_number', 'delivery_agent__username', 'delivery_agent__first_name')
     readonly_fields = ('assigned_at',)
@@ -35,21 +36,22 @@ class DeliveryAssignmentAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('order', 'delivery_agent', 'assigned_by')
+        return super().get_queryset(request).select_related('delivery_agent', 'assigned_by').prefetch_related('order')
 
 
 @admin.register(DeliveryStatus)
-class DeliveryStatusAdmin(admin.ModelAdmin):
+class DeliveryStatusAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Delivery Status Admin
     """
+    order_field = 'delivery_assignment__order'
     list_display = ('delivery_assignment', 'status', 'location', 'timestamp')
     list_filter = ('status', 'timestamp')
     search_fields = ('delivery_assignment__order__order_number', 'delivery_assignment__delivery_agent__username')
     readonly_fields = ('timestamp',)
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('delivery_assignment__order', 'delivery_assignment__delivery_agent')
+        return super().get_queryset(request).select_related('delivery_assignment__delivery_agent').prefetch_related('delivery_assignment__order')
 
 
 @admin.register(DeliveryArea)
@@ -92,14 +94,15 @@ class DeliveryAgentLocationAdmin(admin.ModelAdmin):
 
 
 @admin.register(DeliveryRating)
-class DeliveryRatingAdmin(admin.ModelAdmin):
+class DeliveryRatingAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Delivery Rating Admin
     """
+    order_field = 'delivery_assignment__order'
     list_display = ('delivery_assignment', 'rating', 'rated_at')
     list_filter = ('rating', 'rated_at')
     search_fields = ('delivery_assignment__order__order_number', 'delivery_assignment__delivery_agent__username')
     readonly_fields = ('rated_at',)
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('delivery_assignment__order', 'delivery_assignment__delivery_agent')
\ No newline at end of file
+        return super().get_queryset(request).select_related('delivery_assignment__delivery_agent').prefetch_related('delivery_assignment__order')
\ No newline at end of file
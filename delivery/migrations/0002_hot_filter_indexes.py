@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0001_initial'),
+        ('orders', '0006_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliveryagentlocation',
+            index=models.Index(fields=['delivery_agent', '-timestamp', '-id'], name='agent_location_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryassignment',
+            index=models.Index(fields=['delivery_agent', '-assigned_at', '-id'], name='assignment_agent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryassignment',
+            index=models.Index(fields=['-assigned_at', '-id'], name='assignment_assigned_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0002_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliverystatus',
+            index=models.Index(fields=['delivery_assignment', '-timestamp', '-id'], name='delivery_status_assignment_idx'),
+        ),
+    ]
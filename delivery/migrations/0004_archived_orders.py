@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0003_timeline_indexes'),
+        ('orders', '0016_saved_carts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deliveryassignment',
+            name='order',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='delivery_assignment', to='orders.order', verbose_name='অর্ডার'),
+        ),
+    ]
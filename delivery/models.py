@@ -2,6 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from orders.archive import order_number_of
 from orders.models import Order
 
 User = get_user_model()
@@ -14,6 +15,8 @@ class DeliveryAssignment(models.Model):
     order = models.OneToOneField(
         Order,
         on_delete=models.CASCADE,
+        # The archive moves finished orders out from under this row
+        db_constraint=False,
         related_name='delivery_assignment',
         verbose_name=_('অর্ডার')
     )
@@ -62,9 +65,13 @@ class DeliveryAssignment(models.Model):
         verbose_name = _('ডেলিভারি নির্ধারণ')
         verbose_name_plural = _('ডেলিভারি নির্ধারণ')
         ordering = ['-assigned_at']
+        indexes = [
+            models.Index(fields=['delivery_agent', '-assigned_at', '-id'], name='assignment_agent_idx'),
+            models.Index(fields=['-assigned_at', '-id'], name='assignment_assigned_idx'),
+        ]
     
     def __str__(self):
-        return f"অর্ডার #{self.order.order_number} - {self.delivery_agent.get_full_name()}"
+        return f"অর্ডার #{order_number_of(self)} - {self.delivery_agent.get_full_name()}"
 
 
 class DeliveryStatus(models.Model):
@@ -115,9 +122,12 @@ class DeliveryStatus(models.Model):
         verbose_name = _('ডেলিভারি অবস্থা')
         verbose_name_plural = _('ডেলিভারি অবস্থা')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['delivery_assignment', '-timestamp', '-id'], name='delivery_status_assignment_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.delivery_assignment.order.order_number} - {self.get_status_display()}"
+        return f"{order_number_of(self.delivery_assignment)} - {self.get_status_display()}"
 
 
 class DeliveryArea(models.Model):
@@ -207,6 +217,9 @@ class DeliveryAgentLocation(models.Model):
         verbose_name = _('ডেলিভারি এজেন্ট অবস্থান')
         verbose_name_plural = _('ডেলিভারি এজেন্ট অবস্থান')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['delivery_agent', '-timestamp', '-id'], name='agent_location_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.delivery_agent.get_full_name()} - {self.timestamp}"
@@ -247,4 +260,4 @@ class DeliveryRating(models.Model):
         verbose_name_plural = _('ডেলিভারি রেটিং')
     
     def __str__(self):
-        return f"{self.delivery_assignment.order.order_number} - {self.rating}⭐"
\ No newline at end of file
+        return f"{order_number_of(self.delivery_assignment)} - {self.rating}⭐"
\ No newline at end of file
@@ -1,3 +1,48 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from orders.models import Order
+from orders.tests import QueryPlanMixin
+from .models import DeliveryAssignment
+from .views import AdminDeliveryListView, DeliveryListView, LocationHistoryView, MyDeliveriesView
+
+User = get_user_model()
+
+
+class DeliveryQueryPlanTests(QueryPlanMixin, TestCase):
+    """
+    Delivery list queries must stay on their indexes
+    """
+    def setUp(self):
+        self.agent = User.objects.create_user(
+            username='agent', password='pass', phone_number='01700000061', user_type='delivery_agent'
+        )
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000062', user_type='admin'
+        )
+
+    def test_admin_delivery_list(self):
+        self.assertIndexed(
+            self.list_view_sql(AdminDeliveryListView, self.admin),
+            ['delivery_deliveryassignment'], index='assignment_assigned_idx'
+        )
+
+    def test_agent_delivery_list(self):
+        # OFFSET pagination skips the page query when COUNT(*) finds nothing
+        order = Order.objects.create(
+            customer=self.admin, delivery_address='x', delivery_city='ঢাকা', total_amount=Decimal('1.00')
+        )
+        DeliveryAssignment.objects.create(order=order, delivery_agent=self.agent)
+        for view_class in (DeliveryListView, MyDeliveriesView):
+            self.assertIndexed(
+                self.list_view_sql(view_class, self.agent),
+                ['delivery_deliveryassignment'], index='assignment_agent_idx'
+            )
+
+    def test_location_history(self):
+        self.assertIndexed(
+            self.list_view_sql(LocationHistoryView, self.agent),
+            ['delivery_deliveryagentlocation'], index='agent_location_time_idx'
+        )
@@ -5,6 +5,7 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.contrib.auth import get_user_model
+from orders.pagination import KeysetPaginationMixin
 from .models import DeliveryAssignment, DeliveryStatus, DeliveryArea, DeliveryAgentLocation, DeliveryRating
 
 User = get_user_model()
@@ -20,9 +21,9 @@ class DeliveryListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         if self.request.user.is_admin:
-            return DeliveryAssignment.objects.all().order_by('-assigned_at')
+            return DeliveryAssignment.objects.select_related('delivery_agent').prefetch_related('order__customer').order_by('-assigned_at')
         elif self.request.user.is_delivery_agent:
-            return DeliveryAssignment.objects.filter(delivery_agent=self.request.user).order_by('-assigned_at')
+            return DeliveryAssignment.objects.filter(delivery_agent=self.request.user).prefetch_related('order__customer').order_by('-assigned_at')
         else:
             return DeliveryAssignment.objects.none()
 
@@ -46,7 +47,7 @@ class MyDeliveriesView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        return DeliveryAssignment.objects.filter(delivery_agent=self.request.user).order_by('-assigned_at')
+        return DeliveryAssignment.objects.filter(delivery_agent=self.request.user).prefetch_related('order__customer').order_by('-assigned_at')
 
 
 class MyDeliveryDetailView(LoginRequiredMixin, DetailView):
@@ -109,11 +110,11 @@ class DeliveryRatingListView(ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        return DeliveryRating.objects.all().order_by('-rated_at')
+        return DeliveryRating.objects.select_related('delivery_assignment').prefetch_related('delivery_assignment__order').order_by('-rated_at')
 
 
 # Admin views
-class AdminDeliveryListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class AdminDeliveryListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     """
     Admin delivery list view
     """
@@ -121,12 +122,13 @@ class AdminDeliveryListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     template_name = 'delivery/admin_delivery_list.html'
     context_object_name = 'deliveries'
     paginate_by = 20
+    keyset_field = 'assigned_at'
     
     def test_func(self):
         return self.request.user.is_admin
     
     def get_queryset(self):
-        return DeliveryAssignment.objects.all().order_by('-assigned_at')
+        return DeliveryAssignment.objects.select_related('delivery_agent').prefetch_related('order__customer').order_by('-assigned_at')
 
 
 class AdminDeliveryAssignView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
@@ -217,7 +219,7 @@ class LocationUpdateView(LoginRequiredMixin, TemplateView):
     template_name = 'delivery/location_update.html'
 
 
-class LocationHistoryView(LoginRequiredMixin, ListView):
+class LocationHistoryView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Location history view
     """
@@ -225,6 +227,7 @@ class LocationHistoryView(LoginRequiredMixin, ListView):
     template_name = 'delivery/location_history.html'
     context_object_name = 'locations'
     paginate_by = 20
+    keyset_field = 'timestamp'
     
     def get_queryset(self):
         return DeliveryAgentLocation.objects.filter(delivery_agent=self.request.user).order_by('-timestamp')
\ No newline at end of file
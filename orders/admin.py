@@ -1,7 +1,19 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
+from django.contrib import messages
 from django.utils.html import format_html
-from .models import ProductService, Order, OrderItem, OrderStatusHistory
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    ProductService, Order, OrderItem, OrderStatusHistory, StockReservation, IdempotencyKey,
+    ArchivedOrder, ArchivedOrderItem, ArchivedOrderStatusHistory, cancellable_q,
+)
+from .archive import order_number_of
+from .cancellation import SUPPLIER_UNAVAILABLE, cancel_and_refund
+from .catalog import catalog_changed
+from .stock import set_stock
+from .summary import customer_display_name, refresh_item_counts
+from .transitions import MAX_BULK_ORDERS, bulk_transition
 
 
 class OrderItemInline(admin.TabularInline):
@@ -23,24 +35,57 @@ class ProductServiceAdmin(admin.ModelAdmin):
     """
     Product/Service Admin
     """
-    list_display = ('name', 'category', 'price', 'stock_quantity', 'is_available', 'created_at')
+    list_display = ('name', 'category', 'price', 'stock_quantity', 'reserved_quantity', 'is_available', 'created_at')
     list_filter = ('category', 'is_available', 'created_at')
-    search_fields = ('name', 'description')
+    search_fields = ('name', 'sku', 'description')
     list_editable = ('is_available', 'stock_quantity')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('reserved_quantity', 'created_at', 'updated_at')
     
     fieldsets = (
         (_('মূল তথ্য'), {
-            'fields': ('name', 'description', 'category', 'price', 'is_available')
+            'fields': ('name', 'sku', 'description', 'category', 'price', 'is_available')
         }),
         (_('স্টক ও ছবি'), {
-            'fields': ('stock_quantity', 'image')
+            'fields': ('stock_quantity', 'reserved_quantity', 'stock_shards', 'image')
         }),
         (_('সময়'), {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Sharding is switched on and off with the stock_shards command
+        return self.readonly_fields + ('stock_shards',)
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.stock_shards and 'stock_quantity' in form.changed_data:
+            set_stock(obj, obj.stock_quantity)
+        catalog_changed()
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        catalog_changed()
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        catalog_changed()
+
+
+class CancellableFilter(admin.SimpleListFilter):
+    title = _('বাতিলযোগ্য')
+    parameter_name = 'cancellable'
+    
+    def lookups(self, request, model_admin):
+        return (('1', _('হ্যাঁ')), ('0', _('না')))
+    
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.cancellable()
+        if self.value() == '0':
+            return queryset.exclude(cancellable_q())
+        return queryset
 
 
 @admin.register(Order)
@@ -48,10 +93,11 @@ class OrderAdmin(admin.ModelAdmin):
     """
     Order Admin
     """
-    list_display = ('order_number', 'customer', 'delivery_type', 'status', 'total_amount', 'cancelled_at', 'created_at')
-    list_filter = ('status', 'delivery_type', 'created_at', 'delivery_city', 'cancelled_at')
-    search_fields = ('order_number', 'customer__username', 'customer__first_name', 'customer__last_name', 'delivery_address', 'cancellation_reason')
-    readonly_fields = ('order_number', 'created_at', 'updated_at', 'cancelled_at')
+    list_display = ('order_number', 'customer_name', 'delivery_type', 'status', 'item_count', 'total_amount', 'payment_state', 'cancelled_at', 'created_at')
+    list_filter = ('status', CancellableFilter, 'payment_state', 'delivery_type', 'created_at', 'delivery_city', 'cancelled_at')
+    search_fields = ('order_number', 'customer_name', 'customer__username', 'delivery_address', 'cancellation_reason')
+    readonly_fields = ('order_number', 'created_at', 'updated_at', 'cancelled_at',
+                       'item_count', 'customer_name', 'status_changed_at', 'payment_state')
     inlines = [OrderItemInline, OrderStatusHistoryInline]
     
     fieldsets = (
@@ -68,14 +114,79 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('cancellation_reason', 'cancellation_notes', 'cancelled_at', 'cancelled_by', 'refund_preference'),
             'classes': ('collapse',)
         }),
+        (_('সারাংশ'), {
+            'fields': ('item_count', 'customer_name', 'status_changed_at', 'payment_state'),
+            'classes': ('collapse',)
+        }),
         (_('সময়'), {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
     
+    actions = ['mark_confirmed', 'mark_processing', 'mark_dispatched', 'mark_delivered', 'mark_returned',
+               'cancel_supplier_unavailable']
+    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('customer').prefetch_related('items')
+        # The list reads the summary columns, so no joins are needed
+        return super().get_queryset(request)
+    
+    def save_model(self, request, obj, form, change):
+        if 'customer' in form.changed_data:
+            obj.customer_name = customer_display_name(obj.customer)
+        if change and 'status' in form.changed_data:
+            obj.status_changed_at = timezone.now()
+        super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_item_counts([form.instance.pk])
+    
+    def _transition(self, request, queryset, status):
+        # bulk_transition takes a limited number of orders per call
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        results = []
+        for start in range(0, len(ids), MAX_BULK_ORDERS):
+            results += bulk_transition(ids[start:start + MAX_BULK_ORDERS], status, user=request.user)
+        moved = sum(1 for result in results if result['success'])
+        self.message_user(request, _('%(moved)d টি অর্ডার "%(status)s" অবস্থায় নেওয়া হয়েছে') % {
+            'moved': moved, 'status': dict(Order.ORDER_STATUS_CHOICES)[status]
+        })
+        skipped = len(results) - moved
+        if skipped:
+            self.message_user(request, _('%(skipped)d টি অর্ডারের অবস্থা বদলানো যায়নি') % {
+                'skipped': skipped
+            }, messages.WARNING)
+    
+    @admin.action(description=_('নিশ্চিত হিসেবে চিহ্নিত করুন'))
+    def mark_confirmed(self, request, queryset):
+        self._transition(request, queryset, 'confirmed')
+    
+    @admin.action(description=_('প্রক্রিয়াধীন হিসেবে চিহ্নিত করুন'))
+    def mark_processing(self, request, queryset):
+        self._transition(request, queryset, 'processing')
+    
+    @admin.action(description=_('প্রেরিত হিসেবে চিহ্নিত করুন'))
+    def mark_dispatched(self, request, queryset):
+        self._transition(request, queryset, 'dispatched')
+    
+    @admin.action(description=_('ডেলিভারি সম্পন্ন হিসেবে চিহ্নিত করুন'))
+    def mark_delivered(self, request, queryset):
+        self._transition(request, queryset, 'delivered')
+    
+    @admin.action(description=_('ফেরত হিসেবে চিহ্নিত করুন'))
+    def mark_returned(self, request, queryset):
+        self._transition(request, queryset, 'returned')
+    
+    @admin.action(description=_('সরবরাহ না থাকায় বাতিল ও রিফান্ড করুন'))
+    def cancel_supplier_unavailable(self, request, queryset):
+        selected = queryset.count()
+        cancelled = cancel_and_refund(queryset, user=request.user, reason=SUPPLIER_UNAVAILABLE)
+        self.message_user(request, _('%(cancelled)d টি অর্ডার বাতিল হয়েছে') % {'cancelled': cancelled})
+        if selected > cancelled:
+            self.message_user(request, _('%(skipped)d টি অর্ডার আর বাতিল করা যায় না') % {
+                'skipped': selected - cancelled
+            }, messages.WARNING)
 
 
 @admin.register(OrderItem)
@@ -103,4 +214,96 @@ class OrderStatusHistoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('order', 'created_by')
\ No newline at end of file
+        return super().get_queryset(request).select_related('order', 'created_by')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    """
+    Stock Reservation Admin
+    """
+    list_display = ('product', 'customer', 'quantity', 'expires_at', 'created_at')
+    list_filter = ('expires_at',)
+    search_fields = ('product__name', 'customer__username')
+    readonly_fields = ('created_at',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'customer')
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    """
+    Idempotency Key Admin
+    """
+    list_display = ('scope', 'key', 'status_code', 'expires_at', 'created_at')
+    list_filter = ('scope', 'status_code')
+    search_fields = ('key',)
+    readonly_fields = ('created_at',)
+
+
+class ArchivedOrderRowsMixin:
+    """
+    Admin of rows that outlive their order in the archive.
+
+    The order hop must be prefetched, not joined, or rows of archived orders
+    drop out of the changelist and change page; the order number search
+    also looks through the archive.
+    """
+    order_field = 'order'
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            archived = ArchivedOrder.objects.filter(order_number__icontains=search_term).values('pk')
+            results = queryset.filter(
+                Q(pk__in=results.values('pk')) | Q(**{f'{self.order_field}_id__in': archived})
+            )
+        return results, may_have_duplicates
+    
+    def get_readonly_fields(self, request, obj=None):
+        # An archived order is no valid choice for the order field
+        fields = super().get_readonly_fields(request, obj)
+        if self.order_field == 'order' and obj is not None and not Order.objects.filter(pk=obj.order_id).exists():
+            fields = (*fields, 'order')
+        return fields
+    
+    @admin.display(description=_('অর্ডার'))
+    def order_number(self, obj):
+        return order_number_of(obj)
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    fields = ('product_name', 'quantity', 'unit_price', 'total_price')
+    readonly_fields = fields
+
+
+class ArchivedOrderStatusHistoryInline(admin.TabularInline):
+    model = ArchivedOrderStatusHistory
+    extra = 0
+    can_delete = False
+    fields = ('status', 'notes', 'created_by', 'created_at')
+    readonly_fields = fields
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """
+    Archived Order Admin (read only)
+    """
+    list_display = ('order_number', 'customer', 'status', 'total_amount', 'created_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('order_number', 'customer__username')
+    inlines = [ArchivedOrderItemInline, ArchivedOrderStatusHistoryInline]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('customer')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
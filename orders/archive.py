@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedOrderStatusHistory,
+    Order, OrderItem, OrderStatusHistory,
+)
+
+# Orders in these states never change again and are safe to move
+FINISHED_STATUSES = ('delivered', 'cancelled', 'returned')
+
+# Rows that move into the archive together with their order. Payments,
+# deliveries and reviews stay where they are and keep the order's id, which
+# the archive keeps too; their foreign keys carry no database constraint, so
+# anything reading them through ``order`` has to use the helpers below to
+# also find the archived orders.
+MOVED_MODELS = (OrderItem, OrderStatusHistory)
+
+
+def archive_after():
+    """
+    How long a finished order stays in the live tables
+    """
+    return timedelta(days=getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365))
+
+
+def archivable_orders(cutoff=None):
+    """
+    Finished orders untouched since ``cutoff``
+    """
+    cutoff = cutoff or timezone.now() - archive_after()
+    return Order.objects.filter(status__in=FINISHED_STATUSES, updated_at__lt=cutoff)
+
+
+def _delete_orders(ids):
+    # A plain DELETE: the ORM would cascade to the payments, deliveries and
+    # reviews that are meant to outlive the live row
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(Order._meta.db_table)} WHERE id IN ({placeholders})', ids
+        )
+
+
+def _copy(instance, model, **extra):
+    fields = {
+        field.attname: getattr(instance, field.attname)
+        for field in model._meta.concrete_fields
+        if hasattr(instance, field.attname)
+    }
+    fields.update(extra)
+    return model(**fields)
+
+
+def archive_batch(order_ids, cutoff=None):
+    """
+    Move the given orders, their items and history in one transaction.
+
+    Each table is written with one bulk INSERT and the live rows go with one
+    DELETE per table; rows of other tables that reference the orders keep
+    their order id. Returns the number of orders moved; ids that stopped
+    being archivable are skipped.
+    """
+    with transaction.atomic():
+        orders = list(archivable_orders(cutoff).filter(pk__in=order_ids).select_for_update())
+        if not orders:
+            return 0
+        ids = [order.pk for order in orders]
+        now = timezone.now()
+
+        ArchivedOrder.objects.bulk_create([_copy(order, ArchivedOrder, archived_at=now) for order in orders])
+        ArchivedOrderItem.objects.bulk_create([
+            _copy(item, ArchivedOrderItem, product_name=item.product.name)
+            for item in OrderItem.objects.filter(order_id__in=ids).select_related('product')
+        ])
+        ArchivedOrderStatusHistory.objects.bulk_create([
+            _copy(entry, ArchivedOrderStatusHistory)
+            for entry in OrderStatusHistory.objects.filter(order_id__in=ids)
+        ])
+
+        OrderStatusHistory.objects.filter(order_id__in=ids).delete()
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        _delete_orders(ids)
+    return len(ids)
+
+
+def archive_orders(cutoff=None, batch_size=500):
+    """
+    Move every archivable order in batches; returns the number moved.
+
+    Each batch is its own short transaction, so live checkouts are only
+    blocked for one batch at a time.
+    """
+    cutoff = cutoff or timezone.now() - archive_after()
+    moved = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            archivable_orders(cutoff).filter(pk__gt=last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return moved
+        moved += archive_batch(ids, cutoff)
+        last_pk = ids[-1]
+
+
+def find_archived_order(user, pk=None, order_number=None):
+    """
+    An archived order the user may see, by id or order number, or None
+    """
+    orders = ArchivedOrder.objects.select_related('customer', 'cancelled_by').prefetch_related(
+        'items__product', 'status_history'
+    )
+    if not (user.is_staff or user.is_superuser):
+        orders = orders.filter(customer=user)
+    if pk is not None:
+        orders = orders.filter(pk=pk)
+    if order_number is not None:
+        orders = orders.filter(order_number=order_number)
+    return orders.first()
+
+
+def customer_orders_q(field='order', **lookups):
+    """
+    Match rows whose ``field`` is a live or archived order with a customer
+    passing ``lookups``, e.g. ``customer_orders_q(customer=user)``
+    """
+    # Both sides go through the order id: a join to the live order would be
+    # an inner one and drop the archived rows again
+    live = Q(**{f'{field}_id__in': Order.objects.filter(**lookups).values('pk')})
+    archived = Q(**{f'{field}_id__in': ArchivedOrder.objects.filter(**lookups).values('pk')})
+    return live | archived
+
+
+def order_customer(field='order'):
+    """
+    Customer id of the live or archived order ``field`` refers to
+    """
+    return Coalesce(
+        Subquery(Order.objects.filter(pk=OuterRef(f'{field}_id')).values('customer_id')[:1]),
+        Subquery(ArchivedOrder.objects.filter(pk=OuterRef(f'{field}_id')).values('customer_id')[:1]),
+    )
+
+
+def order_number_of(row):
+    """
+    Order number of ``row.order``, read from the archive once the order moved
+    """
+    try:
+        order = row.order
+    except Order.DoesNotExist:
+        order = None
+    if order is not None:
+        return order.order_number
+    number = ArchivedOrder.objects.filter(pk=row.order_id).values_list('order_number', flat=True).first()
+    return number or str(row.order_id)
@@ -0,0 +1,201 @@
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.utils import timezone
+
+from dashboard import events, rollups
+from payments.models import Payment, Refund
+
+from .checkout import quantity_case
+from .models import Order, OrderItem, OrderStatusHistory, ProductService, cancellable_q
+from .stock import give_back
+from .timeline import timeline_changed
+from .transitions import MAX_BULK_ORDERS, TransitionConflict, TransitionError
+
+# Reason recorded when staff cancel orders the shop cannot fulfil
+SUPPLIER_UNAVAILABLE = 'supplier_unavailable'
+
+# Reason recorded when staff cancel an order from the status controls
+STAFF_DECISION = 'staff_decision'
+
+NO_REFUND = 'no_refund_needed'
+
+REFUND_TO_PAYMENT_METHOD = 'refund_to_payment_method'
+
+
+def restore_stock(order_ids):
+    """
+    Put the items of the given orders back in stock.
+
+    Quantities are summed per product first, so every product row is written
+    once: plain products with one ``F()`` UPDATE for all of them, sharded
+    products with one shard UPDATE each.
+    """
+    totals = list(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('product', 'product__stock_shards')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    plain = {row['product']: row['quantity'] for row in totals if not row['product__stock_shards']}
+    if plain:
+        ProductService.objects.filter(pk__in=list(plain)).update(
+            stock_quantity=F('stock_quantity') + quantity_case(plain),
+            updated_at=timezone.now()
+        )
+    for row in totals:
+        if row['product__stock_shards']:
+            give_back(ProductService(pk=row['product'], stock_shards=row['product__stock_shards']),
+                      row['quantity'])
+    return {row['product']: row['quantity'] for row in totals}
+
+
+def create_refunds(orders, reason, user=None):
+    """
+    Raise a pending refund against the latest completed payment of each ``(order id, amount)``.
+
+    Orders with no completed payment have nothing to refund and are skipped.
+    """
+    amounts = dict(orders)
+    payments = {}
+    for payment_id, order_id in Payment.objects.filter(
+        order_id__in=list(amounts), status='completed'
+    ).values_list('pk', 'order_id'):
+        payments.setdefault(order_id, payment_id)  # newest first, as Payment orders by -created_at
+    return Refund.objects.bulk_create([
+        Refund(
+            payment_id=payment_id,
+            amount=amounts[order_id],
+            reason=f'Order cancellation: {reason}',
+            status='pending',
+            processed_by=user
+        )
+        for order_id, payment_id in payments.items()
+    ])
+
+
+def cancel_orders(order_ids, user=None, reason='', notes='', refund_preference=None, now=None):
+    """
+    Cancel many orders at once.
+
+    Orders that can still be cancelled are changed with one conditional
+    UPDATE that also fills the cancellation columns. History and refund
+    rows are written with one bulk INSERT each and stock goes back with one
+    UPDATE per product table, so the cost does not grow with the number of
+    orders beyond the size of the statements. Returns one result dict per
+    requested order id, in the order given, like ``bulk_transition``.
+    """
+    order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise ValueError(f'At most {MAX_BULK_ORDERS} orders per call')
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        rows = {
+            pk: (status, cancellable, amount, created_at)
+            for pk, status, cancellable, amount, created_at in Order.objects.select_for_update()
+            .filter(pk__in=order_ids).with_cancellation(now).order_by()
+            .values_list('pk', 'status', 'is_cancellable', 'total_amount', 'created_at')
+        }
+        eligible = [pk for pk in order_ids if pk in rows and rows[pk][1]]
+
+        moved = set()
+        if eligible:
+            updated = Order.objects.filter(cancellable_q(now), pk__in=eligible).update(
+                status='cancelled', updated_at=now, status_changed_at=now,
+                cancelled_at=now, cancelled_by=user, cancellation_reason=reason,
+                cancellation_notes=notes, refund_preference=refund_preference
+            )
+            moved = set(eligible)
+            if updated != len(eligible):
+                # Without row locks (SQLite) a concurrent writer may have won
+                moved = set(
+                    Order.objects.filter(pk__in=eligible, status='cancelled', cancelled_at=now)
+                    .values_list('pk', flat=True)
+                )
+
+        if moved:
+            who = f' by {user.get_full_name() or user.username}' if user else ''
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(
+                    order_id=pk,
+                    status='cancelled',
+                    notes=f'Order cancelled{who}. Reason: {reason}',
+                    created_by=user
+                )
+                for pk in order_ids if pk in moved
+            ])
+            restore_stock(moved)
+            if refund_preference and refund_preference != NO_REFUND:
+                create_refunds([(pk, rows[pk][2]) for pk in moved], reason, user)
+            timeline_changed(moved)
+            rollups.touch('orders', *(rows[pk][3] for pk in moved))
+            events.orders_changed(moved)
+
+    results = []
+    for pk in order_ids:
+        if pk in moved:
+            results.append({'order_id': pk, 'success': True, 'from': rows[pk][0], 'status': 'cancelled'})
+        elif pk not in rows:
+            results.append({'order_id': pk, 'success': False, 'message': 'Order not found'})
+        elif pk in eligible:
+            results.append({'order_id': pk, 'success': False, 'status': rows[pk][0],
+                            'message': 'Order was changed by someone else'})
+        else:
+            results.append({'order_id': pk, 'success': False, 'status': rows[pk][0],
+                            'message': 'Order can no longer be cancelled'})
+    return results
+
+
+def cancel_matching(queryset, batch_size=500, **kwargs):
+    """
+    Cancel every cancellable order of ``queryset`` in batches; returns the number cancelled.
+
+    Each batch is its own transaction, so stock and refunds for the orders
+    already handled stay committed if a later batch fails.
+    """
+    batch_size = min(batch_size, MAX_BULK_ORDERS)
+    cancelled = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.cancellable(kwargs.get('now')).filter(pk__gt=last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return cancelled
+        cancelled += sum(1 for result in cancel_orders(ids, **kwargs) if result['success'])
+        last_pk = ids[-1]
+
+
+def cancel_and_refund(queryset, **kwargs):
+    """
+    Cancel like ``cancel_matching``, refunding paid orders to their payment method.
+
+    Orders without a completed payment are recorded as needing no refund
+    rather than promised one. Returns the number cancelled.
+    """
+    paid = Exists(Payment.objects.filter(order=OuterRef('pk'), status='completed'))
+    return (
+        cancel_matching(queryset.filter(paid), refund_preference=REFUND_TO_PAYMENT_METHOD, **kwargs)
+        + cancel_matching(queryset.filter(~paid), refund_preference=NO_REFUND, **kwargs)
+    )
+
+
+def cancel_order(order, user=None, reason=STAFF_DECISION, notes=''):
+    """
+    Cancel one order like ``cancel_and_refund``, for callers of ``transition``.
+
+    Raises TransitionConflict if the order's status changed since ``order``
+    was read and TransitionError if it cannot be cancelled at all.
+    """
+    paid = Payment.objects.filter(order=order, status='completed').exists()
+    result, = cancel_orders(
+        [order.pk], user=user, reason=reason, notes=notes,
+        refund_preference=REFUND_TO_PAYMENT_METHOD if paid else NO_REFUND
+    )
+    if not result['success']:
+        if result.get('status', order.status) != order.status:
+            raise TransitionConflict(order.pk, order.status, result['status'])
+        raise TransitionError(result['message'])
+    order.status = 'cancelled'
+    return order
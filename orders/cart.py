@@ -0,0 +1,211 @@
+from decimal import Decimal
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import catalog
+from .checkout import CheckoutError
+from .models import SavedCart
+
+SESSION_KEY = 'cart'
+
+# Positions in a stored cart line
+QUANTITY, PRICE, VERSION, SHARDS = range(4)
+
+
+def max_lines():
+    """
+    How many different products one cart may hold
+    """
+    return getattr(settings, 'CART_MAX_LINES', 100)
+
+
+def cart_timeout():
+    """
+    How long a logged-in customer's cart is kept after its last change
+    """
+    return getattr(settings, 'CART_TIMEOUT', 30 * 24 * 60 * 60)
+
+
+def _quantity(value):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise CheckoutError('Invalid quantity')
+    if quantity < 1:
+        raise CheckoutError('Invalid quantity')
+    return quantity
+
+
+class Cart:
+    """
+    A customer's cart kept on the server.
+
+    Lines are stored compactly as ``{product_id: [quantity, price, version,
+    shards]}``: the price and stock shard count are a snapshot of the product
+    taken from the catalog cache, under the catalog version current at the
+    time. Logged-in carts are one ``SavedCart`` row, written with a single
+    upsert, so they follow the customer across devices and workers and
+    survive restarts; anonymous carts live in the session and are merged
+    into the customer's cart on login. Adding or removing a product only
+    changes its own line.
+    """
+    def __init__(self, lines=None, user_id=None, session=None):
+        self.lines = dict(lines or {})
+        self.user_id = user_id
+        self.session = session
+
+    @classmethod
+    def for_user(cls, user_id):
+        since = timezone.now() - timedelta(seconds=cart_timeout())
+        lines = SavedCart.objects.filter(pk=user_id, updated_at__gte=since).values_list('lines', flat=True).first()
+        return cls(lines, user_id=user_id)
+
+    @classmethod
+    def for_request(cls, request):
+        if request.user.is_authenticated:
+            return cls.for_user(request.user.pk)
+        return cls(request.session.get(SESSION_KEY), session=request.session)
+
+    def save(self):
+        if self.user_id is not None:
+            SavedCart.objects.bulk_create(
+                [SavedCart(user_id=self.user_id, lines=self.lines, updated_at=timezone.now())],
+                update_conflicts=True, unique_fields=['user'], update_fields=['lines', 'updated_at'],
+            )
+        else:
+            self.session[SESSION_KEY] = self.lines
+
+    def clear(self):
+        self.lines = {}
+        if self.user_id is not None:
+            SavedCart.objects.filter(pk=self.user_id).delete()
+        else:
+            self.session.pop(SESSION_KEY, None)
+
+    def add(self, product_id, quantity=1):
+        """
+        Add ``quantity`` of a product and refresh its snapshot; returns the line
+        """
+        quantity = _quantity(quantity)
+        # Read the version first: a bump in between then only makes the
+        # snapshot look older than it is, never newer
+        version = catalog.catalog_version()
+        try:
+            product = catalog.get_product(int(product_id), version)
+        except (TypeError, ValueError):
+            product = None
+        if product is None or not product.is_available:
+            raise CheckoutError('Product not available')
+
+        key = str(product.pk)
+        if key not in self.lines and len(self.lines) >= max_lines():
+            raise CheckoutError('Cart is full')
+        quantity += self.lines.get(key, [0])[QUANTITY]
+        self.lines[key] = [quantity, str(product.price), version, product.stock_shards]
+        self.save()
+        return self.lines[key]
+
+    def remove(self, product_id, quantity=None):
+        """
+        Take ``quantity`` of a product out of the cart, or the whole line if None
+        """
+        key = str(product_id)
+        line = self.lines.get(key)
+        if line is None:
+            return None
+        if quantity is None or _quantity(quantity) >= line[QUANTITY]:
+            del self.lines[key]
+            line = None
+        else:
+            line[QUANTITY] -= int(quantity)
+        self.save()
+        return line
+
+    def merge(self, lines):
+        """
+        Add another cart's lines to this one, keeping the newer snapshot of each product
+        """
+        for key, line in lines.items():
+            mine = self.lines.get(key)
+            if mine is None:
+                if len(self.lines) < max_lines():
+                    self.lines[key] = list(line)
+                continue
+            quantity = mine[QUANTITY] + line[QUANTITY]
+            newer = line if line[VERSION] > mine[VERSION] else mine
+            self.lines[key] = [quantity] + list(newer[PRICE:])
+        self.save()
+
+    def items(self):
+        """
+        The lines in the ``cart_items`` form checkout takes
+        """
+        return [{'id': int(key), 'quantity': line[QUANTITY]} for key, line in self.lines.items()]
+
+    def total_amount(self):
+        return sum((Decimal(line[PRICE]) * line[QUANTITY] for line in self.lines.values()), Decimal('0.00'))
+
+    def fresh_snapshot(self):
+        """
+        ``{product_id: (price, shards)}`` if no line predates the current catalog version, else None.
+
+        Only a hint for the checkout, which still compares it with the product rows.
+        """
+        version = catalog.catalog_version()
+        if not self.lines or any(line[VERSION] != version for line in self.lines.values()):
+            return None
+        return {int(key): (Decimal(line[PRICE]), line[SHARDS]) for key, line in self.lines.items()}
+
+    def summary(self):
+        return {
+            'item_count': len(self.lines),
+            'total_quantity': sum(line[QUANTITY] for line in self.lines.values()),
+            'total_amount': str(self.total_amount()),
+        }
+
+    def detail(self):
+        """
+        The cart with product names, for display
+        """
+        items = []
+        for key, line in self.lines.items():
+            product = catalog.get_product(int(key))
+            items.append({
+                'id': int(key),
+                'name': product.name if product else '',
+                'quantity': line[QUANTITY],
+                'price': line[PRICE],
+                'total': str(Decimal(line[PRICE]) * line[QUANTITY]),
+                'available': bool(product and product.is_available),
+            })
+        return dict(self.summary(), items=items)
+
+
+def purge_expired_carts(now=None, batch_size=1000):
+    """
+    Delete carts left untouched for longer than ``cart_timeout()``; returns the number deleted
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=cart_timeout())
+    purged = 0
+    while True:
+        batch = list(
+            SavedCart.objects.filter(updated_at__lt=cutoff).order_by('updated_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return purged
+        purged += SavedCart.objects.filter(pk__in=batch, updated_at__lt=cutoff).delete()[0]
+        if len(batch) < batch_size:
+            return purged
+
+
+def merge_session_cart(session, user):
+    """
+    Move the anonymous cart of ``session`` into ``user``'s cart
+    """
+    lines = session.pop(SESSION_KEY, None)
+    if lines:
+        Cart.for_user(user.pk).merge(lines)
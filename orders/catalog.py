@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import CatalogVersion, ProductService
+
+# The single CatalogVersion row
+VERSION_PK = 1
+
+
+def cache_timeout():
+    """
+    How long a cached catalog entry lives if its version is never bumped
+    """
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def catalog_version():
+    """
+    Return the current catalog version, starting at 1.
+
+    Read from the database on every call: the cache may be local to this
+    process and would miss bumps made by the others. Callers reading
+    several entries should read the version once and pass it on.
+    """
+    version = CatalogVersion.objects.filter(pk=VERSION_PK).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog entry at once.
+
+    Entries are keyed by version, so nothing is deleted: readers simply stop
+    finding the old keys and the stale ones expire on their own.
+    """
+    with transaction.atomic():
+        if not CatalogVersion.objects.filter(pk=VERSION_PK).update(version=F('version') + 1):
+            _, created = CatalogVersion.objects.get_or_create(pk=VERSION_PK, defaults={'version': 2})
+            if not created:
+                CatalogVersion.objects.filter(pk=VERSION_PK).update(version=F('version') + 1)
+        return CatalogVersion.objects.get(pk=VERSION_PK).version
+
+
+def catalog_changed():
+    """
+    Bump the catalog version once the current transaction commits.
+
+    Bumping after commit keeps readers from caching the pre-write rows under
+    the new version while the write is still in flight.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+def _cached(name, build, version=None):
+    key = f'catalog:{version or catalog_version()}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, cache_timeout())
+    return value
+
+
+def with_live_stock(products):
+    """
+    Replace the cached stock figures of ``products`` with the current ones, in one query.
+
+    Stock changes with every order, reservation and cancellation, none of
+    which bump the catalog version, so cached rows are only trusted for
+    what the catalog writes change: names, prices and availability.
+    """
+    from .stock import live_stock  # orders.stock imports this module
+
+    products = list(products)
+    if products:
+        stock = {
+            pk: (quantity, reserved)
+            for pk, quantity, reserved in ProductService.objects.filter(pk__in=[product.pk for product in products])
+            .annotate(live_stock=live_stock()).values_list('pk', 'live_stock', 'reserved_quantity')
+        }
+        for product in products:
+            if product.pk in stock:
+                product.stock_quantity, product.reserved_quantity = stock[product.pk]
+    return products
+
+
+def categories(version=None):
+    """
+    Distinct product categories
+    """
+    return _cached('categories', lambda: list(
+        ProductService.objects.order_by('category').values_list('category', flat=True).distinct()
+    ), version)
+
+
+def get_product(pk, version=None):
+    """
+    Return a product by primary key, or None if it does not exist
+    """
+    return _cached(f'product:{pk}', lambda: ProductService.objects.filter(pk=pk).first(), version)
+
+
+def featured_products(limit=6, version=None):
+    """
+    The first available products shown on the home page, with live stock
+    """
+    return with_live_stock(_cached(f'featured:{limit}', lambda: list(
+        ProductService.objects.filter(is_available=True).order_by('-created_at')[:limit]
+    ), version))
+
+
+class CachedProductList:
+    """
+    Available products, newest first, served from the catalog cache.
+
+    Behaves like a sliceable queryset for ``Paginator``: the total and every
+    page are cached separately under the version read when the list is
+    made, so a warm page costs two queries: the version and the live stock
+    of its products.
+    """
+    def __init__(self, category=None, per_page=12, version=None):
+        self.category = category
+        self.per_page = per_page
+        self.version = version or catalog_version()
+        self.model = ProductService
+
+    def _queryset(self):
+        queryset = ProductService.objects.filter(is_available=True)
+        if self.category is not None:
+            queryset = queryset.filter(category=self.category)
+        return queryset.order_by('-created_at', '-id')
+
+    def _name(self, part):
+        return f'list:{self.category or "*"}:{self.per_page}:{part}'
+
+    def count(self):
+        return _cached(self._name('count'), lambda: self._queryset().count(), self.version)
+
+    def __len__(self):
+        return self.count()
+
+    def page(self, number):
+        """
+        Products on the given zero-based page
+        """
+        start = number * self.per_page
+        return _cached(self._name(number), lambda: list(
+            self._queryset()[start:start + self.per_page]
+        ), self.version)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self.count())
+        if start >= stop:
+            return []
+        rows = []
+        first_page = start // self.per_page
+        for number in range(first_page, (stop - 1) // self.per_page + 1):
+            rows.extend(self.page(number))
+        offset = start - first_page * self.per_page
+        return with_live_stock(rows[offset:offset + stop - start])
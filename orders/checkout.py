@@ -0,0 +1,230 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import ProductService, Order, OrderItem, OrderStatusHistory, StockReservation
+from .numbering import next_order_number
+from .stock import shard_totals, take
+
+
+class StockConflict(Exception):
+    """
+    Raised inside the checkout transaction when a concurrent order took the stock
+    """
+
+
+class CheckoutError(Exception):
+    """
+    Raised when a cart cannot be turned into an order
+    """
+    def __init__(self, message, out_of_stock_items=None):
+        super().__init__(message)
+        self.message = message
+        self.out_of_stock_items = out_of_stock_items or []
+
+
+def normalize_cart(cart_items):
+    """
+    Collapse cart lines into an ordered {product_id: quantity} mapping
+    """
+    lines = {}
+    for item in cart_items:
+        try:
+            product_id = int(item['id'])
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError('Invalid cart item')
+        if quantity < 1:
+            raise CheckoutError(f'Invalid quantity for product {product_id}')
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    return lines
+
+
+def out_of_stock_message(out_of_stock_items):
+    """
+    Build the customer-facing message listing unavailable products
+    """
+    error_message = "নিম্নলিখিত পণ্যগুলি স্টকে নেই:\n"
+    for item in out_of_stock_items:
+        error_message += f"• {item['name']}: {item['status']}\n"
+    return error_message
+
+
+def quantity_case(lines):
+    """
+    Build a CASE expression mapping product ids to quantities
+    """
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in lines.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def decrement_stock(lines, held=None):
+    """
+    Decrement stock for every product in one conditional UPDATE.
+
+    Quantities the customer already holds through cart reservations are
+    converted: they leave ``reserved_quantity`` together with the stock. Each
+    row is only touched if it still has enough stock, so the number of updated
+    rows tells us whether a concurrent checkout got there first.
+    """
+    if not lines:
+        return True
+    held = held or {}
+    quantities = quantity_case(lines)
+    updates = {
+        'stock_quantity': F('stock_quantity') - quantities,
+        'updated_at': timezone.now(),
+    }
+    available = F('stock_quantity') - F('reserved_quantity')
+    if held:
+        held_quantities = quantity_case(held)
+        updates['reserved_quantity'] = F('reserved_quantity') - held_quantities
+        available = available + held_quantities
+    updated = ProductService.objects.alias(available=available).filter(
+        pk__in=list(lines),
+        available__gte=quantities,
+    ).update(**updates)
+    return updated == len(lines)
+
+
+def _out_of_stock_items(products, lines, stock, held):
+    """
+    List the cart lines that the given stock levels cannot cover
+    """
+    out_of_stock_items = []
+    for product_id, quantity in lines.items():
+        product = products[product_id]
+        available = max(stock[product_id] - product.reserved_quantity, 0)
+        if not product.is_available or available + held.get(product_id, 0) < quantity:
+            out_of_stock_items.append({
+                'name': product.name,
+                'requested': quantity,
+                'available': available,
+                'status': product.get_stock_status(available)
+            })
+    return out_of_stock_items
+
+
+def place_order(customer, cart_items, delivery_address='', delivery_city='ঢাকা',
+                special_instructions='', order_number=None, snapshot=None):
+    """
+    Create an order, its items and the stock decrements in one transaction.
+
+    The query count does not depend on the number of cart lines: products are
+    loaded with one SELECT, items are written with one bulk INSERT and stock is
+    reduced with one conditional UPDATE. Any stock the customer reserved from
+    the cart is converted into the order instead of being checked again.
+
+    Products with sharded stock counters are decremented through their shards
+    so the hot product row is never written or locked here; the conditional
+    updates are what prevent overselling, so product rows are read unlocked.
+
+    ``snapshot`` maps product ids to ``(price, stock_shards)`` as a server
+    cart recorded them under the current catalog version. The products are
+    still loaded and their availability and prices checked; only when every
+    line matches its snapshot is the stock read and pre-check skipped, since
+    the conditional stock updates decide whether the order goes through
+    anyway and the products are then only read again to explain a failure.
+    """
+    lines = normalize_cart(cart_items)
+    if not lines:
+        raise CheckoutError('Cart is empty')
+
+    try:
+        with transaction.atomic():
+            products = ProductService.objects.in_bulk(list(lines))
+            missing = [product_id for product_id in lines if product_id not in products]
+            if missing:
+                raise CheckoutError(f'Product {missing[0]} not found')
+
+            # Anything off the snapshot, unavailable products included, goes
+            # through the full check so it is reported like any other line
+            prevalidated = snapshot is not None and all(
+                products[product_id].is_available
+                and snapshot.get(product_id) == (products[product_id].price, products[product_id].stock_shards)
+                for product_id in lines
+            )
+
+            # Locked so the expiry sweeper (which skips locked holds) cannot
+            # release them too while they are converted into this order
+            holds = list(
+                StockReservation.objects.select_for_update()
+                .filter(customer=customer, product_id__in=list(lines))
+                .values_list('pk', 'product_id', 'quantity')
+            )
+            held = {product_id: quantity for _, product_id, quantity in holds}
+            sharded = [product_id for product_id in lines if products[product_id].stock_shards]
+            if not prevalidated:
+                stock = {product_id: product.stock_quantity for product_id, product in products.items()}
+                stock.update(shard_totals(sharded))
+
+                out_of_stock_items = _out_of_stock_items(products, lines, stock, held)
+                if out_of_stock_items:
+                    raise CheckoutError(out_of_stock_message(out_of_stock_items), out_of_stock_items)
+
+            items = []
+            total_amount = Decimal('0.00')
+            for product_id, quantity in lines.items():
+                product = products[product_id]
+                item_total = product.price * quantity
+                total_amount += item_total
+                items.append(OrderItem(
+                    product=product,
+                    quantity=quantity,
+                    unit_price=product.price,
+                    total_price=item_total
+                ))
+
+            order = Order.objects.create(
+                order_number=order_number or next_order_number(),
+                customer=customer,
+                delivery_address=delivery_address,
+                delivery_city=delivery_city,
+                total_amount=total_amount,
+                status='pending',
+                special_instructions=special_instructions,
+                item_count=len(items)
+            )
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+
+            plain_lines = {pid: qty for pid, qty in lines.items() if pid not in sharded}
+            plain_held = {pid: qty for pid, qty in held.items() if pid not in sharded}
+            decremented = decrement_stock(plain_lines, plain_held)
+            for product_id in sharded:
+                decremented = take(products[product_id], lines[product_id], held.get(product_id, 0)) and decremented
+            if not decremented:
+                # Someone else took the stock between our read and write
+                raise StockConflict
+
+            if held:
+                sharded_held = {pid: qty for pid, qty in held.items() if pid in sharded}
+                if sharded_held:
+                    ProductService.objects.filter(pk__in=list(sharded_held)).update(
+                        reserved_quantity=F('reserved_quantity') - quantity_case(sharded_held)
+                    )
+                deleted, _ = StockReservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+                if deleted != len(holds):
+                    # Released elsewhere after all; their stock must not be released twice
+                    raise StockConflict
+
+            OrderStatusHistory.objects.create(
+                order=order,
+                status='pending',
+                notes='Order created from cart',
+                created_by=customer
+            )
+    except StockConflict:
+        # Re-read stock after the rollback so the report shows what is left
+        stock = dict(ProductService.objects.filter(pk__in=list(lines)).values_list('pk', 'stock_quantity'))
+        stock.update(shard_totals(sharded))
+        out_of_stock_items = _out_of_stock_items(products, lines, stock, held)
+        raise CheckoutError(out_of_stock_message(out_of_stock_items), out_of_stock_items)
+
+    return order
@@ -0,0 +1,226 @@
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def key_ttl():
+    """
+    How long a stored response is replayed for its key
+    """
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def lock_timeout():
+    """
+    How long a claimed key may stay in flight before another request takes it over
+    """
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+
+def wait_timeout():
+    """
+    How long a duplicate waits for the first request's response before giving up
+    """
+    return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 5)
+
+
+def header_key(request):
+    """
+    The client's ``Idempotency-Key`` header, scoped to the logged-in user
+    """
+    key = request.META.get(HEADER, '').strip()
+    if key and request.user.is_authenticated:
+        return f'{request.user.pk}:{key}'
+    return key
+
+
+def request_fingerprint(request):
+    """
+    Hash of what the request asks for, to catch a key reused for another request
+    """
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.META.get('QUERY_STRING', '')):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def lookup(scope, key):
+    """
+    The record stored for ``key``, found through the unique index, or None
+    """
+    try:
+        return IdempotencyKey.objects.get(scope=scope, key=key)
+    except IdempotencyKey.DoesNotExist:
+        return None
+
+
+def claim(scope, key, request_hash=''):
+    """
+    Try to become the request that handles ``key``.
+
+    Returns ``(record, claimed)``. A retry finds its record with one indexed
+    SELECT. A new key is claimed with a plain INSERT against the unique
+    (scope, key) index, so of several concurrent duplicates exactly one wins
+    and the rest get the winner's record. An expired record, or one whose
+    handler died without storing a response, is taken over with a
+    compare-and-set UPDATE so only one request can revive it.
+    """
+    record = None
+    for _ in range(3):
+        now = timezone.now()
+        record = lookup(scope, key)
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        scope=scope, key=key, request_hash=request_hash,
+                        locked_until=now + lock_timeout(), expires_at=now + key_ttl()
+                    )
+                return record, True
+            except IntegrityError:
+                continue  # a concurrent duplicate inserted it first
+
+        expired = record.expires_at <= now
+        abandoned = record.status_code is None and record.locked_until and record.locked_until <= now
+        if not (expired or abandoned):
+            return record, False
+
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, expires_at=record.expires_at, locked_until=record.locked_until
+        ).update(
+            request_hash=request_hash, status_code=None, content_type='', response_body='',
+            locked_until=now + lock_timeout(), expires_at=now + key_ttl()
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+    return record, False
+
+
+def wait_for_response(record, timeout):
+    """
+    Poll an in-flight record until its response is stored or ``timeout`` passes
+    """
+    deadline = time.monotonic() + timeout
+    while record is not None and record.status_code is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def store_response(record, response):
+    """
+    Save the response to replay for ``record``, or release the key.
+
+    Server errors and streamed bodies are not stored, so a retry runs the
+    request again instead of replaying a failure.
+    """
+    if getattr(response, 'streaming', False) or response.status_code >= 500:
+        release(record)
+        return
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        content_type=response.get('Content-Type', ''),
+        response_body=response.content.decode(response.charset or 'utf-8'),
+        locked_until=None
+    )
+
+
+def release(record):
+    """
+    Drop a claimed key so the next retry is handled from scratch
+    """
+    IdempotencyKey.objects.filter(pk=record.pk, status_code=None).delete()
+
+
+def replay(record):
+    """
+    Rebuild the stored response of ``record``
+    """
+    response = HttpResponse(record.response_body, status=record.status_code,
+                            content_type=record.content_type or None)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope, key_func=header_key, fingerprint=request_fingerprint):
+    """
+    Decorate a view so retries with the same key get the first response.
+
+    The key comes from ``key_func(request)``; requests without one are
+    handled as usual. While the first request is still running, duplicates
+    wait up to ``IDEMPOTENCY_WAIT_TIMEOUT`` seconds for its response and then
+    get a 409 asking them to retry. Reusing a key for a different request
+    (when ``fingerprint`` is given) is rejected with a 422.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = key_func(request)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'success': False, 'message': 'Idempotency key is too long'}, status=400)
+
+            request_hash = fingerprint(request) if fingerprint else ''
+            record, claimed = claim(scope, key, request_hash)
+            if not claimed:
+                if request_hash and record.request_hash and record.request_hash != request_hash:
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'Idempotency key was already used for a different request'
+                    }, status=422)
+                record = wait_for_response(record, wait_timeout())
+                if record is None or record.status_code is None:
+                    response = JsonResponse({
+                        'success': False,
+                        'message': 'A request with this idempotency key is still being processed'
+                    }, status=409)
+                    response['Retry-After'] = '1'
+                    return response
+                return replay(record)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                release(record)
+                raise
+            store_response(record, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired(now=None, batch_size=1000):
+    """
+    Delete stored responses past their expiry; returns the number deleted
+    """
+    now = now or timezone.now()
+    purged = 0
+    while True:
+        batch = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=batch, expires_at__lte=now).delete()[0]
+        if len(batch) < batch_size:
+            return purged
@@ -0,0 +1,64 @@
+"""
+Helpers shared by the benchmark management commands
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class Rollback(Exception):
+    """
+    Raised to throw away everything a benchmark wrote
+    """
+
+
+@contextmanager
+def sandbox():
+    """
+    Run a benchmark inside a transaction that is always rolled back
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+@contextmanager
+def measure():
+    """
+    Capture the number of queries and the wall time of a block
+    """
+    result = {}
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - started
+    result['queries'] = len(ctx.captured_queries)
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """
+    Run a benchmark against a throwaway on-disk copy of the schema.
+
+    Needed when several threads (and so several connections) must see the
+    same data, which a rolled-back transaction cannot offer.
+    """
+    import os
+    import tempfile
+
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_name = test_settings.get('NAME')
+    test_settings['NAME'] = path
+    old_db = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield path
+    finally:
+        connection.creation.destroy_test_db(old_db, verbosity=verbosity)
+        test_settings['NAME'] = old_name
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import archivable_orders, archive_after, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move finished orders older than the archive age into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive orders untouched for this many days (default ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Orders moved per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the orders that would be archived')
+
+    def handle(self, *args, **options):
+        age = timedelta(days=options['days']) if options['days'] is not None else archive_after()
+        cutoff = timezone.now() - age
+        if options['dry_run']:
+            self.stdout.write(f'{archivable_orders(cutoff).count()} order(s) would be archived')
+            return
+        moved = archive_orders(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{moved} order(s) archived'))
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from orders.checkout import place_order
+from orders.models import ProductService
+from ._bench import sandbox, measure
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark queries and time per checkout for growing cart sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,5,10,30,100',
+                            help='Comma separated cart sizes to benchmark')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Checkouts per cart size')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        rounds = options['rounds']
+
+        with sandbox():
+            customer = User.objects.create_user(
+                username='bench_checkout',
+                password='bench',
+                phone_number='00000000001'
+            )
+            products = ProductService.objects.bulk_create([
+                ProductService(
+                    name=f'Bench product {i}',
+                    description='Benchmark product',
+                    category='other',
+                    price=Decimal('10.00'),
+                    stock_quantity=rounds * 10
+                )
+                for i in range(max(sizes))
+            ])
+
+            self.stdout.write(f"{'lines':>6} {'queries':>8} {'ms/checkout':>12}")
+            for size in sizes:
+                cart = [{'id': product.pk, 'quantity': 1} for product in products[:size]]
+                with measure() as result:
+                    for _ in range(rounds):
+                        place_order(customer, cart, delivery_address='Bench')
+                self.stdout.write(
+                    f"{size:>6} {result['queries'] // rounds:>8} "
+                    f"{result['seconds'] * 1000 / rounds:>12.2f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all data rolled back'))
@@ -0,0 +1,102 @@
+import math
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.models import Order
+from orders.numbering import next_order_number
+from ._bench import sandbox, measure
+
+User = get_user_model()
+
+
+def random_number(seen):
+    """
+    The old uuid4-prefix order number, retried on the collisions it would raise
+    """
+    number = f'NE{uuid.uuid4().hex[:8].upper()}'
+    collisions = 0
+    while number in seen:
+        collisions += 1
+        number = f'NE{uuid.uuid4().hex[:8].upper()}'
+    seen.add(number)
+    return number, collisions
+
+
+class Command(BaseCommand):
+    help = 'Compare order insert throughput with random and allocated order numbers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000,
+                            help='Orders bulk inserted per method')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--single', type=int, default=2000,
+                            help='Orders created one by one through Order.save() per method')
+
+    def handle(self, *args, **options):
+        total, batch_size, single = options['orders'], options['batch_size'], options['single']
+
+        self.stdout.write(
+            f"{'method':<10} {'step':<9} {'orders':>8} {'queries':>8} {'seconds':>8} "
+            f"{'orders/s':>9} {'collisions':>11}"
+        )
+        for method in ('uuid4', 'allocator'):
+            # Numbers first, so the insert timing is the unique index alone.
+            # Allocated ones are taken outside the sandbox: the allocator only
+            # reuses a block once the transaction that reserved it commits,
+            # as a checkout's does, and the sandbox never commits. The
+            # reserved numbers are simply skipped by later orders.
+            seen, collisions = set(), 0
+            connection.queries_log.clear()
+            with measure() as result:
+                if method == 'allocator':
+                    numbers = [next_order_number() for _ in range(total + single)]
+                else:
+                    numbers = []
+                    for _ in range(total + single):
+                        number, clashes = random_number(seen)
+                        numbers.append(number)
+                        collisions += clashes
+            self.report(method, 'allocate', total + single, result, collisions)
+
+            with sandbox():
+                customer = User.objects.create_user(
+                    username='bench_numbers', password='bench', phone_number='00000000004'
+                )
+
+                connection.queries_log.clear()
+                with measure() as result:
+                    for start in range(0, total, batch_size):
+                        Order.objects.bulk_create([
+                            Order(order_number=number, customer=customer, delivery_address='Bench',
+                                  delivery_city='ঢাকা', total_amount=Decimal('100.00'))
+                            for number in numbers[start:start + batch_size]
+                        ])
+                self.report(method, 'insert', total, result, 0)
+
+                # One by one on top of the bulk rows
+                connection.queries_log.clear()
+                with measure() as result:
+                    for number in numbers[total:]:
+                        Order.objects.create(
+                            order_number=number, customer=customer, delivery_address='Bench',
+                            delivery_city='ঢাকা', total_amount=Decimal('100.00')
+                        )
+                self.report(method, 'save', single, result, 0)
+
+        # Birthday bound for 32 random bits
+        orders = total + single
+        probability = 1 - math.exp(-orders * (orders - 1) / (2 * 16 ** 8))
+        self.stdout.write(
+            f'Chance of at least one uuid4-prefix collision in {orders} orders: {probability:.1%}'
+        )
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, orders rolled back (the allocated numbers stay used)'))
+
+    def report(self, method, step, count, result, collisions):
+        self.stdout.write(
+            f"{method:<10} {step:<9} {count:>8} {result['queries']:>8} {result['seconds']:>8.2f} "
+            f"{count / result['seconds']:>9.0f} {collisions:>11}"
+        )
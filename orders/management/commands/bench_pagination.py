@@ -0,0 +1,74 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from orders.models import Order
+from orders.pagination import KeysetPaginator, encode_cursor
+from ._bench import sandbox, measure
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET and keyset pagination of the order list, shallow and deep'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=5000, help='Deep page number')
+        parser.add_argument('--per-page', type=int, default=20)
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        deep_page = options['page']
+        total = deep_page * per_page + per_page
+
+        with sandbox():
+            customer = User.objects.create_user(
+                username='bench_pagination', password='bench', phone_number='00000000002'
+            )
+            now = timezone.now()
+            self.stdout.write(f'Creating {total} orders...')
+            orders = Order.objects.bulk_create([
+                Order(
+                    order_number=f'BENCH{i:010d}',
+                    customer=customer,
+                    delivery_address='Bench',
+                    delivery_city='ঢাকা',
+                    total_amount=Decimal('100.00'),
+                )
+                for i in range(total)
+            ], batch_size=2000)
+            # auto_now_add gives every row the same timestamp; spread them out
+            Order.objects.filter(customer=customer).update(created_at=now)
+            for start in range(0, total, 5000):
+                Order.objects.filter(
+                    pk__in=[order.pk for order in orders[start:start + 5000]]
+                ).update(created_at=now - timedelta(seconds=start))
+
+            queryset = Order.objects.all().order_by('-created_at')
+            anchor = queryset.order_by('-created_at', '-pk').values_list(
+                'created_at', 'pk'
+            )[(deep_page - 1) * per_page - 1]
+            deep_cursor = encode_cursor(anchor[0], anchor[1], 'next')
+
+            self.stdout.write(f"{'method':<16} {'page':>6} {'queries':>8} {'ms':>9}")
+            for page_number in (1, deep_page):
+                with measure() as result:
+                    page = Paginator(queryset, per_page).page(page_number)
+                    list(page.object_list)
+                self.report('offset', page_number, result)
+
+            for page_number, cursor in ((1, None), (deep_page, deep_cursor)):
+                with measure() as result:
+                    KeysetPaginator(queryset, per_page).page(cursor)
+                self.report('keyset', page_number, result)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all data rolled back'))
+
+    def report(self, method, page_number, result):
+        self.stdout.write(
+            f"{method:<16} {page_number:>6} {result['queries']:>8} {result['seconds'] * 1000:>9.2f}"
+        )
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from delivery.models import DeliveryAssignment
+from orders.models import Order
+from orders.scheduler import ACTIVE_STATUSES, ReleaseScheduler, release_lead
+from orders.transitions import transition
+from users.models import DeliveryAgentProfile
+from ._bench import sandbox, measure
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Simulate a day of scheduled deliveries released by polling and by the release scheduler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000,
+                            help='Scheduled orders released by the scheduler')
+        parser.add_argument('--poll-orders', type=int, default=5000,
+                            help='Scheduled orders released by per-order polling (it is slow)')
+        parser.add_argument('--agents', type=int, default=50)
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Simulated window the slots are spread over')
+        parser.add_argument('--tick', type=int, default=60,
+                            help='Simulated seconds between ticks')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'method':<10} {'step':<6} {'orders':>8} {'ticks':>6} {'queries':>8} "
+            f"{'seconds':>8} {'orders/s':>9} {'max tick ms':>12}"
+        )
+        self.simulate('poll', options['poll_orders'], options, self.poll_tick)
+        self.simulate('scheduler', options['orders'], options, None)
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all data rolled back'))
+
+    def setup(self, total, options, start):
+        # Unusable passwords: hashing one per agent would dominate the setup
+        customer = User.objects.create(
+            username='bench_scheduled', password='!', phone_number='00000000005'
+        )
+        agents = User.objects.bulk_create([
+            User(username=f'bench_agent_{i}', password='!', phone_number=f'0100000{i:04d}',
+                 user_type='delivery_agent')
+            for i in range(options['agents'])
+        ])
+        DeliveryAgentProfile.objects.bulk_create([
+            DeliveryAgentProfile(user=agent, license_number=f'BENCH-{i}', vehicle_type='bike',
+                                 vehicle_number=f'B-{i}')
+            for i, agent in enumerate(agents)
+        ])
+        window = options['hours'] * 3600
+        for first in range(0, total, 1000):
+            Order.objects.bulk_create([
+                Order(order_number=f'SCH{i:08d}', customer=customer, delivery_address='Bench',
+                      delivery_city='ঢাকা', total_amount=Decimal('100.00'), delivery_type='scheduled',
+                      scheduled_delivery_time=start + release_lead() + timedelta(seconds=i * window // total))
+                for i in range(first, min(first + 1000, total))
+            ])
+
+    def simulate(self, method, total, options, poll):
+        start = timezone.now()
+        steps = options['hours'] * 3600 // options['tick'] + 1
+        with sandbox():
+            self.setup(total, options, start)
+            scheduler = ReleaseScheduler()
+
+            if poll is None:
+                connection.queries_log.clear()
+                with measure() as result:
+                    scheduler.load(start)
+                self.report(method, 'load', len(scheduler), 1, result, result['seconds'])
+
+            released, slowest, queries, seconds = 0, 0.0, 0, 0.0
+            for step in range(steps):
+                now = start + timedelta(seconds=step * options['tick'])
+                connection.queries_log.clear()
+                with measure() as result:
+                    released += poll(now) if poll else len(scheduler.tick(now))
+                slowest = max(slowest, result['seconds'])
+                queries += result['queries']
+                seconds += result['seconds']
+
+            assigned = DeliveryAssignment.objects.filter(order__order_number__startswith='SCH').count()
+            if released != total or assigned != total:
+                self.stderr.write(f'{method}: {released} released, {assigned} assigned of {total}')
+        self.report(method, 'ticks', released, steps, {'queries': queries, 'seconds': seconds}, slowest)
+
+    def poll_tick(self, now):
+        # What a polling worker does without the scheduler: list what is due,
+        # then confirm and assign one order at a time
+        due = list(Order.objects.filter(
+            delivery_type='scheduled', status='pending',
+            scheduled_delivery_time__lte=now + release_lead()
+        ))
+        for order in due:
+            transition(order, 'confirmed', notes='Released for scheduled delivery')
+            agent = User.objects.filter(
+                user_type='delivery_agent', delivery_agent_profile__is_available=True
+            ).annotate(
+                load=Count('delivery_assignments', filter=Q(
+                    delivery_assignments__order__status__in=ACTIVE_STATUSES
+                ))
+            ).order_by('load', 'pk').first()
+            DeliveryAssignment.objects.create(
+                order=order, delivery_agent=agent, estimated_delivery_time=order.scheduled_delivery_time
+            )
+        return len(due)
+
+    def report(self, method, step, count, ticks, result, slowest):
+        self.stdout.write(
+            f"{method:<10} {step:<6} {count:>8} {ticks:>6} {result['queries']:>8} "
+            f"{result['seconds']:>8.2f} {count / max(result['seconds'], 1e-9):>9.0f} {slowest * 1000:>12.1f}"
+        )
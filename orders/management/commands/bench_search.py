@@ -0,0 +1,98 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from orders import search
+from orders.models import ProductService
+from ._bench import sandbox
+
+BANGLA_WORDS = [
+    'চাল', 'ডাল', 'তেল', 'চিনি', 'লবণ', 'আটা', 'ময়দা', 'মসুর', 'পেঁয়াজ', 'রসুন',
+    'নাপা', 'এক্সট্রা', 'প্যারাসিটামল', 'সিরাপ', 'ট্যাবলেট', 'গ্যাস', 'সিলিন্ডার',
+    'বিরিয়ানি', 'খিচুড়ি', 'মিষ্টি', 'দই', 'শাড়ি', 'পাঞ্জাবি', 'বই', 'খাতা',
+]
+ENGLISH_WORDS = [
+    'rice', 'miniket', 'soybean', 'oil', 'sugar', 'salt', 'flour', 'napa', 'extra',
+    'syrup', 'tablet', 'lpg', 'cylinder', 'biryani', 'fresh', 'premium', 'charger',
+    'cable', 'shirt', 'saree', 'novel', 'notebook', 'kg', 'ml', 'pack',
+]
+CATEGORIES = [choice for choice, _ in ProductService.CATEGORY_CHOICES]
+
+# Common words match a large share of the synthetic catalog and show the
+# worst case for ranking; brand names are as selective as real searches.
+QUERIES = [
+    ('brand', 'brand417', None),
+    ('brand prefix', 'brand41', None),
+    ('bangla word', 'চাল', None),
+    ('english word', 'rice', None),
+    ('mixed', 'নাপা extra', None),
+    ('bengali digits', 'তেল ৫', None),
+    ('category filter', 'premium', 'groceries'),
+    ('prefix', 'সিলি', None),
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure product search latency over a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError('Full-text search needs SQLite')
+        total, repeat, batch_size = options['products'], options['repeat'], options['batch_size']
+        rng = random.Random(8)
+
+        with sandbox():
+            self.stdout.write(f'Creating and indexing {total} products...')
+            started = time.perf_counter()
+            for start in range(0, total, batch_size):
+                products = ProductService.objects.bulk_create([
+                    self.synthetic_product(rng, i) for i in range(start, min(start + batch_size, total))
+                ])
+                # bulk_create skips post_save, so index the batch directly
+                search.index_products(products)
+            self.stdout.write(f'Loaded in {time.perf_counter() - started:.1f}s')
+
+            self.stdout.write(f"{'query':<18} {'method':<12} {'p50 ms':>9} {'p95 ms':>9} {'hits':>6}")
+            for label, query, category in QUERIES:
+                self.report(label, 'fts5', repeat, lambda: search.search_products(query, category, 20))
+                self.report(label, 'icontains', max(repeat // 10, 1), lambda: list(
+                    ProductService.objects.filter(
+                        Q(name__icontains=query) | Q(description__icontains=query),
+                        is_available=True, **({'category': category} if category else {})
+                    )[:20]
+                ))
+            self.report('autocomplete', 'fts5', repeat, lambda: search.autocomplete('বির'))
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all data rolled back'))
+
+    def synthetic_product(self, rng, i):
+        words = rng.sample(BANGLA_WORDS, 2) + rng.sample(ENGLISH_WORDS, 2)
+        rng.shuffle(words)
+        size = f'{rng.choice([1, 2, 5, 10, 250, 500])}{rng.choice(["kg", "ml", "g", "পিস"])}'
+        return ProductService(
+            name=f'brand{rng.randrange(5000)} {" ".join(words[:3])} {size}',
+            description=' '.join(rng.choices(BANGLA_WORDS + ENGLISH_WORDS, k=12)) + f' #{i}',
+            category=rng.choice(CATEGORIES),
+            price=Decimal(rng.randint(10, 5000)),
+            stock_quantity=rng.randint(0, 100),
+        )
+
+    def report(self, label, method, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hits = len(run())
+            timings.append((time.perf_counter() - started) * 1000)
+        p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f'{label:<18} {method:<12} {statistics.median(timings):>9.2f} {p95:>9.2f} {hits:>6}'
+        )
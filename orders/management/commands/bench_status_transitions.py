@@ -0,0 +1,117 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+
+from orders.models import Order, OrderStatusHistory
+from orders.transitions import TransitionConflict, transition
+from ._bench import scratch_database
+
+User = get_user_model()
+
+# Every worker tries one of these on every order; only one may win per order.
+# Cancelling is left out: it goes through orders.cancellation, not transition()
+TARGETS = ('processing', 'dispatched')
+
+
+class Command(BaseCommand):
+    help = 'Compare read-modify-write and compare-and-set status changes under contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=6)
+        parser.add_argument('--orders', type=int, default=300)
+
+    def handle(self, *args, **options):
+        threads, total = options['threads'], options['orders']
+
+        with scratch_database():
+            customer = User.objects.create_user(
+                username='bench_transitions', password='bench', phone_number='00000000003'
+            )
+
+            self.stdout.write(
+                f"{'method':<18} {'writes ok':>10} {'conflicts':>10} {'lost':>6} "
+                f"{'hold ms':>8} {'retries':>8}"
+            )
+            for label, change in (('read-modify-write', self.read_modify_write), ('compare-and-set', self.compare_and_set)):
+                Order.objects.all().delete()
+                orders = Order.objects.bulk_create([
+                    Order(order_number=f'CAS{i:08d}', customer=customer, delivery_address='Bench',
+                          delivery_city='ঢাকা', total_amount=Decimal('10.00'), status='confirmed')
+                    for i in range(total)
+                ])
+                ids = [order.pk for order in orders]
+                stats = self.run_threads(change, ids, threads)
+
+                # A lost update is a write that reported success but left no trace
+                # in the final status: more than one winner per order
+                final = dict(Order.objects.values_list('pk', 'status'))
+                history = OrderStatusHistory.objects.filter(order_id__in=ids).count()
+                lost = stats['ok'] - sum(1 for pk in ids if final[pk] != 'confirmed')
+                OrderStatusHistory.objects.all().delete()
+                self.stdout.write(
+                    f"{label:<18} {stats['ok']:>10} {stats['conflicts']:>10} {lost:>6} "
+                    f"{stats['hold'] / max(history, 1) * 1000:>8.3f} {stats['retries']:>8}"
+                )
+
+        if connection.vendor == 'sqlite':
+            self.stdout.write(
+                'Note: SQLite serializes writers on one database lock; "hold ms" is the '
+                'mean time a write transaction kept it.'
+            )
+
+    def read_modify_write(self, pk, status):
+        # What the status views used to do: fetch, overwrite, save()
+        with transaction.atomic():
+            started = time.perf_counter()
+            order = Order.objects.get(pk=pk)
+            order.status = status
+            order.save()
+            OrderStatusHistory.objects.create(order=order, status=status, notes='bench')
+        return time.perf_counter() - started
+
+    def compare_and_set(self, pk, status):
+        order = Order(pk=pk, status='confirmed')
+        started = time.perf_counter()
+        transition(order, status, notes='bench')
+        return time.perf_counter() - started
+
+    def run_threads(self, change, ids, threads):
+        stats = {'ok': 0, 'conflicts': 0, 'retries': 0, 'hold': 0.0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(index):
+            status = TARGETS[index % len(TARGETS)]
+            barrier.wait()
+            try:
+                for pk in ids:
+                    while True:
+                        try:
+                            held = change(pk, status)
+                            with lock:
+                                stats['ok'] += 1
+                                stats['hold'] += held
+                            break
+                        except TransitionConflict:
+                            with lock:
+                                stats['conflicts'] += 1
+                            break
+                        except OperationalError:
+                            # database is locked; back off and try again
+                            with lock:
+                                stats['retries'] += 1
+                            time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        for thread in workers:
+            thread.join()
+        return stats
@@ -0,0 +1,95 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+
+from orders.models import ProductService
+from orders.stock import enable_sharding, shard_totals, take
+from ._bench import scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Compare single-row and sharded stock decrements under thread contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=200,
+                            help='Stock decrements per thread')
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        per_thread = options['orders']
+
+        with scratch_database():
+            stock = threads * per_thread
+            single = ProductService.objects.create(
+                name='Single row', description='', category='gas',
+                price=Decimal('1200.00'), stock_quantity=stock
+            )
+            sharded = ProductService.objects.create(
+                name='Sharded', description='', category='gas',
+                price=Decimal('1200.00'), stock_quantity=stock
+            )
+            enable_sharding(sharded, options['shards'])
+            sharded.refresh_from_db()
+
+            def single_row():
+                return ProductService.objects.filter(
+                    pk=single.pk, stock_quantity__gte=1
+                ).update(stock_quantity=F('stock_quantity') - 1)
+
+            def sharded_counter():
+                return take(sharded, 1)
+
+            self.stdout.write(f"{'path':<12} {'orders/s':>10} {'retries':>8} {'left':>6}")
+            for label, decrement, remaining in (
+                ('single-row', single_row,
+                 lambda: ProductService.objects.get(pk=single.pk).stock_quantity),
+                ('sharded', sharded_counter,
+                 lambda: shard_totals([sharded.pk])[sharded.pk]),
+            ):
+                elapsed, retries = self.run_threads(decrement, threads, per_thread)
+                self.stdout.write(
+                    f'{label:<12} {threads * per_thread / elapsed:>10.0f} '
+                    f'{retries:>8} {remaining():>6}'
+                )
+
+        if connection.vendor == 'sqlite':
+            self.stdout.write(
+                'Note: SQLite takes one lock for the whole database, so both paths '
+                'serialize here; sharding pays off on row-locking backends.'
+            )
+
+    def run_threads(self, decrement, threads, per_thread):
+        retries = [0]
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(per_thread):
+                    while True:
+                        try:
+                            decrement()
+                            break
+                        except OperationalError:
+                            # database is locked; back off and try again
+                            with lock:
+                                retries[0] += 1
+                            time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started, retries[0]
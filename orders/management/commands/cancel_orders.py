@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.cancellation import SUPPLIER_UNAVAILABLE, cancel_matching
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Cancel a selection of orders in bulk, restoring stock and raising refunds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', default='',
+                            help='Comma-separated order ids')
+        parser.add_argument('--product', type=int, action='append', default=[],
+                            help='Orders containing this product id (repeatable)')
+        parser.add_argument('--status', action='append', default=[],
+                            help='Only orders in this status (repeatable)')
+        parser.add_argument('--city', help='Only orders delivered to this city')
+        parser.add_argument('--placed-after', help='Only orders placed at or after YYYY-MM-DD[THH:MM]')
+        parser.add_argument('--reason', default=SUPPLIER_UNAVAILABLE)
+        parser.add_argument('--notes', default='')
+        parser.add_argument('--refund', default='refund_to_payment_method',
+                            help='Refund preference; no_refund_needed raises no refunds')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Orders cancelled per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the orders that would be cancelled')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['ids']:
+            try:
+                orders = orders.filter(pk__in=[int(pk) for pk in options['ids'].split(',') if pk.strip()])
+            except ValueError:
+                raise CommandError('--ids must be a comma-separated list of numbers')
+        if options['product']:
+            orders = orders.filter(pk__in=Order.objects.filter(items__product__in=options['product']).values('pk'))
+        if options['status']:
+            orders = orders.filter(status__in=options['status'])
+        if options['city']:
+            orders = orders.filter(delivery_city=options['city'])
+        if options['placed_after']:
+            try:
+                placed_after = datetime.fromisoformat(options['placed_after'])
+            except ValueError:
+                raise CommandError('--placed-after must be YYYY-MM-DD or YYYY-MM-DDTHH:MM')
+            orders = orders.filter(created_at__gte=timezone.make_aware(placed_after))
+        if not any(options[name] for name in ('ids', 'product', 'status', 'city', 'placed_after')):
+            raise CommandError('Select orders with --ids, --product, --status, --city or --placed-after')
+
+        if options['dry_run']:
+            self.stdout.write(f'{orders.cancellable().count()} order(s) would be cancelled')
+            return
+        cancelled = cancel_matching(
+            orders, batch_size=options['batch_size'], reason=options['reason'],
+            notes=options['notes'], refund_preference=options['refund']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{cancelled} order(s) cancelled'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reservations import expire_reservations
+
+
+class Command(BaseCommand):
+    help = 'Expire cart stock reservations whose hold time has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Holds deleted per transaction')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep sweeping every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_reservations(batch_size=options['batch_size'])
+            self.stdout.write(f'{expired} reservation(s) expired')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
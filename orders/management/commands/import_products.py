@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import product_feed
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by SKU from a CSV or JSONL supplier feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file (.csv, .jsonl or .ndjson)')
+        parser.add_argument('--format', choices=product_feed.FORMATS,
+                            help='Feed format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows written per bulk INSERT/UPDATE')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or product_feed.feed_format(options['path'])
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(e)
+        with stream:
+            report = product_feed.import_products(
+                product_feed.iter_rows(stream, fmt), batch_size=options['batch_size']
+            )
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['message']}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f'... and {report.error_count - len(report.errors)} more errors')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} created, {report.updated} updated, {report.error_count} rejected'
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.cart import purge_expired_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete saved carts nobody has touched within CART_TIMEOUT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Carts deleted per statement')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep sweeping every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_expired_carts(batch_size=options['batch_size'])
+            self.stdout.write(f'{purged} cart(s) purged')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
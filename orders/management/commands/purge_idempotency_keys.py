@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete stored idempotency responses whose replay window has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Keys deleted per statement')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep sweeping every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_expired(batch_size=options['batch_size'])
+            self.stdout.write(f'{purged} idempotency key(s) purged')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from ProductService'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            self.stdout.write(self.style.WARNING('Full-text search needs SQLite; nothing to do'))
+            return
+        with transaction.atomic():
+            indexed = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products'))
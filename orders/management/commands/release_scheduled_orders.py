@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.scheduler import ReleaseScheduler
+
+
+class Command(BaseCommand):
+    help = 'Release scheduled orders to dispatch and assign agents when their slot comes close'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, ticking every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        scheduler = ReleaseScheduler()
+        scheduler.load()
+        self.stdout.write(f'{len(scheduler)} scheduled order(s) waiting')
+        while True:
+            released = scheduler.tick()
+            if released or not options['interval']:
+                self.stdout.write(f'{len(released)} order(s) released')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from orders.summary import repair_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized order summary columns from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Orders rewritten per UPDATE')
+
+    def handle(self, *args, **options):
+        processed = repair_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} order(s) repaired'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import ProductService
+from orders.stock import disable_sharding, enable_sharding, rebalance
+
+
+class Command(BaseCommand):
+    help = 'Shard hot product stock counters and rebalance existing shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable', type=int, metavar='PRODUCT_ID',
+                            help='Move this product onto sharded stock counters')
+        parser.add_argument('--disable', type=int, metavar='PRODUCT_ID',
+                            help='Fold this product back onto a single stock row')
+        parser.add_argument('--shards', type=int, default=8,
+                            help='Number of shards used with --enable')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep rebalancing every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        if options['enable'] or options['disable']:
+            product_id = options['enable'] or options['disable']
+            try:
+                product = ProductService.objects.get(pk=product_id)
+            except ProductService.DoesNotExist:
+                raise CommandError(f'Product {product_id} not found')
+            if options['enable']:
+                if options['shards'] < 1:
+                    raise CommandError('--shards must be at least 1')
+                total = enable_sharding(product, options['shards'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'{product.name}: {total} in stock over {options["shards"]} shards'
+                ))
+            else:
+                total = disable_sharding(product)
+                self.stdout.write(self.style.SUCCESS(f'{product.name}: {total} in stock on one row'))
+            return
+
+        while True:
+            for product in ProductService.objects.filter(stock_shards__gt=0):
+                total = rebalance(product)
+                self.stdout.write(f'{product.name}: {total} in stock')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
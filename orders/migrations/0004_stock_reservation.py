@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:52
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_cancellation_notes_order_cancellation_reason_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productservice',
+            name='reserved_quantity',
+            field=models.PositiveIntegerField(default=0, verbose_name='সংরক্ষিত পরিমাণ'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='পরিমাণ')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='মেয়াদ শেষ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='তৈরি হয়েছে')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to=settings.AUTH_USER_MODEL, verbose_name='গ্রাহক')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='orders.productservice', verbose_name='পণ্য/সেবা')),
+            ],
+            options={
+                'verbose_name': 'স্টক সংরক্ষণ',
+                'verbose_name_plural': 'স্টক সংরক্ষণ',
+                'unique_together': {('customer', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productservice',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of stock counter shards (0 keeps stock on this row)', verbose_name='স্টক শার্ড'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='শার্ড')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='পরিমাণ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shard_rows', to='orders.productservice', verbose_name='পণ্য/সেবা')),
+            ],
+            options={
+                'verbose_name': 'স্টক শার্ড',
+                'verbose_name_plural': 'স্টক শার্ড',
+                'unique_together': {('product', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Frozen copies of orders.search as it was when the index was added, so
+# later changes to the module cannot change what this migration does.
+TABLE = 'orders_product_search'
+
+CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+    name, description, category UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'",
+    prefix = '2 3'
+)
+"""
+DROP_SQL = f'DROP TABLE IF EXISTS {TABLE}'
+
+_BENGALI_DIGITS = str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')
+_JOINERS = dict.fromkeys([0x200C, 0x200D])  # ZWNJ, ZWJ
+_SCRIPT_BOUNDARY = re.compile(r'(?<=[\u0980-\u09FF])(?=[a-z0-9])|(?<=[a-z0-9])(?=[\u0980-\u09FF])')
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFC', text or '').lower()
+    text = text.translate(_JOINERS).translate(_BENGALI_DIGITS)
+    return _SCRIPT_BOUNDARY.sub(' ', text)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    ProductService = apps.get_model('orders', 'ProductService')
+    rows = [
+        (pk, normalize_text(name), normalize_text(description), category)
+        for pk, name, description, category in ProductService.objects.values_list(
+            'pk', 'name', 'description', 'category'
+        ).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
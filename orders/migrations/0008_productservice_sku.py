@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productservice',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Supplier stock keeping unit, used to match rows in bulk imports', max_length=64, null=True, unique=True, verbose_name='এসকেইউ'),
+        ),
+    ]
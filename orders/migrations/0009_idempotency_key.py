@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_productservice_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, verbose_name='পরিধি')),
+                ('key', models.CharField(max_length=255, verbose_name='কী')),
+                ('request_hash', models.CharField(blank=True, max_length=64, verbose_name='অনুরোধ হ্যাশ')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='স্ট্যাটাস কোড')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='কনটেন্ট টাইপ')),
+                ('response_body', models.TextField(blank=True, verbose_name='প্রতিক্রিয়া')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='লক শেষ')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='মেয়াদ শেষ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='তৈরি হয়েছে')),
+            ],
+            options={
+                'verbose_name': 'আইডেমপোটেন্সি কী',
+                'verbose_name_plural': 'আইডেমপোটেন্সি কী',
+                'unique_together': {('scope', 'key')},
+            },
+        ),
+    ]
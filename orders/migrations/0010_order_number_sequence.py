@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='দিন')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='শেষ নম্বর')),
+            ],
+            options={
+                'verbose_name': 'অর্ডার নম্বর ক্রম',
+                'verbose_name_plural': 'অর্ডার নম্বর ক্রম',
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_number_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='আইডি')),
+                ('order_number', models.CharField(max_length=20, unique=True, verbose_name='অর্ডার নম্বর')),
+                ('delivery_type', models.CharField(choices=[('instant', 'তাত্ক্ষণিক'), ('scheduled', 'নির্ধারিত সময়')], default='instant', max_length=20, verbose_name='ডেলিভারি ধরন')),
+                ('scheduled_delivery_time', models.DateTimeField(blank=True, null=True, verbose_name='নির্ধারিত ডেলিভারি সময়')),
+                ('delivery_address', models.TextField(verbose_name='ডেলিভারি ঠিকানা')),
+                ('delivery_city', models.CharField(max_length=100, verbose_name='ডেলিভারি শহর')),
+                ('delivery_instructions', models.TextField(blank=True, null=True, verbose_name='ডেলিভারি নির্দেশনা')),
+                ('status', models.CharField(choices=[('pending', 'অপেক্ষমান'), ('confirmed', 'নিশ্চিত'), ('processing', 'প্রক্রিয়াধীন'), ('dispatched', 'প্রেরিত'), ('delivered', 'ডেলিভারি সম্পন্ন'), ('cancelled', 'বাতিল'), ('returned', 'ফেরত')], max_length=20, verbose_name='অবস্থা')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='মোট পরিমাণ (৳)')),
+                ('delivery_fee', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='ডেলিভারি ফি (৳)')),
+                ('special_instructions', models.TextField(blank=True, null=True, verbose_name='বিশেষ নির্দেশনা')),
+                ('cancellation_reason', models.CharField(blank=True, max_length=50, null=True, verbose_name='বাতিলের কারণ')),
+                ('cancellation_notes', models.TextField(blank=True, null=True, verbose_name='বাতিলের নোট')),
+                ('cancelled_at', models.DateTimeField(blank=True, null=True, verbose_name='বাতিল হয়েছে')),
+                ('refund_preference', models.CharField(blank=True, max_length=30, null=True, verbose_name='রিফান্ড পছন্দ')),
+                ('created_at', models.DateTimeField(verbose_name='তৈরি হয়েছে')),
+                ('updated_at', models.DateTimeField(verbose_name='আপডেট হয়েছে')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='আর্কাইভ হয়েছে')),
+                ('cancelled_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='বাতিল করেছেন')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL, verbose_name='গ্রাহক')),
+            ],
+            options={
+                'verbose_name': 'আর্কাইভ অর্ডার',
+                'verbose_name_plural': 'আর্কাইভ অর্ডার',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=200, verbose_name='পণ্যের নাম')),
+                ('quantity', models.PositiveIntegerField(verbose_name='পরিমাণ')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='একক দাম (৳)')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='মোট দাম (৳)')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder', verbose_name='অর্ডার')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.productservice', verbose_name='পণ্য/সেবা')),
+            ],
+            options={
+                'verbose_name': 'আর্কাইভ অর্ডার আইটেম',
+                'verbose_name_plural': 'আর্কাইভ অর্ডার আইটেম',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderStatusHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'অপেক্ষমান'), ('confirmed', 'নিশ্চিত'), ('processing', 'প্রক্রিয়াধীন'), ('dispatched', 'প্রেরিত'), ('delivered', 'ডেলিভারি সম্পন্ন'), ('cancelled', 'বাতিল'), ('returned', 'ফেরত')], max_length=20, verbose_name='অবস্থা')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='নোট')),
+                ('created_at', models.DateTimeField(verbose_name='তৈরি হয়েছে')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='তৈরি করেছেন')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='orders.archivedorder', verbose_name='অর্ডার')),
+            ],
+            options={
+                'verbose_name': 'আর্কাইভ অর্ডার অবস্থা ইতিহাস',
+                'verbose_name_plural': 'আর্কাইভ অর্ডার অবস্থা ইতিহাস',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='archived_customer_created_idx'),
+        ),
+    ]
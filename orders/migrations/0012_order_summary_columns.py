@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+from orders.summary import repair_summaries
+
+
+def backfill_summaries(apps, schema_editor):
+    repair_summaries(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_order_archive'),
+        ('delivery', '0002_hot_filter_indexes'),
+        ('payments', '0002_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='customer_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='গ্রাহকের নাম'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='পণ্যের সংখ্যা'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='payment_state',
+            field=models.CharField(choices=[('unpaid', 'অপরিশোধিত'), ('pending', 'অপেক্ষমান'), ('paid', 'পরিশোধিত'), ('failed', 'ব্যর্থ'), ('refunded', 'ফেরত')], default='unpaid', max_length=20, verbose_name='পেমেন্ট অবস্থা'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='শেষ অবস্থা পরিবর্তন'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='customer_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='গ্রাহকের নাম'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='পণ্যের সংখ্যা'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_state',
+            field=models.CharField(choices=[('unpaid', 'অপরিশোধিত'), ('pending', 'অপেক্ষমান'), ('paid', 'পরিশোধিত'), ('failed', 'ব্যর্থ'), ('refunded', 'ফেরত')], default='unpaid', max_length=20, verbose_name='পেমেন্ট অবস্থা'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='শেষ অবস্থা পরিবর্তন'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
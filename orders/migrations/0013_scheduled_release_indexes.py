@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_order_summary_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_type', 'status', 'scheduled_delivery_time'], name='order_scheduled_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_type', 'status', 'updated_at'], name='order_scheduled_changed_idx'),
+        ),
+    ]
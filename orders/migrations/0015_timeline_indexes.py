@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_order_status_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderstatushistory',
+            index=models.Index(fields=['order', '-created_at', '-id'], name='status_history_order_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_timeline_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedCart',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saved_cart', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='ব্যবহারকারী')),
+                ('lines', models.JSONField(default=dict, verbose_name='লাইন')),
+                ('updated_at', models.DateTimeField(db_index=True, verbose_name='আপডেট হয়েছে')),
+            ],
+            options={
+                'verbose_name': 'সংরক্ষিত কার্ট',
+                'verbose_name_plural': 'সংরক্ষিত কার্ট',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_saved_carts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='সংস্করণ')),
+            ],
+            options={
+                'verbose_name': 'ক্যাটালগ সংস্করণ',
+                'verbose_name_plural': 'ক্যাটালগ সংস্করণ',
+            },
+        ),
+    ]
@@ -1,8 +1,13 @@
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .summary import customer_display_name
+
 User = get_user_model()
 
 
@@ -21,6 +26,15 @@ class ProductService(models.Model):
         ('other', 'অন্যান্য'),
     ]
     
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text='Supplier stock keeping unit, used to match rows in bulk imports',
+        verbose_name=_('এসকেইউ')
+    )
+    
     name = models.CharField(
         max_length=200,
         verbose_name=_('নাম')
@@ -53,6 +67,17 @@ class ProductService(models.Model):
         verbose_name=_('স্টক পরিমাণ')
     )
     
+    reserved_quantity = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('সংরক্ষিত পরিমাণ')
+    )
+    
+    stock_shards = models.PositiveSmallIntegerField(
+        default=0,
+        help_text='Number of stock counter shards (0 keeps stock on this row)',
+        verbose_name=_('স্টক শার্ড')
+    )
+    
     image = models.ImageField(
         upload_to='products/',
         blank=True,
@@ -78,11 +103,18 @@ class ProductService(models.Model):
     def __str__(self):
         return f"{self.name} - ৳{self.price}"
     
+    @property
+    def available_quantity(self):
+        """
+        Stock that is not held by any cart reservation
+        """
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+    
     def is_in_stock(self, quantity=1):
         """
         Check if product has enough stock for the requested quantity
         """
-        return self.is_available and self.stock_quantity >= quantity
+        return self.is_available and self.available_quantity >= quantity
     
     def reduce_stock(self, quantity):
         """
@@ -94,18 +126,74 @@ class ProductService(models.Model):
             return True
         return False
     
-    def get_stock_status(self):
+    def get_stock_status(self, available=None):
         """
         Get stock status message
         """
+        if available is None:
+            available = self.available_quantity
         if not self.is_available:
             return "পণ্যটি বর্তমানে উপলব্ধ নয়"
-        elif self.stock_quantity == 0:
+        elif available == 0:
             return "স্টক শেষ"
-        elif self.stock_quantity <= 5:
-            return f"শুধু {self.stock_quantity}টি অবশিষ্ট"
+        elif available <= 5:
+            return f"শুধু {available}টি অবশিষ্ট"
         else:
-            return f"{self.stock_quantity}টি স্টকে আছে"
+            return f"{available}টি স্টকে আছে"
+
+
+# How long after it was placed an order may be cancelled, by status. Only the
+# processing window is enforced; the others are the deadline shown to customers.
+CANCELLATION_WINDOWS = {
+    'pending': timedelta(hours=48),
+    'confirmed': timedelta(hours=48),
+    'processing': timedelta(hours=24),
+}
+ENFORCED_CANCELLATION_WINDOWS = ('processing',)
+
+
+def cancellable_q(now=None):
+    """
+    The condition ``Order.can_be_cancelled()`` checks, for filtering in SQL
+    """
+    now = now or timezone.now()
+    condition = models.Q(status__in=[
+        status for status in CANCELLATION_WINDOWS if status not in ENFORCED_CANCELLATION_WINDOWS
+    ])
+    for status in ENFORCED_CANCELLATION_WINDOWS:
+        condition |= models.Q(status=status, created_at__gte=now - CANCELLATION_WINDOWS[status])
+    return condition
+
+
+class OrderQuerySet(models.QuerySet):
+    def cancellable(self, now=None):
+        """
+        Orders that can still be cancelled, answered from order_status_idx
+        """
+        return self.filter(cancellable_q(now))
+
+    def with_cancellation(self, now=None):
+        """
+        Annotate ``cancellation_deadline`` and ``is_cancellable`` so rows need no per-row date math
+        """
+        windows = {}
+        for status, window in CANCELLATION_WINDOWS.items():
+            windows.setdefault(window, []).append(status)
+        return self.annotate(
+            cancellation_deadline=models.Case(
+                *[
+                    models.When(status__in=statuses, then=models.F('created_at') + window)
+                    for window, statuses in windows.items()
+                ],
+                default=None,
+                output_field=models.DateTimeField()
+            ),
+            is_cancellable=models.Case(
+                models.When(cancellable_q(now), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField()
+            )
+        )
 
 
 class Order(models.Model):
@@ -127,6 +215,14 @@ class Order(models.Model):
         ('scheduled', 'নির্ধারিত সময়'),
     ]
     
+    PAYMENT_STATE_CHOICES = [
+        ('unpaid', 'অপরিশোধিত'),
+        ('pending', 'অপেক্ষমান'),
+        ('paid', 'পরিশোধিত'),
+        ('failed', 'ব্যর্থ'),
+        ('refunded', 'ফেরত'),
+    ]
+    
     order_number = models.CharField(
         max_length=20,
         unique=True,
@@ -232,6 +328,32 @@ class Order(models.Model):
         verbose_name=_('রিফান্ড পছন্দ')
     )
     
+    # Summary columns, kept in sync on write by orders.summary so lists
+    # and APIs need neither the customer nor the item/payment tables
+    item_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('পণ্যের সংখ্যা')
+    )
+    
+    customer_name = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('গ্রাহকের নাম')
+    )
+    
+    status_changed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('শেষ অবস্থা পরিবর্তন')
+    )
+    
+    payment_state = models.CharField(
+        max_length=20,
+        choices=PAYMENT_STATE_CHOICES,
+        default='unpaid',
+        verbose_name=_('পেমেন্ট অবস্থা')
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name=_('তৈরি হয়েছে')
@@ -246,48 +368,55 @@ class Order(models.Model):
         verbose_name = _('অর্ডার')
         verbose_name_plural = _('অর্ডার')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_idx'),
+            # Scheduled-release engine: open orders by slot, and by last change
+            models.Index(fields=['delivery_type', 'status', 'scheduled_delivery_time'], name='order_scheduled_slot_idx'),
+            models.Index(fields=['delivery_type', 'status', 'updated_at'], name='order_scheduled_changed_idx'),
+        ]
+    
+    objects = OrderQuerySet.as_manager()
+    
+    is_archived = False
     
     def __str__(self):
         return f"অর্ডার #{self.order_number} - {self.customer.get_full_name()}"
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import uuid
-            self.order_number = f"NE{str(uuid.uuid4())[:8].upper()}"
+            from .numbering import next_order_number
+            self.order_number = next_order_number()
+        if not self.customer_name and self.customer_id:
+            self.customer_name = customer_display_name(self.customer)
+        if not self.status_changed_at:
+            self.status_changed_at = timezone.now()
         super().save(*args, **kwargs)
     
     def can_be_cancelled(self):
         """
         Check if order can be cancelled based on status and timing
         """
-        # Orders can only be cancelled if they are pending, confirmed, or processing
-        cancellable_statuses = ['pending', 'confirmed', 'processing']
-        
-        if self.status not in cancellable_statuses:
+        # Set when the row came from OrderQuerySet.with_cancellation()
+        annotated = getattr(self, 'is_cancellable', None)
+        if annotated is not None:
+            return annotated
+        if self.status not in CANCELLATION_WINDOWS:
             return False
-        
-        # Check if order was created more than 24 hours ago (for processing orders)
-        if self.status == 'processing':
-            from django.utils import timezone
-            from datetime import timedelta
-            if timezone.now() - self.created_at > timedelta(hours=24):
-                return False
-        
+        if self.status in ENFORCED_CANCELLATION_WINDOWS:
+            return timezone.now() - self.created_at <= CANCELLATION_WINDOWS[self.status]
         return True
     
     def get_cancellation_deadline(self):
         """
         Get the deadline for cancelling this order
         """
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        if self.status in ['pending', 'confirmed']:
-            return self.created_at + timedelta(hours=48)  # 48 hours for pending/confirmed
-        elif self.status == 'processing':
-            return self.created_at + timedelta(hours=24)  # 24 hours for processing
-        else:
-            return None
+        annotated = getattr(self, 'cancellation_deadline', None)
+        if annotated is not None:
+            return annotated
+        window = CANCELLATION_WINDOWS.get(self.status)
+        return self.created_at + window if window else None
 
 
 class OrderItem(models.Model):
@@ -378,6 +507,486 @@ class OrderStatusHistory(models.Model):
         verbose_name = _('অর্ডার অবস্থা ইতিহাস')
         verbose_name_plural = _('অর্ডার অবস্থা ইতিহাস')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['order', '-created_at', '-id'], name='status_history_order_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.order.order_number} - {self.get_status_display()}"
+
+
+class StockReservation(models.Model):
+    """
+    Time-limited hold on product stock for a customer's cart
+    """
+    product = models.ForeignKey(
+        ProductService,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name=_('পণ্য/সেবা')
+    )
+    
+    customer = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name=_('গ্রাহক')
+    )
+    
+    quantity = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)],
+        verbose_name=_('পরিমাণ')
+    )
+    
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name=_('মেয়াদ শেষ')
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('তৈরি হয়েছে')
+    )
+    
+    class Meta:
+        verbose_name = _('স্টক সংরক্ষণ')
+        verbose_name_plural = _('স্টক সংরক্ষণ')
+        unique_together = ['customer', 'product']
+    
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity} - {self.customer}"
+
+
+class StockShard(models.Model):
+    """
+    One slice of a hot product's stock counter.
+
+    Sharded products keep their authoritative stock spread over several rows
+    so concurrent orders update different rows. ``ProductService.stock_quantity``
+    holds a snapshot that is refreshed when the shards are rebalanced.
+    """
+    product = models.ForeignKey(
+        ProductService,
+        on_delete=models.CASCADE,
+        related_name='stock_shard_rows',
+        verbose_name=_('পণ্য/সেবা')
+    )
+    
+    shard = models.PositiveSmallIntegerField(
+        verbose_name=_('শার্ড')
+    )
+    
+    quantity = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('পরিমাণ')
+    )
+    
+    class Meta:
+        verbose_name = _('স্টক শার্ড')
+        verbose_name_plural = _('স্টক শার্ড')
+        unique_together = ['product', 'shard']
+    
+    def __str__(self):
+        return f"{self.product.name} #{self.shard} - {self.quantity}"
+
+
+class OrderNumberSequence(models.Model):
+    """
+    Last order number handed out for one day.
+
+    Processes reserve numbers from it in blocks, so the row is written once
+    per block rather than once per order.
+    """
+    day = models.DateField(
+        unique=True,
+        verbose_name=_('দিন')
+    )
+    
+    last_value = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('শেষ নম্বর')
+    )
+    
+    class Meta:
+        verbose_name = _('অর্ডার নম্বর ক্রম')
+        verbose_name_plural = _('অর্ডার নম্বর ক্রম')
+    
+    def __str__(self):
+        return f"{self.day} - {self.last_value}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Version the catalog cache keys carry, one row for every process.
+
+    Kept in the database rather than the cache so that a bump by a web
+    worker, a management command or a shell is seen by all the others.
+    """
+    version = models.PositiveBigIntegerField(
+        default=1,
+        verbose_name=_('সংস্করণ')
+    )
+    
+    class Meta:
+        verbose_name = _('ক্যাটালগ সংস্করণ')
+        verbose_name_plural = _('ক্যাটালগ সংস্করণ')
+    
+    def __str__(self):
+        return f"{self.version}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response recorded for a retried request's idempotency key.
+
+    A row is inserted before the request is handled, so the unique index
+    doubles as the lock that lets only one of several concurrent duplicates
+    do the work; ``status_code`` stays empty until that response is stored.
+    """
+    scope = models.CharField(
+        max_length=50,
+        verbose_name=_('পরিধি')
+    )
+    
+    key = models.CharField(
+        max_length=255,
+        verbose_name=_('কী')
+    )
+    
+    request_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name=_('অনুরোধ হ্যাশ')
+    )
+    
+    status_code = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+        verbose_name=_('স্ট্যাটাস কোড')
+    )
+    
+    content_type = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_('কনটেন্ট টাইপ')
+    )
+    
+    response_body = models.TextField(
+        blank=True,
+        verbose_name=_('প্রতিক্রিয়া')
+    )
+    
+    locked_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('লক শেষ')
+    )
+    
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name=_('মেয়াদ শেষ')
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('তৈরি হয়েছে')
+    )
+    
+    class Meta:
+        verbose_name = _('আইডেমপোটেন্সি কী')
+        verbose_name_plural = _('আইডেমপোটেন্সি কী')
+        unique_together = ['scope', 'key']
+    
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
+
+
+class SavedCart(models.Model):
+    """
+    A logged-in customer's cart, in the compact line format of ``orders.cart.Cart``
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='saved_cart',
+        verbose_name=_('ব্যবহারকারী')
+    )
+    
+    lines = models.JSONField(
+        default=dict,
+        verbose_name=_('লাইন')
+    )
+    
+    updated_at = models.DateTimeField(
+        db_index=True,
+        verbose_name=_('আপডেট হয়েছে')
+    )
+    
+    class Meta:
+        verbose_name = _('সংরক্ষিত কার্ট')
+        verbose_name_plural = _('সংরক্ষিত কার্ট')
+    
+    def __str__(self):
+        return f"Cart of {self.user_id}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Finished order moved out of the live tables by the archiver.
+
+    Keeps the live order's id, number and fields, so archived and live
+    orders can be looked up and listed side by side.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name=_('আইডি')
+    )
+    
+    order_number = models.CharField(
+        max_length=20,
+        unique=True,
+        verbose_name=_('অর্ডার নম্বর')
+    )
+    
+    customer = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_orders',
+        verbose_name=_('গ্রাহক')
+    )
+    
+    delivery_type = models.CharField(
+        max_length=20,
+        choices=Order.DELIVERY_TYPE_CHOICES,
+        default='instant',
+        verbose_name=_('ডেলিভারি ধরন')
+    )
+    
+    scheduled_delivery_time = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('নির্ধারিত ডেলিভারি সময়')
+    )
+    
+    delivery_address = models.TextField(
+        verbose_name=_('ডেলিভারি ঠিকানা')
+    )
+    
+    delivery_city = models.CharField(
+        max_length=100,
+        verbose_name=_('ডেলিভারি শহর')
+    )
+    
+    delivery_instructions = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name=_('ডেলিভারি নির্দেশনা')
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Order.ORDER_STATUS_CHOICES,
+        verbose_name=_('অবস্থা')
+    )
+    
+    total_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name=_('মোট পরিমাণ (৳)')
+    )
+    
+    delivery_fee = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('ডেলিভারি ফি (৳)')
+    )
+    
+    special_instructions = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name=_('বিশেষ নির্দেশনা')
+    )
+    
+    cancellation_reason = models.CharField(
+        max_length=50,
+        blank=True,
+        null=True,
+        verbose_name=_('বাতিলের কারণ')
+    )
+    
+    cancellation_notes = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name=_('বাতিলের নোট')
+    )
+    
+    cancelled_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('বাতিল হয়েছে')
+    )
+    
+    cancelled_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('বাতিল করেছেন')
+    )
+    
+    refund_preference = models.CharField(
+        max_length=30,
+        blank=True,
+        null=True,
+        verbose_name=_('রিফান্ড পছন্দ')
+    )
+    
+    item_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('পণ্যের সংখ্যা')
+    )
+    
+    customer_name = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('গ্রাহকের নাম')
+    )
+    
+    status_changed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_('শেষ অবস্থা পরিবর্তন')
+    )
+    
+    payment_state = models.CharField(
+        max_length=20,
+        choices=Order.PAYMENT_STATE_CHOICES,
+        default='unpaid',
+        verbose_name=_('পেমেন্ট অবস্থা')
+    )
+    
+    created_at = models.DateTimeField(
+        verbose_name=_('তৈরি হয়েছে')
+    )
+    
+    updated_at = models.DateTimeField(
+        verbose_name=_('আপডেট হয়েছে')
+    )
+    
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('আর্কাইভ হয়েছে')
+    )
+    
+    is_archived = True
+    
+    class Meta:
+        verbose_name = _('আর্কাইভ অর্ডার')
+        verbose_name_plural = _('আর্কাইভ অর্ডার')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='archived_customer_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"অর্ডার #{self.order_number} - {self.customer.get_full_name()}"
+    
+    def can_be_cancelled(self):
+        return False
+
+
+class ArchivedOrderItem(models.Model):
+    """
+    Line of an archived order
+    """
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name=_('অর্ডার')
+    )
+    
+    product = models.ForeignKey(
+        ProductService,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('পণ্য/সেবা')
+    )
+    
+    product_name = models.CharField(
+        max_length=200,
+        verbose_name=_('পণ্যের নাম')
+    )
+    
+    quantity = models.PositiveIntegerField(
+        verbose_name=_('পরিমাণ')
+    )
+    
+    unit_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name=_('একক দাম (৳)')
+    )
+    
+    total_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name=_('মোট দাম (৳)')
+    )
+    
+    class Meta:
+        verbose_name = _('আর্কাইভ অর্ডার আইটেম')
+        verbose_name_plural = _('আর্কাইভ অর্ডার আইটেম')
+    
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+
+class ArchivedOrderStatusHistory(models.Model):
+    """
+    Status change of an archived order
+    """
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='status_history',
+        verbose_name=_('অর্ডার')
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Order.ORDER_STATUS_CHOICES,
+        verbose_name=_('অবস্থা')
+    )
+    
+    notes = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name=_('নোট')
+    )
+    
+    created_at = models.DateTimeField(
+        verbose_name=_('তৈরি হয়েছে')
+    )
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('তৈরি করেছেন')
+    )
+    
+    class Meta:
+        verbose_name = _('আর্কাইভ অর্ডার অবস্থা ইতিহাস')
+        verbose_name_plural = _('আর্কাইভ অর্ডার অবস্থা ইতিহাস')
+        ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.order.order_number} - {self.get_status_display()}"
\ No newline at end of file
+        return f"{self.order.order_number} - {self.get_status_display()}"
@@ -0,0 +1,107 @@
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderNumberSequence
+
+PREFIX = 'NE'
+SEQUENCE_DIGITS = 7
+
+
+def block_size():
+    """
+    How many order numbers a process reserves per database round trip
+    """
+    return getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 50)
+
+
+def format_order_number(day, value):
+    """
+    ``NE`` + yymmdd + the day's sequence, e.g. NE2610180000042.
+
+    Numbers of the same width sort by the day they were issued and then by
+    sequence, so the unique index is appended to rather than split at
+    random places. Raises OverflowError rather than issue a number of
+    another width once a day runs out.
+    """
+    if value >= 10 ** SEQUENCE_DIGITS:
+        raise OverflowError(f'Order numbers of {day} are used up')
+    return f'{PREFIX}{day:%y%m%d}{value:0{SEQUENCE_DIGITS}d}'
+
+
+def reserve_block(day, size):
+    """
+    Reserve ``size`` numbers of ``day`` and return the first and last of them
+    """
+    # No savepoint is needed for the UPDATE and SELECT; they only have to
+    # share a transaction so the value read back is the one we wrote
+    with transaction.atomic(savepoint=False):
+        updated = OrderNumberSequence.objects.filter(day=day).update(last_value=F('last_value') + size)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    OrderNumberSequence.objects.create(day=day, last_value=size)
+                return 1, size
+            except IntegrityError:
+                # Another process opened the day first
+                OrderNumberSequence.objects.filter(day=day).update(last_value=F('last_value') + size)
+        last = OrderNumberSequence.objects.filter(day=day).values_list('last_value', flat=True).get()
+    return last - size + 1, last
+
+
+class _Block:
+    def __init__(self, day, first, last):
+        self.day = day
+        self.next = first
+        self.last = last
+        self.committed = False
+
+    def confirm(self):
+        self.committed = True
+
+
+class OrderNumberAllocator(threading.local):
+    """
+    Hands out order numbers from a block reserved in the database.
+
+    Blocks are kept per thread, like Django's connections. A block reserved
+    inside a transaction is only trusted once that transaction commits: if
+    it rolls back, the reservation is undone in the database too, so the
+    block is dropped instead of risking numbers another process may get.
+    Until then only the number that reserved it is taken from it, so a
+    long transaction numbering many orders reserves a block for each.
+    """
+    def __init__(self):
+        self.block = None
+
+    def usable(self, day):
+        block = self.block
+        if block is None or block.day != day or block.next > block.last:
+            return False
+        return block.committed
+
+    def next_number(self):
+        day = timezone.localdate()
+        if not self.usable(day):
+            first, last = reserve_block(day, block_size())
+            self.block = _Block(day, first, last)
+            if connection.in_atomic_block:
+                transaction.on_commit(self.block.confirm)
+            else:
+                self.block.confirm()
+        value = self.block.next
+        self.block.next += 1
+        return format_order_number(day, value)
+
+
+allocator = OrderNumberAllocator()
+
+
+def next_order_number():
+    """
+    A new unique, time-ordered order number
+    """
+    return allocator.next_number()
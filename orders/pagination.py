@@ -0,0 +1,189 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+def encode_cursor(value, pk, direction):
+    """
+    Pack a position in the ordering into an opaque URL-safe token
+    """
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, pk, direction])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Unpack a cursor token into (value, pk, direction)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise Http404('Invalid cursor')
+    if direction not in ('next', 'prev'):
+        raise Http404('Invalid cursor')
+    return value, pk, direction
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset.
+
+    Mirrors the parts of ``django.core.paginator.Page`` that list templates
+    use, but navigation is by cursor instead of page number.
+    """
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on (field, id) descending without OFFSET.
+
+    Each page is one indexed range query no matter how deep it is. The total
+    count is not needed for navigation; when a template asks for it, it is
+    estimated and cached instead of running COUNT(*) on every request.
+
+    ``merged`` querysets of other models sharing ``field`` and the id space
+    (such as archived orders) are paged together with the main one: every
+    page runs the same range query on each and keeps the top rows.
+    """
+    def __init__(self, queryset, per_page, field='created_at', count_timeout=300, merged=()):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.field = field
+        self.count_timeout = count_timeout
+        self.merged = tuple(merged)
+
+    def _to_python(self, value):
+        return self.queryset.model._meta.get_field(self.field).to_python(value)
+
+    def _cursor(self, obj, direction):
+        return encode_cursor(getattr(obj, self.field), obj.pk, direction)
+
+    def _rows(self, queryset, value=None, pk=None, direction='next'):
+        field = self.field
+        if direction == 'next':
+            rows = queryset.order_by(f'-{field}', '-pk')
+            if value is not None:
+                rows = rows.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        else:
+            rows = queryset.order_by(field, 'pk').filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+            )
+        return list(rows[:self.per_page + 1])
+
+    def _fetch(self, value=None, pk=None, direction='next'):
+        rows = self._rows(self.queryset, value, pk, direction)
+        if self.merged:
+            for queryset in self.merged:
+                rows.extend(self._rows(queryset, value, pk, direction))
+            rows.sort(key=lambda row: (getattr(row, self.field), row.pk), reverse=direction == 'next')
+            rows = rows[:self.per_page + 1]
+        return rows
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = self._fetch()
+            has_more, has_before = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            value, pk, direction = decode_cursor(cursor)
+            try:
+                value = self._to_python(value)
+            except Exception:
+                raise Http404('Invalid cursor')
+            rows = self._fetch(value, pk, direction)
+            if direction == 'next':
+                has_more, has_before = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                has_before, has_more = len(rows) > self.per_page, True
+                rows = rows[:self.per_page][::-1]
+
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=self._cursor(rows[-1], 'next') if rows and has_more else None,
+            previous_cursor=self._cursor(rows[0], 'prev') if rows and has_before else None,
+        )
+
+    @cached_property
+    def count(self):
+        """
+        Approximate number of rows, refreshed at most every ``count_timeout`` seconds
+        """
+        query = self.queryset.order_by().query
+        connection = connections[self.queryset.db]
+        if connection.vendor == 'postgresql' and not query.where and not self.merged:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [self.queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+
+        key = 'keyset_count:' + hashlib.md5(
+            ''.join(str(queryset.order_by().query) for queryset in (self.queryset,) + self.merged).encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = sum(queryset.order_by().count() for queryset in (self.queryset,) + self.merged)
+            cache.set(key, count, self.count_timeout)
+        return count
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that swaps OFFSET pagination for keyset pagination.
+
+    Views set ``keyset_field`` to the timestamp they list by; the page is
+    selected with the ``cursor`` query parameter. Views that also list rows
+    from another table override ``get_merged_querysets``.
+    """
+    keyset_field = 'created_at'
+    cursor_kwarg = 'cursor'
+    count_timeout = 300
+
+    def get_merged_querysets(self):
+        return ()
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, page_size, field=self.keyset_field, count_timeout=self.count_timeout,
+            merged=self.get_merged_querysets()
+        )
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
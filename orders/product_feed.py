@@ -0,0 +1,234 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .catalog import catalog_changed
+from .models import ProductService
+from .stock import set_stock
+
+FIELDS = ['sku', 'name', 'description', 'category', 'price', 'stock_quantity', 'is_available']
+FORMATS = ('csv', 'jsonl')
+CATEGORIES = {choice for choice, _ in ProductService.CATEGORY_CHOICES}
+MAX_REPORTED_ERRORS = 1000
+UPDATE_BATCH_SIZE = 100
+
+_TRUE = {'1', 'true', 'yes', 'y', 'হ্যাঁ'}
+_FALSE = {'0', 'false', 'no', 'n', 'না'}
+
+
+class ImportReport:
+    """
+    Counts and row errors collected while importing a product feed
+    """
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def feed_format(filename, default='csv'):
+    """
+    Guess the feed format from a file name
+    """
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_rows(stream, fmt):
+    """
+    Yield (line_number, row) pairs from a binary stream without reading it whole
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f'Invalid JSON: {e}')
+                continue
+            yield line_number, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f'Invalid is_available value {value!r}')
+
+
+def clean_row(row):
+    """
+    Validate one feed row and return the product field values it sets.
+
+    Empty cells are treated as absent, so a feed only needs the columns it
+    wants to change; raises ValueError with a readable message otherwise.
+    """
+    values = {
+        field: row[field] for field in FIELDS
+        if row.get(field) is not None and str(row[field]).strip() != ''
+    }
+    if 'sku' not in values:
+        raise ValueError('sku is required')
+    values['sku'] = str(values['sku']).strip()
+    if len(values['sku']) > 64:
+        raise ValueError('sku is longer than 64 characters')
+    if 'name' in values:
+        values['name'] = str(values['name']).strip()[:200]
+    if 'description' in values:
+        values['description'] = str(values['description'])
+    if 'category' in values:
+        values['category'] = str(values['category']).strip()
+        if values['category'] not in CATEGORIES:
+            raise ValueError(f'Unknown category {values["category"]!r}')
+    if 'price' in values:
+        try:
+            values['price'] = Decimal(str(values['price'])).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f'Invalid price {values["price"]!r}')
+        if values['price'] < 0 or values['price'] >= Decimal('1e8'):
+            raise ValueError(f'Price out of range {values["price"]}')
+    if 'stock_quantity' in values:
+        try:
+            values['stock_quantity'] = int(values['stock_quantity'])
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid stock_quantity {values["stock_quantity"]!r}')
+        if values['stock_quantity'] < 0:
+            raise ValueError('stock_quantity cannot be negative')
+    if 'is_available' in values:
+        values['is_available'] = _boolean(values['is_available'])
+    return values
+
+
+def _upsert_batch(batch, report):
+    """
+    Write one batch of cleaned rows with one SELECT, one INSERT and a few UPDATEs
+    """
+    existing = ProductService.objects.in_bulk([values['sku'] for _, values in batch], field_name='sku')
+    to_create, to_update, fields = {}, {}, set()
+    now = timezone.now()
+
+    for line, values in batch:
+        product = existing.get(values['sku']) or to_create.get(values['sku'])
+        if product is None:
+            missing = [field for field in ('name', 'category', 'price') if field not in values]
+            if missing:
+                report.add_error(line, f'New product needs {", ".join(missing)}')
+                continue
+            values.setdefault('description', '')
+            to_create[values['sku']] = ProductService(**values)
+            continue
+        changed = [field for field, value in values.items() if getattr(product, field) != value]
+        for field in changed:
+            setattr(product, field, values[field])
+        # Feeds are mostly unchanged rows; only rows that differ are written
+        if product.pk and changed:
+            product.updated_at = now
+            to_update[product.sku] = product
+            fields.update(changed)
+
+    with transaction.atomic():
+        created = ProductService.objects.bulk_create(list(to_create.values()))
+        updated = list(to_update.values())
+        fields.discard('sku')
+        if updated and fields:
+            # bulk_update builds one CASE per field over the batch; SQLite
+            # evaluates it row by row, so small batches avoid quadratic cost
+            ProductService.objects.bulk_update(
+                updated, sorted(fields) + ['updated_at'], batch_size=UPDATE_BATCH_SIZE
+            )
+        if 'stock_quantity' in fields:
+            for product in updated:
+                if product.stock_shards:
+                    set_stock(product, product.stock_quantity)
+        # bulk writes skip post_save, so the search index is refreshed here
+        search.index_products(created + updated)
+
+    report.created += len(created)
+    report.updated += len(updated)
+
+
+def import_products(rows, batch_size=1000):
+    """
+    Upsert products by SKU from an iterable of (line_number, row) pairs.
+
+    Rows are validated one by one and written in batches, so memory use is
+    bounded by ``batch_size`` however long the feed is. Invalid rows are
+    skipped and listed in the returned ``ImportReport``.
+    """
+    report = ImportReport()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for line, row in chunk:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                batch.append((line, clean_row(row)))
+            except ValueError as e:
+                report.add_error(line, str(e))
+        if batch:
+            _upsert_batch(batch, report)
+    if report.created or report.updated:
+        catalog_changed()
+    return report
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line back instead of storing it
+    """
+    def write(self, value):
+        return value
+
+
+def export_products(fmt='csv', chunk_size=2000):
+    """
+    Yield the whole catalog as CSV or JSONL lines, one chunk in memory at a time
+    """
+    products = ProductService.objects.order_by('pk').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for row in products:
+            yield writer.writerow(row)
+    else:
+        for row in products:
+            values = dict(zip(FIELDS, row))
+            values['price'] = str(values['price'])
+            yield json.dumps(values, ensure_ascii=False) + '\n'
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .checkout import CheckoutError, quantity_case, normalize_cart, out_of_stock_message
+from .models import ProductService, StockReservation
+from .stock import live_stock, shard_totals
+
+
+def reservation_ttl():
+    """
+    How long a cart hold keeps stock away from other customers
+    """
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def release_quantities(lines):
+    """
+    Give held quantities back to the available pool in one UPDATE
+    """
+    if lines:
+        ProductService.objects.filter(pk__in=list(lines)).update(
+            reserved_quantity=F('reserved_quantity') - quantity_case(lines)
+        )
+
+
+def release_customer_holds(customer, product_ids=None):
+    """
+    Drop a customer's holds and return {product_id: quantity} that was held.
+
+    The holds are locked and deleted by id, like ``expire_reservations``
+    does. Their stock is only released if every one of them was still there
+    to delete; otherwise a checkout or the sweeper took some in between,
+    so the delete is rolled back and the holds are read again.
+    """
+    holds = StockReservation.objects.filter(customer=customer)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    while True:
+        with transaction.atomic():
+            rows = list(holds.select_for_update().values_list('pk', 'product_id', 'quantity'))
+            if not rows:
+                return {}
+            deleted, _ = StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            if deleted == len(rows):
+                held = {product_id: quantity for _, product_id, quantity in rows}
+                release_quantities(held)
+                return held
+            transaction.set_rollback(True)
+
+
+def reserve_cart(customer, cart_items):
+    """
+    Replace the customer's holds with holds for the given cart.
+
+    Every line is reserved with one conditional UPDATE, checked against the
+    shard totals of sharded products; if any product does not have enough
+    unreserved stock the whole cart is rejected and the previous holds are
+    restored by the transaction rollback.
+    """
+    lines = normalize_cart(cart_items)
+    expires_at = timezone.now() + reservation_ttl()
+
+    with transaction.atomic():
+        release_customer_holds(customer)
+        if not lines:
+            return expires_at
+
+        quantities = quantity_case(lines)
+        updated = ProductService.objects.alias(stock=live_stock()).filter(
+            pk__in=list(lines),
+            is_available=True,
+            stock__gte=F('reserved_quantity') + quantities,
+        ).update(reserved_quantity=F('reserved_quantity') + quantities)
+
+        if updated != len(lines):
+            products = ProductService.objects.in_bulk(list(lines))
+            missing = [product_id for product_id in lines if product_id not in products]
+            if missing:
+                raise CheckoutError(f'Product {missing[0]} not found')
+            stock = shard_totals([product.pk for product in products.values() if product.stock_shards])
+            for product_id, quantity in stock.items():
+                products[product_id].stock_quantity = quantity
+            out_of_stock_items = [
+                {
+                    'name': product.name,
+                    'requested': lines[product.pk],
+                    'available': product.available_quantity,
+                    'status': product.get_stock_status()
+                }
+                for product in products.values() if not product.is_in_stock(lines[product.pk])
+            ]
+            raise CheckoutError(out_of_stock_message(out_of_stock_items), out_of_stock_items)
+
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                customer=customer,
+                product_id=product_id,
+                quantity=quantity,
+                expires_at=expires_at
+            )
+            for product_id, quantity in lines.items()
+        ])
+
+    return expires_at
+
+
+def expire_reservations(now=None, batch_size=500):
+    """
+    Delete expired holds in batches and release their stock.
+
+    Each batch is one SELECT, one DELETE and one UPDATE no matter how many
+    products it touches. Returns the number of holds expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if not batch:
+                return expired
+
+            released = defaultdict(int)
+            for _, product_id, quantity in batch:
+                released[product_id] += quantity
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+            release_quantities(released)
+
+        expired += len(batch)
+        if len(batch) < batch_size:
+            return expired
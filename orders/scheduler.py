@@ -0,0 +1,258 @@
+import heapq
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from dashboard import events, rollups
+from delivery.models import DeliveryAssignment
+
+from .models import Order
+from .transitions import MAX_BULK_ORDERS, bulk_transition
+
+# Scheduled orders still waiting for their slot
+OPEN_STATUSES = ('pending', 'confirmed')
+
+# Orders in these states keep their agent busy
+ACTIVE_STATUSES = ('pending', 'confirmed', 'processing', 'dispatched')
+
+# How far back each sync looks, so rows committed late are not missed
+SYNC_OVERLAP = timedelta(minutes=1)
+
+# How long the scheduler trusts its own count of each agent's open orders
+AGENT_REFRESH = timedelta(minutes=5)
+
+# How soon a released order that found no agent is offered one again
+AGENT_RETRY = timedelta(minutes=1)
+
+
+def release_lead():
+    """
+    How long before its slot a scheduled order is released to dispatch
+    """
+    return timedelta(minutes=getattr(settings, 'SCHEDULED_RELEASE_LEAD_MINUTES', 60))
+
+
+def open_scheduled_orders():
+    """
+    Scheduled orders not yet handed to an agent, found through the order_scheduled_* indexes
+    """
+    return Order.objects.filter(
+        delivery_type='scheduled', status__in=OPEN_STATUSES, scheduled_delivery_time__isnull=False
+    ).filter(delivery_assignment__isnull=True).order_by()
+
+
+def agent_loads():
+    """
+    ``[(open assignments, agent id)]`` for every agent who can take orders.
+
+    Assignments are counted from the active orders' side, so the cost
+    follows the work in progress rather than every agent's history.
+    """
+    agents = get_user_model().objects.filter(
+        user_type='delivery_agent', is_active=True, delivery_agent_profile__is_available=True
+    ).values_list('pk', flat=True)
+    busy = dict(
+        DeliveryAssignment.objects.filter(order__status__in=ACTIVE_STATUSES)
+        .values('delivery_agent').annotate(load=Count('pk')).order_by()
+        .values_list('delivery_agent', 'load')
+    )
+    return [(busy.get(agent_id, 0), agent_id) for agent_id in agents]
+
+
+def assign_agents(orders, loads=None):
+    """
+    Give each ``(order id, slot)`` to the least busy available agent.
+
+    Agents are kept in a heap by open assignments, so a batch is spread
+    evenly without a query per order; all assignments are written with one
+    bulk INSERT. Orders someone assigned meanwhile are left alone. A heap
+    from ``agent_loads()`` may be passed in and is kept up to date, so
+    callers assigning often need not count again. Returns the ids of the
+    orders that were assigned.
+    """
+    if not orders:
+        return []
+    if loads is None:
+        loads = agent_loads()
+        heapq.heapify(loads)
+    if not loads:
+        return []
+    assignments = []
+    for order_id, slot in orders:
+        load, agent_id = heapq.heappop(loads)
+        assignments.append(DeliveryAssignment(
+            order_id=order_id,
+            delivery_agent_id=agent_id,
+            estimated_delivery_time=slot,
+            delivery_notes='Assigned automatically for scheduled delivery'
+        ))
+        heapq.heappush(loads, (load + 1, agent_id))
+    DeliveryAssignment.objects.bulk_create(assignments, ignore_conflicts=True)
+
+    # ignore_conflicts skips rows silently; ours are the ones that carry
+    # the agent and timestamp written here
+    stored = {
+        order_id: (agent_id, assigned_at)
+        for order_id, agent_id, assigned_at in DeliveryAssignment.objects.filter(
+            order_id__in=[assignment.order_id for assignment in assignments]
+        ).values_list('order_id', 'delivery_agent_id', 'assigned_at')
+    }
+    assigned, skipped = [], Counter()
+    for assignment in assignments:
+        if stored.get(assignment.order_id) == (assignment.delivery_agent_id, assignment.assigned_at):
+            assigned.append(assignment.order_id)
+        else:
+            skipped[assignment.delivery_agent_id] += 1
+    if skipped:
+        loads[:] = [(load - skipped[agent_id], agent_id) for load, agent_id in loads]
+        heapq.heapify(loads)
+    if assigned:
+        rollups.touch('deliveries', timezone.now())
+        events.deliveries_assigned(assigned)
+    return assigned
+
+
+def release_orders(order_ids, now=None, loads=None, unassigned=None):
+    """
+    Release the due orders among ``order_ids`` to dispatch.
+
+    Pending orders are confirmed with one conditional UPDATE and agents are
+    assigned with one bulk INSERT, whatever the batch size; ``loads`` is
+    passed on to ``assign_agents``. Ids that are no longer due (rescheduled,
+    cancelled, already assigned) are skipped. Confirmed orders no agent
+    could take are added to the ``unassigned`` list, if given, with their
+    slot. Returns the ids released, meaning confirmed and assigned.
+    """
+    now = now or timezone.now()
+    released = []
+    order_ids = list(order_ids)
+    for start in range(0, len(order_ids), MAX_BULK_ORDERS):
+        rows = list(
+            open_scheduled_orders().filter(
+                pk__in=order_ids[start:start + MAX_BULK_ORDERS],
+                scheduled_delivery_time__lte=now + release_lead()
+            ).values_list('pk', 'status', 'scheduled_delivery_time')
+        )
+        if not rows:
+            continue
+        with transaction.atomic():
+            pending = [pk for pk, status, slot in rows if status == 'pending']
+            confirmed = set()
+            if pending:
+                results = bulk_transition(pending, 'confirmed', notes='Released for scheduled delivery')
+                confirmed = {result['order_id'] for result in results if result['success']}
+            batch = [(pk, slot) for pk, status, slot in rows if status == 'confirmed' or pk in confirmed]
+            assigned = set(assign_agents(batch, loads))
+        released.extend(pk for pk, slot in batch if pk in assigned)
+        if unassigned is not None:
+            unassigned.extend((pk, slot) for pk, slot in batch if pk not in assigned)
+    return released
+
+
+class ReleaseScheduler:
+    """
+    Releases scheduled orders when their slot comes close.
+
+    Upcoming orders are kept in memory in a min-heap keyed by release time,
+    built with one indexed query on start. Each tick pops what is due and
+    releases it in batches, then picks up orders created or rescheduled
+    since the last tick with one more query. An order's latest release time
+    lives in ``scheduled``; heap entries that no longer match it are stale
+    and dropped when popped, so rescheduling never has to search the heap.
+
+    Agent loads are counted once every ``AGENT_REFRESH`` and then tracked
+    as orders are assigned, since counting them means reading every
+    agent's assignment history. Orders that come due while no agent is
+    free stay confirmed and go back on the heap ``AGENT_RETRY`` later,
+    with the agents counted again.
+    """
+    def __init__(self):
+        self.heap = []
+        self.scheduled = {}
+        self.retry_at = {}
+        self.synced_at = None
+        self.loads = None
+        self.loads_at = None
+
+    def __len__(self):
+        return len(self.scheduled)
+
+    def push(self, order_id, slot):
+        release_at = slot - release_lead()
+        # A sync seeing the confirmation must not bring a retry forward
+        release_at = max(release_at, self.retry_at.get(order_id, release_at))
+        if self.scheduled.get(order_id) != release_at:
+            self.scheduled[order_id] = release_at
+            heapq.heappush(self.heap, (release_at, order_id))
+
+    def load(self, now=None):
+        """
+        Rebuild the heap from the database
+        """
+        now = now or timezone.now()
+        lead = release_lead()
+        rows = open_scheduled_orders().values_list('pk', 'scheduled_delivery_time').iterator()
+        self.scheduled = {pk: slot - lead for pk, slot in rows}
+        self.retry_at = {}
+        self.heap = [(release_at, pk) for pk, release_at in self.scheduled.items()]
+        heapq.heapify(self.heap)
+        self.synced_at = now
+
+    def sync(self, now=None):
+        """
+        Add orders created or changed since the last sync
+        """
+        now = now or timezone.now()
+        if self.synced_at is None:
+            return self.load(now)
+        rows = open_scheduled_orders().filter(
+            updated_at__gte=self.synced_at - SYNC_OVERLAP
+        ).values_list('pk', 'scheduled_delivery_time')
+        for pk, slot in rows:
+            self.push(pk, slot)
+        self.synced_at = now
+
+    def due(self, now):
+        """
+        Pop the ids of every order whose release time has come
+        """
+        ids = []
+        while self.heap and self.heap[0][0] <= now:
+            release_at, pk = heapq.heappop(self.heap)
+            if self.scheduled.get(pk) == release_at:
+                del self.scheduled[pk]
+                self.retry_at.pop(pk, None)
+                ids.append(pk)
+        return ids
+
+    def next_release(self):
+        """
+        When the earliest order in the heap is due, or None
+        """
+        return self.heap[0][0] if self.heap else None
+
+    def tick(self, now=None, sync=True):
+        """
+        Release everything due at ``now``; returns the ids released
+        """
+        now = now or timezone.now()
+        if sync:
+            self.sync(now)
+        ids = self.due(now)
+        if not ids:
+            return []
+        if not self.loads or now - self.loads_at >= AGENT_REFRESH:
+            self.loads = agent_loads()
+            heapq.heapify(self.loads)
+            self.loads_at = now
+        unassigned = []
+        released = release_orders(ids, now, self.loads, unassigned)
+        for pk, slot in unassigned:
+            self.retry_at[pk] = now + AGENT_RETRY
+            self.push(pk, slot)
+        return released
@@ -0,0 +1,176 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import ProductService
+
+TABLE = 'orders_product_search'
+
+# unicode61 treats combining marks as separators, which shreds Bengali words
+# at every vowel sign and hasanta; keeping M* as token characters fixes that.
+TOKENIZER = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+
+CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+    name, description, category UNINDEXED,
+    tokenize = "{TOKENIZER}",
+    prefix = '2 3'
+)
+"""
+DROP_SQL = f'DROP TABLE IF EXISTS {TABLE}'
+
+# bm25 column weights: a hit in the name counts ten times a description hit
+NAME_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+
+_BENGALI_DIGITS = str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')
+_JOINERS = dict.fromkeys([0x200C, 0x200D])  # ZWNJ, ZWJ
+_SCRIPT_BOUNDARY = re.compile(r'(?<=[\u0980-\u09FF])(?=[a-z0-9])|(?<=[a-z0-9])(?=[\u0980-\u09FF])')
+_TOKEN = re.compile(r'[\w\u0980-\u09FF]+')
+
+
+def enabled():
+    """
+    The full-text index only exists on SQLite
+    """
+    return connection.vendor == 'sqlite'
+
+
+def normalize_text(text):
+    """
+    Canonicalise Bangla/English text for indexing and querying.
+
+    NFC folds the two encodings of letters such as ড় and য়, zero-width
+    joiners are dropped so they do not split words, Bengali digits become
+    ASCII so "৫০০" matches "500", and a space is put between Bengali and
+    Latin runs so mixed words like "চাল5kg" index as two tokens.
+    """
+    text = unicodedata.normalize('NFC', text or '').lower()
+    text = text.translate(_JOINERS).translate(_BENGALI_DIGITS)
+    return _SCRIPT_BOUNDARY.sub(' ', text)
+
+
+def match_expression(query, prefix=False, column=None):
+    """
+    Turn user input into an FTS5 MATCH expression, or None if it has no words.
+
+    Every word must match; with ``prefix`` the last word may be incomplete.
+    Words are quoted so FTS5 operators typed by users are taken literally.
+    """
+    tokens = _TOKEN.findall(normalize_text(query))
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    expression = ' '.join(terms)
+    if column:
+        expression = f'{column} : ({expression})'
+    return expression
+
+
+def index_products(products):
+    """
+    Insert or refresh the index rows of the given products
+    """
+    if not enabled():
+        return
+    rows = [
+        (product.pk, normalize_text(product.name), normalize_text(product.description), product.category)
+        for product in products
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def remove_products(product_ids):
+    """
+    Drop the index rows of deleted products
+    """
+    if not enabled() or not product_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+
+def rebuild_index(batch_size=2000):
+    """
+    Re-create the whole index from ``ProductService``; returns the row count
+    """
+    if not enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    indexed = 0
+    batch = []
+    for product in ProductService.objects.only('name', 'description', 'category').iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) == batch_size:
+            index_products(batch)
+            indexed += len(batch)
+            batch = []
+    index_products(batch)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return indexed + len(batch)
+
+
+def _ranked_ids(expression, category=None, limit=20, offset=0):
+    sql = (
+        f'SELECT {TABLE}.rowid FROM {TABLE} '
+        f'JOIN {ProductService._meta.db_table} p ON p.id = {TABLE}.rowid '
+        f'WHERE {TABLE} MATCH %s AND p.is_available'
+    )
+    params = [expression]
+    if category:
+        sql += f' AND {TABLE}.category = %s'
+        params.append(category)
+    sql += f' ORDER BY bm25({TABLE}, %s, %s) LIMIT %s OFFSET %s'
+    params += [NAME_WEIGHT, DESCRIPTION_WEIGHT, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_products(query, category=None, limit=20, offset=0):
+    """
+    Return available products matching ``query``, best match first
+    """
+    if not enabled():
+        products = ProductService.objects.filter(is_available=True).filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        )
+        if category:
+            products = products.filter(category=category)
+        return list(products.order_by('-created_at')[offset:offset + limit])
+
+    expression = match_expression(query, prefix=True)
+    if expression is None:
+        return []
+    ids = _ranked_ids(expression, category, limit, offset)
+    products = ProductService.objects.in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+
+def autocomplete(prefix, category=None, limit=8):
+    """
+    Suggest product names for a partially typed query
+    """
+    if not enabled():
+        return [
+            {'id': product.pk, 'name': product.name}
+            for product in search_products(prefix, category, limit)
+        ]
+
+    expression = match_expression(prefix, prefix=True, column='name')
+    if expression is None:
+        return []
+    ids = _ranked_ids(expression, category, limit)
+    names = dict(ProductService.objects.filter(pk__in=ids).values_list('pk', 'name'))
+    return [{'id': pk, 'name': names[pk]} for pk in ids if pk in names]
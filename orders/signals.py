@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from delivery.models import DeliveryAssignment
+from payments.models import Payment
+
+from . import search
+from .cart import merge_session_cart
+from .models import Order, OrderStatusHistory, ProductService
+from .summary import refresh_payment_states, rename_customer
+from .timeline import timeline_changed
+
+NAME_FIELDS = {'first_name', 'last_name', 'username'}
+
+
+@receiver(post_save, sender=ProductService)
+def index_product(sender, instance, raw=False, **kwargs):
+    """
+    Keep the product search index in step with product saves
+    """
+    if not raw:
+        search.index_products([instance])
+
+
+@receiver(post_delete, sender=ProductService)
+def unindex_product(sender, instance, **kwargs):
+    """
+    Drop deleted products from the search index
+    """
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=get_user_model())
+def rename_customer_orders(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    Keep Order.customer_name in step with the customer's name
+    """
+    if raw or created or (update_fields is not None and not NAME_FIELDS & set(update_fields)):
+        return
+    rename_customer(instance)
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    """
+    Carry the cart built before logging in over to the customer's cart
+    """
+    if request is not None and hasattr(request, 'session'):
+        merge_session_cart(request.session, user)
+
+
+@receiver(post_save, sender='payments.Payment')
+@receiver(post_delete, sender='payments.Payment')
+def sync_payment_state(sender, instance, raw=False, **kwargs):
+    """
+    Keep Order.payment_state in step with the order's payments
+    """
+    if not raw:
+        refresh_payment_states([instance.order_id])
+
+
+@receiver(post_save, sender='delivery.DeliveryStatus')
+def track_delivery_status(sender, instance, created=False, raw=False, **kwargs):
+    """
+    A tracking update counts as a status change for Order.status_changed_at
+    """
+    if raw or not created:
+        return
+    Order.objects.filter(
+        delivery_assignment__pk=instance.delivery_assignment_id
+    ).filter(
+        Q(status_changed_at__isnull=True) | Q(status_changed_at__lt=instance.timestamp)
+    ).update(status_changed_at=instance.timestamp)
+
+
+@receiver(post_save, sender=OrderStatusHistory)
+@receiver(post_delete, sender=OrderStatusHistory)
+def expire_order_timeline(sender, instance, raw=False, **kwargs):
+    """
+    Drop the cached timeline of an order whose history was written or deleted
+    """
+    if not raw:
+        timeline_changed([instance.order_id])
+
+
+@receiver(post_save, sender='delivery.DeliveryStatus')
+@receiver(post_delete, sender='delivery.DeliveryStatus')
+def expire_delivery_timeline(sender, instance, raw=False, **kwargs):
+    """
+    Drop the cached timeline of the order a tracking update belongs to
+    """
+    if not raw:
+        # Read through the id: on a cascade the assignment may be gone already
+        timeline_changed(
+            DeliveryAssignment.objects.filter(pk=instance.delivery_assignment_id).values_list('order_id', flat=True)
+        )
+
+
+@receiver(post_save, sender='payments.PaymentTransaction')
+@receiver(post_save, sender='payments.Refund')
+@receiver(post_delete, sender='payments.PaymentTransaction')
+@receiver(post_delete, sender='payments.Refund')
+def expire_payment_timeline(sender, instance, raw=False, **kwargs):
+    """
+    Drop the cached timeline of the order a payment log or refund belongs to
+    """
+    if not raw:
+        timeline_changed(Payment.objects.filter(pk=instance.payment_id).values_list('order_id', flat=True))
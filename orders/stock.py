@@ -0,0 +1,182 @@
+import random
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import catalog_changed
+from .models import ProductService, StockShard
+
+
+def _split(quantity, shards):
+    """
+    Spread a quantity as evenly as possible over a number of shards
+    """
+    base, extra = divmod(quantity, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def shard_totals(product_ids):
+    """
+    Return {product_id: stock} summed over the shards of each product
+    """
+    if not product_ids:
+        return {}
+    totals = dict.fromkeys(product_ids, 0)
+    totals.update(
+        StockShard.objects.filter(product_id__in=list(product_ids))
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    return totals
+
+
+def live_stock():
+    """
+    Expression for a product row's stock: the sum of its shards when sharded, else stock_quantity
+    """
+    shard_sum = StockShard.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return Case(
+        When(stock_shards__gt=0, then=Coalesce(Subquery(shard_sum), Value(0))),
+        default=F('stock_quantity'),
+    )
+
+
+def enable_sharding(product, shards):
+    """
+    Move a product's stock onto ``shards`` counter rows
+    """
+    with transaction.atomic():
+        product = ProductService.objects.select_for_update().get(pk=product.pk)
+        if product.stock_shards:
+            quantity = shard_totals([product.pk])[product.pk]
+            StockShard.objects.filter(product=product).delete()
+        else:
+            quantity = product.stock_quantity
+        StockShard.objects.bulk_create([
+            StockShard(product=product, shard=shard, quantity=share)
+            for shard, share in enumerate(_split(quantity, shards))
+        ])
+        ProductService.objects.filter(pk=product.pk).update(
+            stock_shards=shards, stock_quantity=quantity
+        )
+        # Cart snapshots record the shard count
+        catalog_changed()
+    return quantity
+
+
+def disable_sharding(product):
+    """
+    Fold a product's shards back into ``ProductService.stock_quantity``
+    """
+    with transaction.atomic():
+        quantity = shard_totals([product.pk])[product.pk]
+        StockShard.objects.filter(product=product).delete()
+        ProductService.objects.filter(pk=product.pk).update(
+            stock_shards=0, stock_quantity=quantity
+        )
+        catalog_changed()
+    return quantity
+
+
+def set_stock(product, quantity):
+    """
+    Overwrite the stock of a sharded product, e.g. after an admin edit
+    """
+    with transaction.atomic():
+        shards = list(
+            StockShard.objects.select_for_update().filter(product=product).order_by('shard')
+        )
+        for shard, share in zip(shards, _split(quantity, len(shards))):
+            shard.quantity = share
+        StockShard.objects.bulk_update(shards, ['quantity'])
+        ProductService.objects.filter(pk=product.pk).update(stock_quantity=quantity)
+
+
+def rebalance(product):
+    """
+    Even out a product's shards and refresh its stock snapshot.
+
+    Returns the total stock. Run periodically so that no shard runs dry while
+    others still have stock, which would push orders onto the slow path.
+    """
+    with transaction.atomic():
+        shards = list(
+            StockShard.objects.select_for_update().filter(product=product).order_by('shard')
+        )
+        total = sum(shard.quantity for shard in shards)
+        changed = []
+        for shard, share in zip(shards, _split(total, len(shards))):
+            if shard.quantity != share:
+                shard.quantity = share
+                changed.append(shard)
+        if changed:
+            StockShard.objects.bulk_update(changed, ['quantity'])
+        ProductService.objects.filter(pk=product.pk).update(
+            stock_quantity=total, updated_at=timezone.now()
+        )
+    return total
+
+
+def take(product, quantity, held=0):
+    """
+    Remove stock from a sharded product without touching its product row.
+
+    Units held by other customers' cart reservations are not for sale: a
+    shard is only decremented while the shards together, less the product's
+    ``reserved_quantity`` and plus the ``held`` units that are the buyer's
+    own, still cover ``quantity``. A random shard is tried first so
+    concurrent orders spread over different rows. If no single shard can
+    cover the quantity the shards are drained together under lock. Returns
+    False when the available stock is too low.
+    """
+    reserved = ProductService.objects.filter(pk=product.pk).values('reserved_quantity')
+    total = StockShard.objects.filter(product=product.pk).order_by().values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    shards = product.stock_shards
+    start = random.randrange(shards)
+    for offset in range(shards):
+        updated = StockShard.objects.alias(
+            available=Subquery(total) - Subquery(reserved) + held
+        ).filter(
+            product=product,
+            shard=(start + offset) % shards,
+            quantity__gte=quantity,
+            available__gte=quantity,
+        ).update(quantity=F('quantity') - quantity)
+        if updated:
+            return True
+
+    with transaction.atomic():
+        rows = list(
+            StockShard.objects.select_for_update()
+            .filter(product=product, quantity__gt=0)
+            .order_by('-quantity')
+        )
+        reserved = ProductService.objects.values_list('reserved_quantity', flat=True).get(pk=product.pk)
+        if sum(row.quantity for row in rows) - reserved + held < quantity:
+            return False
+        remaining = quantity
+        for row in rows:
+            used = min(row.quantity, remaining)
+            row.quantity -= used
+            remaining -= used
+            if not remaining:
+                break
+        StockShard.objects.bulk_update(rows, ['quantity'])
+    return True
+
+
+def give_back(product, quantity):
+    """
+    Return stock to a random shard of a sharded product
+    """
+    StockShard.objects.filter(
+        product=product,
+        shard=random.randrange(product.stock_shards),
+    ).update(quantity=F('quantity') + quantity)
@@ -0,0 +1,122 @@
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import (
+    Case, CharField, Count, DateTimeField, Exists, F, IntegerField, OuterRef, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, Concat, Greatest, NullIf, Trim
+
+# Order.payment_state from the statuses of an order's payments, first match wins
+PAYMENT_STATES = (
+    ('paid', ('completed',)),
+    ('refunded', ('refunded',)),
+    ('pending', ('pending', 'processing')),
+    ('failed', ('failed', 'cancelled')),
+)
+
+
+def customer_display_name(user):
+    """
+    The name lists show for a customer, as stored in Order.customer_name
+    """
+    return user.get_full_name() or user.username
+
+
+def item_count_expression(apps=global_apps):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    lines = (
+        OrderItem.objects.filter(order=OuterRef('pk')).order_by()
+        .values('order').annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(lines, output_field=IntegerField()), 0)
+
+
+def customer_name_expression(apps=global_apps):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    names = User.objects.filter(pk=OuterRef('customer_id')).annotate(
+        display=Coalesce(
+            NullIf(Trim(Concat('first_name', Value(' '), 'last_name')), Value('')),
+            'username',
+            output_field=CharField()
+        )
+    ).values('display')[:1]
+    return Subquery(names, output_field=CharField())
+
+
+def status_changed_expression(apps=global_apps):
+    OrderStatusHistory = apps.get_model('orders', 'OrderStatusHistory')
+    DeliveryStatus = apps.get_model('delivery', 'DeliveryStatus')
+    history = (
+        OrderStatusHistory.objects.filter(order=OuterRef('pk'))
+        .order_by('-created_at').values('created_at')[:1]
+    )
+    tracking = (
+        DeliveryStatus.objects.filter(delivery_assignment__order=OuterRef('pk'))
+        .order_by('-timestamp').values('timestamp')[:1]
+    )
+    return Greatest(
+        Coalesce(Subquery(history, output_field=DateTimeField()), F('created_at')),
+        Coalesce(Subquery(tracking, output_field=DateTimeField()), F('created_at')),
+    )
+
+
+def payment_state_expression(apps=global_apps):
+    Payment = apps.get_model('payments', 'Payment')
+    return Case(
+        *[
+            When(Exists(Payment.objects.filter(order=OuterRef('pk'), status__in=statuses)), then=Value(state))
+            for state, statuses in PAYMENT_STATES
+        ],
+        default=Value('unpaid'),
+        output_field=CharField()
+    )
+
+
+def refresh_item_counts(order_ids):
+    """
+    Recount the lines of the given orders in one UPDATE
+    """
+    Order = global_apps.get_model('orders', 'Order')
+    Order.objects.filter(pk__in=list(order_ids)).update(item_count=item_count_expression())
+
+
+def refresh_payment_states(order_ids):
+    """
+    Re-derive the payment state of the given orders in one UPDATE
+    """
+    Order = global_apps.get_model('orders', 'Order')
+    Order.objects.filter(pk__in=list(order_ids)).update(payment_state=payment_state_expression())
+
+
+def rename_customer(user):
+    """
+    Copy a customer's changed display name onto their orders
+    """
+    Order = global_apps.get_model('orders', 'Order')
+    name = customer_display_name(user)
+    return Order.objects.filter(customer=user).exclude(customer_name=name).update(customer_name=name)
+
+
+def repair_summaries(apps=global_apps, batch_size=5000):
+    """
+    Recompute every order's summary columns from the source tables.
+
+    Orders are rewritten in primary-key ranges, one UPDATE per range with
+    all four columns computed by correlated subqueries, so the repair never
+    loads orders into Python. Returns the number of orders processed.
+    """
+    Order = apps.get_model('orders', 'Order')
+    values = {
+        'item_count': item_count_expression(apps),
+        'customer_name': customer_name_expression(apps),
+        'status_changed_at': status_changed_expression(apps),
+        'payment_state': payment_state_expression(apps),
+    }
+    processed = 0
+    last_pk = 0
+    while True:
+        ids = list(Order.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return processed
+        Order.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(**values)
+        processed += len(ids)
+        last_pk = ids[-1]
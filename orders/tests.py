@@ -1,3 +1,1391 @@
-from django.test import TestCase
+import io
+import json
+import re
+import unittest
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import catalog, product_feed, search
+from .archive import archive_orders, customer_orders_q
+from .cancellation import cancel_and_refund, cancel_orders
+from .cart import Cart, purge_expired_carts
+from .checkout import CheckoutError, place_order
+from .idempotency import claim, purge_expired
+from .models import ArchivedOrder, IdempotencyKey, ProductService, Order, OrderItem, OrderStatusHistory, StockReservation
+from .numbering import (
+    SEQUENCE_DIGITS, allocator, block_size, format_order_number, next_order_number, reserve_block,
+)
+from .reservations import expire_reservations, release_customer_holds, reserve_cart
+from .scheduler import ReleaseScheduler, assign_agents
+from .summary import repair_summaries
+from .timeline import build_timelines, order_timeline
+from .stock import enable_sharding, rebalance, shard_totals, take
+from .transitions import TransitionConflict, TransitionError, bulk_transition, transition
+from .pagination import KeysetPaginator, encode_cursor
+from .views import AdminOrderListView, OrderHistoryView, OrderListView
+from dashboard.stats import customer_stats, customers_stats
+from delivery.models import DeliveryAssignment, DeliveryStatus
+from payments.models import Payment, PaymentTransaction, Refund
+from reviews.models import Review
+from users.models import DeliveryAgentProfile
+
+User = get_user_model()
+
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanMixin:
+    """
+    Assertions that a view's queries are answered from an index
+    """
+    @contextmanager
+    def capture_sql(self):
+        statements = []
+
+        def wrapper(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            yield statements
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def list_view_sql(self, view_class, user, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user
+        view = view_class()
+        view.setup(request, **kwargs)
+        view.object_list = view.get_queryset()
+        with self.capture_sql() as statements:
+            list(view.get_context_data()['object_list'])
+        return statements
+
+    def assertIndexed(self, statements, tables, index=None, allow_sort=False):
+        """
+        Fail if any statement reading ``tables`` scans them without an index
+        """
+        checked, used = False, False
+        for sql, params in statements:
+            if not sql.lstrip().upper().startswith('SELECT') or not any(f'"{t}"' in sql for t in tables):
+                continue
+            checked = True
+            plan = self.explain(sql, params)
+            for line in plan:
+                match = FULL_SCAN.match(line)
+                if match and match.group(1) in tables:
+                    self.fail(f'Full scan of {match.group(1)}:\n{sql}\n' + '\n'.join(plan))
+                if not allow_sort and 'USE TEMP B-TREE FOR ORDER BY' in line:
+                    self.fail(f'Sort without index:\n{sql}\n' + '\n'.join(plan))
+            used = used or any(index in line for line in plan if index)
+        self.assertTrue(checked, f'No query read {", ".join(tables)}')
+        if index:
+            self.assertTrue(used, f'{index} not used by any query')
+
+
+class CheckoutTests(TestCase):
+    """
+    Tests for the set-based checkout engine
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000001'
+        )
+        self.rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        self.gas = ProductService.objects.create(
+            name='Gas', description='Gas', category='gas',
+            price=Decimal('1200.00'), stock_quantity=1
+        )
+
+    def test_place_order_creates_items_and_reduces_stock(self):
+        order = place_order(self.customer, [
+            {'id': self.rice.pk, 'quantity': 2},
+            {'id': self.gas.pk, 'quantity': 1},
+            {'id': self.rice.pk, 'quantity': 1},
+        ])
+
+        self.assertEqual(order.total_amount, Decimal('1440.00'))
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(OrderItem.objects.get(order=order, product=self.rice).quantity, 3)
+        self.assertTrue(OrderStatusHistory.objects.filter(order=order, status='pending').exists())
+        self.rice.refresh_from_db()
+        self.gas.refresh_from_db()
+        self.assertEqual(self.rice.stock_quantity, 7)
+        self.assertEqual(self.gas.stock_quantity, 0)
+
+    def test_out_of_stock_rolls_back(self):
+        with self.assertRaises(CheckoutError) as ctx:
+            place_order(self.customer, [
+                {'id': self.rice.pk, 'quantity': 1},
+                {'id': self.gas.pk, 'quantity': 2},
+            ])
+
+        self.assertEqual(ctx.exception.out_of_stock_items[0]['name'], 'Gas')
+        self.assertFalse(Order.objects.exists())
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.stock_quantity, 10)
+
+    def test_query_count_is_flat(self):
+        products = ProductService.objects.bulk_create([
+            ProductService(name=f'P{i}', description='', category='other',
+                           price=Decimal('1.00'), stock_quantity=5)
+            for i in range(30)
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            next_order_number()  # reserve and commit a block of order numbers up front
+        with self.assertNumQueries(8):
+            place_order(self.customer, [{'id': products[0].pk, 'quantity': 1}])
+        with self.assertNumQueries(8):
+            place_order(self.customer, [{'id': p.pk, 'quantity': 1} for p in products])
+
+    def test_create_order_endpoint(self):
+        self.client.force_login(self.customer)
+        response = self.client.post(
+            reverse('orders:create_order_from_cart'),
+            data=json.dumps({'cart_items': [{'id': self.gas.pk, 'quantity': 5}]}),
+            content_type='application/json'
+        )
+        data = response.json()
+        self.assertFalse(data['success'])
+        self.assertEqual(data['out_of_stock_items'][0]['available'], 1)
+
+
+class ServerCartTests(TestCase):
+    """
+    The server-side cart and its snapshot checkout
+    """
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000091'
+        )
+        self.rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        self.gas = ProductService.objects.create(
+            name='Gas', description='Gas', category='gas',
+            price=Decimal('1200.00'), stock_quantity=1
+        )
+
+    def post(self, name, data):
+        return self.client.post(reverse(f'orders:{name}'), data=json.dumps(data),
+                                content_type='application/json').json()
+
+    def test_anonymous_cart_merges_on_login(self):
+        Cart.for_user(self.customer.pk).add(self.rice.pk, 1)
+        self.post('cart_add', {'product_id': self.rice.pk, 'quantity': 2})
+        data = self.post('cart_add', {'product_id': self.gas.pk})
+        self.assertEqual(data['cart']['total_amount'], '1360.00')
+        data = self.post('cart_remove', {'product_id': self.rice.pk, 'quantity': 1})
+        self.assertEqual(data['quantity'], 1)
+
+        self.client.login(username='customer', password='pass')
+        cart = self.client.get(reverse('orders:cart_api')).json()['cart']
+        self.assertEqual(
+            {item['id']: item['quantity'] for item in cart['items']},
+            {self.rice.pk: 2, self.gas.pk: 1}
+        )
+
+    def test_saved_cart_outlives_the_cache_but_not_its_timeout(self):
+        Cart.for_user(self.customer.pk).add(self.rice.pk, 2)
+        cache.clear()
+        self.assertEqual(Cart.for_user(self.customer.pk).items(), [{'id': self.rice.pk, 'quantity': 2}])
+
+        later = timezone.now() + timedelta(days=31)
+        self.assertEqual(purge_expired_carts(now=later - timedelta(days=2)), 0)
+        self.assertEqual(purge_expired_carts(now=later), 1)
+        self.assertEqual(Cart.for_user(self.customer.pk).lines, {})
+
+    def test_checkout_skips_stock_check_while_catalog_is_unchanged(self):
+        cart = Cart.for_user(self.customer.pk)
+        cart.add(self.rice.pk, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            next_order_number()
+        snapshot = cart.fresh_snapshot()
+        with self.assertNumQueries(8):
+            order = place_order(self.customer, cart.items(), snapshot=snapshot)
+        self.assertEqual(order.total_amount, Decimal('160.00'))
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.stock_quantity, 8)
+
+        catalog.bump_catalog_version()
+        self.assertIsNone(cart.fresh_snapshot())
+
+    def test_snapshot_is_checked_against_the_products(self):
+        cart = Cart.for_user(self.customer.pk)
+        cart.add(self.rice.pk, 2)
+        cart.add(self.gas.pk, 1)
+        snapshot = cart.fresh_snapshot()
+        # Changed without a catalog version bump
+        ProductService.objects.filter(pk=self.gas.pk).update(is_available=False)
+        with self.assertRaises(CheckoutError) as ctx:
+            place_order(self.customer, cart.items(), snapshot=snapshot)
+        self.assertEqual(ctx.exception.out_of_stock_items[0]['name'], 'Gas')
+
+        cart.remove(self.gas.pk)
+        ProductService.objects.filter(pk=self.rice.pk).update(price=Decimal('90.00'))
+        order = place_order(self.customer, cart.items(), snapshot=cart.fresh_snapshot())
+        self.assertEqual(order.total_amount, Decimal('180.00'))
+
+    def test_snapshot_checkout_still_refuses_missing_stock(self):
+        cart = Cart.for_user(self.customer.pk)
+        cart.add(self.gas.pk, 2)
+        with self.assertRaises(CheckoutError) as ctx:
+            place_order(self.customer, cart.items(), snapshot=cart.fresh_snapshot())
+        self.assertEqual(ctx.exception.out_of_stock_items[0]['available'], 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_order_endpoint_orders_server_cart(self):
+        self.client.force_login(self.customer)
+        self.post('cart_add', {'product_id': self.rice.pk, 'quantity': 3})
+        data = self.post('create_order_from_cart', {'delivery_address': 'Mirpur'})
+        self.assertTrue(data['success'])
+        self.assertEqual(data['total_amount'], '240.00')
+        self.assertEqual(Cart.for_user(self.customer.pk).lines, {})
+
+
+class StockReservationTests(TestCase):
+    """
+    Tests for cart stock holds
+    """
+    def setUp(self):
+        self.alice = User.objects.create_user(
+            username='alice', password='pass', phone_number='01700000011'
+        )
+        self.bob = User.objects.create_user(
+            username='bob', password='pass', phone_number='01700000012'
+        )
+        self.gas = ProductService.objects.create(
+            name='Gas', description='Gas', category='gas',
+            price=Decimal('1200.00'), stock_quantity=3
+        )
+
+    def test_hold_blocks_other_customers(self):
+        reserve_cart(self.alice, [{'id': self.gas.pk, 'quantity': 2}])
+        self.gas.refresh_from_db()
+        self.assertEqual(self.gas.available_quantity, 1)
+
+        with self.assertRaises(CheckoutError):
+            reserve_cart(self.bob, [{'id': self.gas.pk, 'quantity': 2}])
+        with self.assertRaises(CheckoutError):
+            place_order(self.bob, [{'id': self.gas.pk, 'quantity': 2}])
+
+    def test_checkout_converts_hold(self):
+        reserve_cart(self.alice, [{'id': self.gas.pk, 'quantity': 3}])
+        place_order(self.alice, [{'id': self.gas.pk, 'quantity': 3}])
+
+        self.gas.refresh_from_db()
+        self.assertEqual(self.gas.stock_quantity, 0)
+        self.assertEqual(self.gas.reserved_quantity, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_rereserving_replaces_hold(self):
+        reserve_cart(self.alice, [{'id': self.gas.pk, 'quantity': 3}])
+        reserve_cart(self.alice, [{'id': self.gas.pk, 'quantity': 1}])
+        self.gas.refresh_from_db()
+        self.assertEqual(self.gas.reserved_quantity, 1)
+
+    def test_product_edits_keep_holds_placed_meanwhile(self):
+        admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000013', is_staff=True
+        )
+        self.client.force_login(admin)
+        holds = []
+
+        def concurrent_hold(execute, sql, params, many, context):
+            if sql.startswith('UPDATE "orders_productservice"') and not holds:
+                holds.append(sql)
+                reserve_cart(self.bob, [{'id': self.gas.pk, 'quantity': 2}])
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_hold):
+            self.client.post(reverse('orders:update_product_api', args=[self.gas.pk]),
+                             json.dumps({'price': '1300.00'}), content_type='application/json')
+        self.gas.refresh_from_db()
+        self.assertEqual(self.gas.price, Decimal('1300.00'))
+        self.assertEqual(self.gas.reserved_quantity, 2)
+
+        self.assertEqual(release_customer_holds(self.bob), {self.gas.pk: 2})
+        self.assertEqual(release_customer_holds(self.bob), {})
+        self.gas.refresh_from_db()
+        self.assertEqual(self.gas.reserved_quantity, 0)
+
+    def test_sweeper_releases_expired_holds(self):
+        reserve_cart(self.alice, [{'id': self.gas.pk, 'quantity': 2}])
+        reserve_cart(self.bob, [{'id': self.gas.pk, 'quantity': 1}])
+
+        expired = expire_reservations(now=timezone.now() + timedelta(hours=1), batch_size=1)
+
+        self.assertEqual(expired, 2)
+        self.gas.refresh_from_db()
+        self.assertEqual(self.gas.reserved_quantity, 0)
+
+
+class StockShardTests(TestCase):
+    """
+    Tests for sharded stock counters
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000021'
+        )
+        self.medicine = ProductService.objects.create(
+            name='Napa', description='Napa', category='medicine',
+            price=Decimal('2.00'), stock_quantity=10
+        )
+        enable_sharding(self.medicine, 4)
+
+    def test_checkout_draws_from_shards(self):
+        place_order(self.customer, [{'id': self.medicine.pk, 'quantity': 4}])
+        place_order(self.customer, [{'id': self.medicine.pk, 'quantity': 5}])
+
+        self.assertEqual(shard_totals([self.medicine.pk])[self.medicine.pk], 1)
+        with self.assertRaises(CheckoutError):
+            place_order(self.customer, [{'id': self.medicine.pk, 'quantity': 2}])
+
+    def test_edits_without_stock_keep_the_shards(self):
+        self.medicine.refresh_from_db()
+        take(self.medicine, 6)
+        admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000023', is_staff=True
+        )
+        self.client.force_login(admin)
+        url = reverse('orders:update_product_api', args=[self.medicine.pk])
+        self.client.post(url, json.dumps({'name': 'Napa Extra'}), content_type='application/json')
+        self.assertEqual(shard_totals([self.medicine.pk])[self.medicine.pk], 4)
+
+        self.client.post(url, json.dumps({'stock_quantity': 20}), content_type='application/json')
+        self.assertEqual(shard_totals([self.medicine.pk])[self.medicine.pk], 20)
+
+    def test_holds_are_checked_against_the_shards(self):
+        # The snapshot says 10, the shards only 1
+        place_order(self.customer, [{'id': self.medicine.pk, 'quantity': 9}])
+        other = User.objects.create_user(username='other', password='pass', phone_number='01700000022')
+        with self.assertRaises(CheckoutError):
+            reserve_cart(other, [{'id': self.medicine.pk, 'quantity': 2}])
+        reserve_cart(other, [{'id': self.medicine.pk, 'quantity': 1}])
+
+        # The held unit is not for sale to anyone else, but converts for its holder
+        with self.assertRaises(CheckoutError):
+            place_order(self.customer, [{'id': self.medicine.pk, 'quantity': 1}])
+        place_order(other, [{'id': self.medicine.pk, 'quantity': 1}])
+        self.medicine.refresh_from_db()
+        self.assertEqual((shard_totals([self.medicine.pk])[self.medicine.pk], self.medicine.reserved_quantity), (0, 0))
+
+    def test_rebalance_refreshes_snapshot(self):
+        place_order(self.customer, [{'id': self.medicine.pk, 'quantity': 3}])
+        self.assertEqual(rebalance(self.medicine), 7)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.stock_quantity, 7)
+        self.assertEqual(
+            sorted(self.medicine.stock_shard_rows.values_list('quantity', flat=True)), [1, 2, 2, 2]
+        )
+
+
+class CatalogCacheTests(TestCase):
+    """
+    Tests for the versioned product catalog cache
+    """
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000041',
+            user_type='admin', is_staff=True
+        )
+        self.products = [
+            ProductService.objects.create(
+                name=f'Item {i}', description='x', category='groceries' if i % 2 else 'food',
+                price=Decimal('10.00'), stock_quantity=5
+            )
+            for i in range(5)
+        ]
+
+    def test_warm_pages_only_read_stock(self):
+        url = reverse('orders:product_list')
+        self.client.get(url)
+        customer = User.objects.create_user(username='customer', password='pass', phone_number='01700000042')
+        place_order(customer, [{'id': self.products[4].pk, 'quantity': 5}])
+        # The catalog version and the live stock
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['products']), 5)
+        self.assertEqual(list(response.context['categories']), ['food', 'groceries'])
+        # Newest first, and sold out although the cached page still said 5
+        self.assertEqual(response.context['products'][0].stock_quantity, 0)
+
+    def test_pages_match_database_order(self):
+        expected = list(
+            ProductService.objects.filter(is_available=True).order_by('-created_at', '-id')
+        )
+        products = catalog.CachedProductList(per_page=2)
+        self.assertEqual(products.count(), 5)
+        self.assertEqual(products[1:4], expected[1:4])
+        self.assertEqual(products[4], expected[4])
+
+    def test_bumps_from_other_processes_are_seen(self):
+        product = self.products[0]
+        self.assertEqual(catalog.get_product(product.pk).name, 'Item 0')
+
+        # A management command runs with a cache of its own
+        ProductService.objects.filter(pk=product.pk).update(name='Renamed')
+        with mock.patch.object(catalog, 'cache', LocMemCache('other-process', {})):
+            catalog.bump_catalog_version()
+        self.assertEqual(catalog.get_product(product.pk).name, 'Renamed')
+
+    def test_write_endpoints_bump_version(self):
+        product = self.products[0]
+        self.assertEqual(catalog.get_product(product.pk).name, 'Item 0')
+
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('orders:update_product_api', args=[product.pk]),
+                json.dumps({'name': 'Renamed'}), content_type='application/json'
+            )
+        self.assertEqual(catalog.get_product(product.pk).name, 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('orders:delete_product_api', args=[product.pk]))
+        self.assertIsNone(catalog.get_product(product.pk))
+        self.assertEqual(catalog.CachedProductList().count(), 4)
+
+
+@unittest.skipUnless(search.enabled(), 'Full-text search needs SQLite')
+class ProductSearchTests(TestCase):
+    """
+    Tests for the FTS5 product search index
+    """
+    def setUp(self):
+        self.napa = ProductService.objects.create(
+            name='নাপা এক্সট্রা ৫০০ মিগ্রা', description='Paracetamol tablet',
+            category='medicine', price=Decimal('3.00'), stock_quantity=10
+        )
+        self.rice = ProductService.objects.create(
+            name='মিনিকেট চাল5kg', description='Premium rice',
+            category='groceries', price=Decimal('400.00'), stock_quantity=10
+        )
+        self.oil = ProductService.objects.create(
+            name='Soybean oil', description='চাল ভাজার জন্য তেল',
+            category='groceries', price=Decimal('180.00'), stock_quantity=10
+        )
+
+    def test_bengali_and_mixed_text(self):
+        self.assertEqual(search.search_products('এক্সট্রা'), [self.napa])
+        self.assertEqual(search.search_products('napa 500'), [])
+        self.assertEqual(search.search_products('নাপা 500'), [self.napa])
+        self.assertEqual(search.search_products('5kg'), [self.rice])
+
+    def test_name_hits_rank_first_and_category_filter(self):
+        self.assertEqual(search.search_products('চাল'), [self.rice, self.oil])
+        self.assertEqual(search.search_products('চাল', category='medicine'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.oil.name = 'সয়াবিন তেল'
+        self.oil.save()
+        self.assertEqual(search.search_products('সয়াবিন'), [self.oil])
+        self.oil.delete()
+        self.assertEqual(search.search_products('সয়াবিন'), [])
+
+    def test_autocomplete_endpoint(self):
+        response = self.client.get(
+            reverse('orders:product_search_api'), {'q': 'মিনি', 'autocomplete': 1}
+        )
+        self.assertEqual(response.json()['suggestions'], [{'id': self.rice.pk, 'name': self.rice.name}])
+        response = self.client.get(reverse('orders:product_search'), {'q': 'oil'})
+        self.assertEqual(list(response.context['products']), [self.oil])
+
+
+class ProductFeedTests(TestCase):
+    """
+    Tests for bulk product import and streaming export
+    """
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000051',
+            user_type='admin', is_staff=True
+        )
+        self.client.force_login(self.admin)
+
+    def upload(self, name, content):
+        return self.client.post(
+            reverse('orders:import_products_api'),
+            {'file': SimpleUploadedFile(name, content.encode())}
+        ).json()
+
+    def test_csv_import_reports_bad_rows(self):
+        report = self.upload('feed.csv', (
+            'sku,name,category,price,stock_quantity\n'
+            'R-1,মিনিকেট চাল,groceries,80,10\n'
+            'R-2,Soybean oil,groceries,abc,5\n'
+            'R-3,Napa,pharmacy,2,5\n'
+            ',No sku,food,1,1\n'
+        ))
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (1, 0, 3))
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4, 5])
+        self.assertEqual(ProductService.objects.get(sku='R-1').price, Decimal('80.00'))
+
+    def test_jsonl_upserts_in_one_batch(self):
+        ProductService.objects.create(
+            sku='R-1', name='Rice', description='', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        rows = [json.dumps({'sku': 'R-1', 'price': '85.50', 'is_available': 'no'})]
+        rows += [json.dumps({'sku': f'N-{i}', 'name': f'New {i}', 'category': 'food', 'price': 5}) for i in range(20)]
+        feed = product_feed.iter_rows(io.BytesIO('\n'.join(rows).encode()), 'jsonl')
+        with self.assertNumQueries(7):
+            report = product_feed.import_products(feed)
+
+        self.assertEqual((report.created, report.updated), (20, 1))
+        rice = ProductService.objects.get(sku='R-1')
+        self.assertEqual((rice.price, rice.is_available, rice.stock_quantity), (Decimal('85.50'), False, 10))
+
+    def test_export_streams_catalog(self):
+        ProductService.objects.create(
+            sku='R-1', name='চাল, মিনিকেট', description='', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        response = self.client.get(reverse('orders:export_products_api'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(product_feed.FIELDS))
+        self.assertEqual(lines[1], 'R-1,"চাল, মিনিকেট",,groceries,80.00,10,True')
+
+
+class BulkTransitionTests(TestCase):
+    """
+    Tests for batch order status changes
+    """
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000061',
+            user_type='admin', is_staff=True
+        )
+        customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000062'
+        )
+        self.orders = Order.objects.bulk_create([
+            Order(order_number=f'BT{i:04d}', customer=customer, delivery_address='x',
+                  delivery_city='ঢাকা', total_amount=Decimal('1.00'), status=status)
+            for i, status in enumerate(['confirmed'] * 20 + ['processing', 'pending', 'delivered'])
+        ])
+
+    def test_moves_only_allowed_orders(self):
+        ids = [order.pk for order in self.orders] + [999999]
+        with self.assertNumQueries(5):
+            results = bulk_transition(ids, 'dispatched', user=self.admin)
+
+        self.assertEqual(sum(result['success'] for result in results), 21)
+        self.assertEqual(
+            [result.get('message') for result in results[-3:]],
+            ['Cannot move from pending to dispatched', 'Cannot move from delivered to dispatched', 'Order not found']
+        )
+        self.assertEqual(Order.objects.filter(status='dispatched').count(), 21)
+        self.assertEqual(OrderStatusHistory.objects.filter(status='dispatched', created_by=self.admin).count(), 21)
+
+    def test_orders_moved_by_someone_else_are_not_claimed(self):
+        raced = self.orders[0]
+        writes = []
+
+        def concurrent_writer(execute, sql, params, many, context):
+            if sql.startswith('UPDATE "orders_order"') and not writes:
+                writes.append(sql)
+                Order.objects.filter(pk=raced.pk).update(
+                    status='dispatched', status_changed_at=timezone.now() - timedelta(minutes=1)
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_writer):
+            results = bulk_transition([raced.pk, self.orders[1].pk], 'dispatched', user=self.admin)
+
+        self.assertEqual(results[0]['message'], 'Order was changed by someone else')
+        self.assertTrue(results[1]['success'])
+        self.assertFalse(OrderStatusHistory.objects.filter(order=raced).exists())
+
+    def test_admin_action_takes_selections_over_the_bulk_limit(self):
+        self.client.force_login(User.objects.create_superuser(
+            username='root', password='pass', phone_number='01700000063'
+        ))
+        with mock.patch('orders.admin.MAX_BULK_ORDERS', 7):
+            response = self.client.post(reverse('admin:orders_order_changelist'), {
+                'action': 'mark_dispatched', '_selected_action': [order.pk for order in self.orders],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(status='dispatched').count(), 21)
+
+    def test_endpoint_rejects_bulk_cancel(self):
+        self.client.force_login(self.admin)
+        url = reverse('orders:bulk_update_order_status')
+        response = self.client.post(url, json.dumps({
+            'order_ids': [self.orders[0].pk], 'status': 'cancelled'
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, json.dumps({
+            'order_ids': [self.orders[0].pk, self.orders[21].pk], 'status': 'processing'
+        }), content_type='application/json')
+        self.assertEqual(response.json()['updated'], 1)
+
+
+class StatusTransitionTests(TestCase):
+    """
+    Tests for compare-and-set status changes
+    """
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000071',
+            user_type='admin', is_staff=True
+        )
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000072'
+        )
+        self.order = Order.objects.create(
+            customer=self.customer, delivery_address='x', total_amount=Decimal('1.00'), status='confirmed'
+        )
+
+    def test_stale_writer_gets_conflict(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        transition(self.order, 'dispatched', user=self.admin)
+        with self.assertRaises(TransitionConflict) as ctx:
+            transition(stale, 'processing')
+        self.assertEqual(ctx.exception.current, 'dispatched')
+        with self.assertRaises(TransitionError):
+            transition(self.order, 'pending')
+        self.assertEqual(list(self.order.status_history.values_list('status', flat=True)), ['dispatched'])
+
+    def test_admin_endpoint_validates_graph(self):
+        self.client.force_login(self.admin)
+        url = reverse('orders:admin_update_order_status')
+        response = self.client.post(url, json.dumps({'order_id': self.order.pk, 'status': 'delivered'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, json.dumps({'order_id': self.order.pk, 'status': 'processing'}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['order']['status'], 'processing')
+
+    def test_status_controls_cancel_with_stock_and_refunds(self):
+        rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        paid = place_order(self.customer, [{'id': rice.pk, 'quantity': 2}])
+        Payment.objects.create(order=paid, payment_method='bkash', amount=160, status='completed')
+        unpaid = place_order(self.customer, [{'id': rice.pk, 'quantity': 3}])
+        with self.assertRaises(TransitionError):
+            transition(paid, 'cancelled')
+
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('orders:admin_update_order_status'), json.dumps(
+            {'order_id': paid.pk, 'status': 'cancelled'}
+        ), content_type='application/json')
+        self.assertEqual(response.json()['order']['status'], 'cancelled')
+        self.client.post(reverse('orders:order_status_update'), {'order_id': unpaid.pk, 'status': 'cancelled'})
+
+        rice.refresh_from_db()
+        self.assertEqual(rice.stock_quantity, 10)
+        self.assertEqual(Order.objects.get(pk=unpaid.pk).status, 'cancelled')
+        self.assertEqual(list(Refund.objects.values_list('payment__order', flat=True)), [paid.pk])
+
+        response = self.client.post(reverse('orders:admin_update_order_status'), json.dumps(
+            {'order_id': paid.pk, 'status': 'cancelled'}
+        ), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cancel_view_writes_cancellation_fields(self):
+        self.client.force_login(self.customer)
+        self.client.post(reverse('orders:order_cancel', args=[self.order.pk]), {
+            'reason': 'changed_mind', 'refund_preference': 'no_refund_needed', 'confirm_cancellation': True
+        })
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
+        self.assertEqual(self.order.cancelled_by, self.customer)
+
+
+class IdempotencyTests(TestCase):
+    """
+    Retried checkout requests must not place a second order
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000061'
+        )
+        self.rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        self.client.force_login(self.customer)
+
+    def post_order(self, key, quantity=2):
+        return self.client.post(
+            reverse('orders:create_order_from_cart'),
+            data=json.dumps({'cart_items': [{'id': self.rice.pk, 'quantity': quantity}]}),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_first_response(self):
+        first = self.post_order('checkout-1')
+        # session, user and one indexed key lookup; the checkout itself is skipped
+        with self.assertNumQueries(3):
+            retry = self.post_order('checkout-1')
+
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.stock_quantity, 8)
+
+    def test_new_key_places_new_order(self):
+        self.post_order('checkout-1')
+        self.post_order('checkout-2')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_different_cart(self):
+        self.post_order('checkout-1')
+        response = self.post_order('checkout-1', quantity=3)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_in_flight_gets_conflict(self):
+        record, claimed = claim('create_order', f'{self.customer.pk}:checkout-1')
+        self.assertTrue(claimed)
+        self.assertFalse(claim('create_order', f'{self.customer.pk}:checkout-1')[1])
+
+        with self.settings(IDEMPOTENCY_WAIT_TIMEOUT=0):
+            response = self.post_order('checkout-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        record, _ = claim('create_order', f'{self.customer.pk}:checkout-1')
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.post_order('checkout-1')
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_purge_expired(self):
+        self.post_order('checkout-1')
+        self.assertEqual(purge_expired(), 0)
+        self.assertEqual(purge_expired(timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class OrderNumberTests(TestCase):
+    """
+    Order numbers come from per-process blocks and sort by time
+    """
+    def setUp(self):
+        # A block confirmed by another test's on_commit callbacks outlives its rollback
+        allocator.block = None
+
+    def test_blocks_do_not_overlap(self):
+        today = timezone.localdate()
+        self.assertEqual(reserve_block(today, 50), (1, 50))
+        self.assertEqual(reserve_block(today, 50), (51, 100))
+        self.assertEqual(reserve_block(today - timedelta(days=1), 50), (1, 50))
+
+    def test_one_reservation_per_block(self):
+        with self.settings(ORDER_NUMBER_BLOCK_SIZE=10):
+            with self.captureOnCommitCallbacks(execute=True):
+                first = next_order_number()
+            with self.assertNumQueries(0):
+                numbers = [next_order_number() for _ in range(9)]
+            # one UPDATE and one SELECT of the day's counter
+            with self.assertNumQueries(2):
+                numbers.append(next_order_number())
+
+        numbers.insert(0, first)
+        self.assertEqual(numbers, sorted(set(numbers)))
+        self.assertEqual(numbers[-1], format_order_number(timezone.localdate(), 11))
+
+    def test_block_is_not_reused_before_its_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = next_order_number()
+            # The reservation could still be rolled back with a savepoint
+            with self.assertNumQueries(2):
+                second = next_order_number()
+        self.assertEqual(second, format_order_number(timezone.localdate(), block_size() + 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(next_order_number(), format_order_number(timezone.localdate(), block_size() + 2))
+        self.assertLess(first, second)
+
+    def test_rolled_back_block_is_dropped(self):
+        try:
+            with transaction.atomic():
+                next_order_number()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(allocator.usable(timezone.localdate()))
+        self.assertEqual(next_order_number(), format_order_number(timezone.localdate(), 1))
+
+    def test_numbers_sort_by_day(self):
+        day = timezone.localdate()
+        self.assertLess(
+            format_order_number(day - timedelta(days=1), 10 ** SEQUENCE_DIGITS - 1), format_order_number(day, 1)
+        )
+        with self.assertRaises(OverflowError):
+            format_order_number(day, 10 ** SEQUENCE_DIGITS)
+
+
+class OrderArchiveTests(TestCase):
+    """
+    Finished orders move to the archive and can still be read
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000071'
+        )
+        self.rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        self.old = place_order(self.customer, [{'id': self.rice.pk, 'quantity': 2}])
+        self.recent = place_order(self.customer, [{'id': self.rice.pk, 'quantity': 1}])
+        Order.objects.update(status='delivered')
+        Order.objects.filter(pk=self.old.pk).update(
+            updated_at=timezone.now() - timedelta(days=400),
+            created_at=timezone.now() - timedelta(days=400)
+        )
+
+    def test_old_finished_orders_are_moved(self):
+        self.assertEqual(archive_orders(), 1)
+
+        self.assertFalse(Order.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=self.old.pk).exists())
+        archived = ArchivedOrder.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.order_number, self.old.order_number)
+        self.assertEqual(archived.items.get().product_name, 'Rice')
+        self.assertTrue(archived.status_history.exists())
+        self.assertTrue(Order.objects.filter(pk=self.recent.pk).exists())
+
+    def test_payments_deliveries_and_reviews_outlive_the_move(self):
+        agent = User.objects.create_user(
+            username='agent', password='pass', phone_number='01700000073', user_type='delivery_agent'
+        )
+        payment = Payment.objects.create(order=self.old, payment_method='cash_on_delivery', amount=160)
+        assignment = DeliveryAssignment.objects.create(order=self.old, delivery_agent=agent)
+        review = Review.objects.create(customer=self.customer, order=self.old, product=self.rice, rating=5)
+
+        status = DeliveryStatus.objects.create(delivery_assignment=assignment, status='delivered')
+        Payment.objects.filter(pk=payment.pk).update(status='completed')
+
+        self.assertEqual(archive_orders(), 1)
+        self.assertFalse(Order.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(Payment.objects.get(pk=payment.pk).order_id, self.old.pk)
+        self.assertEqual(DeliveryAssignment.objects.get(pk=assignment.pk).order_id, self.old.pk)
+        self.assertEqual(Review.objects.get(pk=review.pk).order_id, self.old.pk)
+
+        # Readers find the archived order behind them
+        number = self.old.order_number
+        self.assertIn(number, str(Payment.objects.get(pk=payment.pk)))
+        self.assertIn(number, str(DeliveryAssignment.objects.get(pk=assignment.pk)))
+        self.assertIn(number, str(DeliveryStatus.objects.get(pk=status.pk)))
+        cache.clear()
+        self.assertEqual(customer_stats(self.customer)['total_spent'], 160)
+        self.assertEqual(customers_stats([self.customer.pk])[self.customer.pk]['total_spent'], 160)
+        self.assertEqual(Payment.objects.filter(customer_orders_q(customer=self.customer)).get().pk, payment.pk)
+
+        self.client.force_login(User.objects.create_superuser(
+            username='root', password='pass', phone_number='01700000074'
+        ))
+        for name, pk in [('payments_payment', payment.pk), ('delivery_deliveryassignment', assignment.pk),
+                         ('reviews_review', review.pk)]:
+            response = self.client.get(reverse(f'admin:{name}_changelist'), {'q': number})
+            self.assertContains(response, number, msg_prefix=name)
+            self.assertEqual(response.context['cl'].result_count, 1, name)
+            response = self.client.get(reverse(f'admin:{name}_change', args=[pk]))
+            self.assertEqual(response.status_code, 200, name)
+        response = self.client.get(reverse('admin:delivery_deliverystatus_changelist'), {'q': number})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_detail_and_invoice_read_archive(self):
+        archive_orders()
+        self.client.force_login(self.customer)
+
+        response = self.client.get(reverse('orders:order_detail', args=[self.old.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['order'].is_archived)
+        response = self.client.get(reverse('orders:invoice', args=[self.old.order_number]))
+        self.assertEqual(response.context['order'].pk, self.old.pk)
+
+        other = User.objects.create_user(username='other', password='pass', phone_number='01700000072')
+        self.client.force_login(other)
+        response = self.client.get(reverse('orders:order_detail', args=[self.old.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_history_pages_through_live_and_archived(self):
+        archive_orders()
+        paginator = KeysetPaginator(
+            Order.objects.filter(customer=self.customer), 1,
+            merged=[ArchivedOrder.objects.filter(customer=self.customer)]
+        )
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual([first[0].pk, second[0].pk], [self.recent.pk, self.old.pk])
+        self.assertFalse(second.has_next())
+        self.assertEqual(paginator.count, 2)
+
+
+class OrderSummaryTests(TestCase):
+    """
+    The denormalized summary columns follow the rows they summarize
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000081',
+            first_name='Rahim', last_name='Uddin'
+        )
+        rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=10
+        )
+        dal = ProductService.objects.create(
+            name='Dal', description='Dal', category='groceries',
+            price=Decimal('120.00'), stock_quantity=10
+        )
+        self.order = place_order(self.customer, [{'id': rice.pk, 'quantity': 2}, {'id': dal.pk, 'quantity': 1}])
+
+    def test_checkout_fills_summary(self):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.item_count, 2)
+        self.assertEqual(self.order.customer_name, 'Rahim Uddin')
+        self.assertEqual(self.order.payment_state, 'unpaid')
+        self.assertIsNotNone(self.order.status_changed_at)
+
+    def test_writes_keep_summary_in_step(self):
+        before = Order.objects.get(pk=self.order.pk).status_changed_at
+        transition(self.order, 'confirmed')
+        payment = Payment.objects.create(order=self.order, payment_method='cash_on_delivery', amount=280)
+        self.customer.first_name = 'Karim'
+        self.customer.save()
+
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertGreater(order.status_changed_at, before)
+        self.assertEqual(order.payment_state, 'pending')
+        self.assertEqual(order.customer_name, 'Karim Uddin')
+
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(Order.objects.get(pk=self.order.pk).payment_state, 'paid')
+        payment.delete()
+        self.assertEqual(Order.objects.get(pk=self.order.pk).payment_state, 'unpaid')
+
+    def test_item_views_keep_item_count_in_step(self):
+        self.client.force_login(self.customer)
+        oil = ProductService.objects.create(
+            name='Oil', description='Oil', category='groceries', price=Decimal('190.00'), stock_quantity=10
+        )
+        response = self.client.post(reverse('orders:order_item_add', args=[self.order.pk]),
+                                    {'product': oil.pk, 'quantity': 1})
+        self.assertRedirects(response, reverse('orders:order_item_list', args=[self.order.pk]),
+                             fetch_redirect_response=False)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).item_count, 3)
+
+        item = self.order.items.get(product=oil)
+        self.assertEqual(item.total_price, Decimal('190.00'))
+        self.client.post(reverse('orders:order_item_delete', args=[self.order.pk, item.pk]))
+        self.assertEqual(Order.objects.get(pk=self.order.pk).item_count, 2)
+
+    def test_repair_recomputes_drifted_rows(self):
+        Payment.objects.create(order=self.order, payment_method='bkash', amount=280, status='completed')
+        Order.objects.filter(pk=self.order.pk).update(item_count=9, customer_name='x', payment_state='failed')
+
+        self.assertEqual(repair_summaries(batch_size=1), 1)
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual(
+            (order.item_count, order.customer_name, order.payment_state),
+            (2, 'Rahim Uddin', 'paid')
+        )
+        self.assertEqual(order.status_changed_at, order.status_history.latest('created_at').created_at)
+
+
+class ScheduledReleaseTests(TestCase):
+    """
+    Scheduled orders are released to dispatch when their slot comes close
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000101'
+        )
+        self.agents = []
+        for i in range(2):
+            agent = User.objects.create_user(
+                username=f'agent{i}', password='pass', phone_number=f'0170000011{i}',
+                user_type='delivery_agent'
+            )
+            DeliveryAgentProfile.objects.create(
+                user=agent, license_number=f'L-{i}', vehicle_type='bike', vehicle_number=f'V-{i}'
+            )
+            self.agents.append(agent)
+        self.now = timezone.now()
+
+    def scheduled(self, minutes):
+        return Order.objects.create(
+            customer=self.customer, delivery_address='Mirpur', total_amount=Decimal('100.00'),
+            delivery_type='scheduled', scheduled_delivery_time=self.now + timedelta(minutes=minutes)
+        )
+
+    def test_due_orders_are_confirmed_and_spread_over_agents(self):
+        due = [self.scheduled(30), self.scheduled(45)]
+        later = self.scheduled(180)
+        scheduler = ReleaseScheduler()
+        scheduler.load(self.now)
+
+        self.assertEqual(sorted(scheduler.tick(self.now)), sorted(order.pk for order in due))
+        for order in due:
+            order.refresh_from_db()
+            self.assertEqual(order.status, 'confirmed')
+            self.assertEqual(order.delivery_assignment.estimated_delivery_time, order.scheduled_delivery_time)
+        self.assertEqual(
+            {order.delivery_assignment.delivery_agent_id for order in due},
+            {agent.pk for agent in self.agents}
+        )
+        later.refresh_from_db()
+        self.assertEqual(later.status, 'pending')
+        self.assertEqual(len(scheduler), 1)
+
+    def test_new_and_rescheduled_orders_are_picked_up(self):
+        moved = self.scheduled(30)
+        scheduler = ReleaseScheduler()
+        scheduler.load(self.now)
+
+        moved.scheduled_delivery_time = self.now + timedelta(minutes=300)
+        moved.save()
+        added = self.scheduled(20)
+        self.assertEqual(scheduler.tick(self.now), [added.pk])
+        self.assertFalse(DeliveryAssignment.objects.filter(order=moved).exists())
+
+        self.assertEqual(scheduler.tick(self.now + timedelta(minutes=240)), [moved.pk])
+
+    def test_orders_wait_for_an_agent(self):
+        DeliveryAgentProfile.objects.update(is_available=False)
+        order = self.scheduled(30)
+        scheduler = ReleaseScheduler()
+        scheduler.load(self.now)
+
+        self.assertEqual(scheduler.tick(self.now), [])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+        self.assertEqual(len(scheduler), 1)
+
+        DeliveryAgentProfile.objects.filter(user=self.agents[0]).update(is_available=True)
+        self.assertEqual(scheduler.tick(self.now + timedelta(seconds=30)), [])
+        self.assertEqual(scheduler.tick(self.now + timedelta(minutes=1)), [order.pk])
+        self.assertEqual(order.delivery_assignment.delivery_agent, self.agents[0])
+
+    def test_orders_assigned_meanwhile_are_not_counted(self):
+        order = self.scheduled(30)
+        DeliveryAssignment.objects.create(order=order, delivery_agent=self.agents[0])
+        loads = [(0, self.agents[1].pk)]
+
+        self.assertEqual(assign_agents([(order.pk, order.scheduled_delivery_time)], loads), [])
+        self.assertEqual(loads, [(0, self.agents[1].pk)])
+        self.assertEqual(order.delivery_assignment.delivery_agent, self.agents[0])
+
+
+class CancellationQueryTests(TestCase):
+    """
+    The SQL cancellation filter and deadline agree with the model methods
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000121'
+        )
+        now = timezone.now()
+        for status, hours in (('pending', 60), ('confirmed', 1), ('processing', 2),
+                              ('processing', 30), ('dispatched', 1), ('cancelled', 1)):
+            order = Order.objects.create(
+                customer=self.customer, delivery_address='Mirpur', total_amount=Decimal('10.00'), status=status
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(hours=hours))
+
+    def test_annotations_match_methods(self):
+        orders = {order.pk: order for order in Order.objects.all()}
+        annotated = list(Order.objects.with_cancellation())
+        for order in annotated:
+            plain = orders[order.pk]
+            self.assertEqual(order.is_cancellable, plain.can_be_cancelled(), plain.status)
+            self.assertEqual(order.cancellation_deadline, plain.get_cancellation_deadline(), plain.status)
+        self.assertEqual(
+            set(Order.objects.cancellable().values_list('pk', flat=True)),
+            {pk for pk, order in orders.items() if order.can_be_cancelled()}
+        )
+        self.assertEqual(Order.objects.cancellable().count(), 3)
+
+    def test_order_list_filters_cancellable(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('orders:order_list'), {'cancellable': '1'})
+        self.assertEqual(response.context['cancellable_count'], 3)
+        self.assertTrue(all(order.is_cancellable for order in response.context['orders']))
+        self.assertEqual(len(response.context['orders']), 3)
+
+
+class BulkCancellationTests(TestCase):
+    """
+    Orders are cancelled in bulk with their stock and refunds
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000131'
+        )
+        self.rice = ProductService.objects.create(
+            name='Rice', description='Rice', category='groceries',
+            price=Decimal('80.00'), stock_quantity=20
+        )
+        self.gas = ProductService.objects.create(
+            name='Gas', description='Gas', category='gas',
+            price=Decimal('1200.00'), stock_quantity=8
+        )
+        enable_sharding(self.gas, 2)
+        self.orders = [
+            place_order(self.customer, [{'id': self.rice.pk, 'quantity': 2}, {'id': self.gas.pk, 'quantity': 1}])
+            for _ in range(3)
+        ]
+        Payment.objects.create(order=self.orders[0], payment_method='bkash', amount=1360, status='completed')
+        Payment.objects.create(order=self.orders[1], payment_method='nagad', amount=1360, status='failed')
+        transition(self.orders[2], 'confirmed')
+        transition(self.orders[2], 'dispatched')
+
+    def test_cancel_restores_stock_and_raises_refunds(self):
+        ids = [order.pk for order in self.orders] + [0]
+        results = cancel_orders(ids, reason='supplier_unavailable', refund_preference='refund_to_payment_method')
+
+        self.assertEqual([result['success'] for result in results], [True, True, False, False])
+        self.assertEqual(results[3]['message'], 'Order not found')
+        self.assertEqual(
+            list(Order.objects.filter(pk__in=ids).order_by('pk').values_list('status', flat=True)),
+            ['cancelled', 'cancelled', 'dispatched']
+        )
+        self.assertEqual(OrderStatusHistory.objects.filter(status='cancelled').count(), 2)
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.stock_quantity, 18)
+        self.assertEqual(shard_totals([self.gas.pk])[self.gas.pk], 7)
+        refund = Refund.objects.get()
+        self.assertEqual((refund.payment.order_id, refund.amount), (self.orders[0].pk, Decimal('1360.00')))
+
+    def test_only_paid_orders_are_refunded(self):
+        self.assertEqual(cancel_and_refund(Order.objects.all(), reason='supplier_unavailable'), 2)
+
+        self.assertEqual(
+            list(Order.objects.filter(status='cancelled').order_by('pk').values_list('refund_preference', flat=True)),
+            ['refund_to_payment_method', 'no_refund_needed']
+        )
+        self.assertEqual(Refund.objects.get().payment.order_id, self.orders[0].pk)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        with self.assertNumQueries(10):
+            cancel_orders([self.orders[0].pk], refund_preference='refund_to_wallet')
+        Payment.objects.create(order=self.orders[1], payment_method='bkash', amount=1360, status='completed')
+        with self.assertNumQueries(10):
+            cancel_orders([self.orders[1].pk, self.orders[2].pk, self.orders[0].pk],
+                          refund_preference='refund_to_wallet')
+
+    def test_command_selects_orders_by_product(self):
+        other = ProductService.objects.create(
+            name='Dal', description='Dal', category='groceries', price=Decimal('100.00'), stock_quantity=5
+        )
+        untouched = place_order(self.customer, [{'id': other.pk, 'quantity': 1}])
+        out = io.StringIO()
+        call_command('cancel_orders', product=[self.rice.pk], stdout=out)
+        self.assertIn('2 order(s) cancelled', out.getvalue())
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.status, 'pending')
+
+
+class OrderTimelineTests(TestCase):
+    """
+    The order timeline merges history, tracking, payment logs and refunds
+    """
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000141'
+        )
+        self.agent = User.objects.create_user(
+            username='agent', password='pass', phone_number='01700000142', user_type='delivery_agent'
+        )
+        self.order = Order.objects.create(
+            customer=self.customer, delivery_address='Road 1', total_amount=Decimal('100.00')
+        )
+        start = timezone.now() - timedelta(hours=1)
+        history = OrderStatusHistory.objects.create(order=self.order, status='confirmed')
+        assignment = DeliveryAssignment.objects.create(order=self.order, delivery_agent=self.agent)
+        tracking = DeliveryStatus.objects.create(delivery_assignment=assignment, status='picked_up')
+        payments = [
+            Payment.objects.create(order=self.order, payment_method='bkash', amount=100, status=status)
+            for status in ('failed', 'completed')
+        ]
+        logs = [
+            PaymentTransaction.objects.create(payment=payment, action=f'log {i}', status='ok')
+            for i, payment in enumerate(payments * 2)
+        ]
+        refund = Refund.objects.create(payment=payments[1], amount=Decimal('40.00'), reason='Damaged')
+        # Interleave the sources in time so the merge has to pick across streams
+        rows = [(OrderStatusHistory, history, 'created_at'), (PaymentTransaction, logs[0], 'timestamp'),
+                (DeliveryStatus, tracking, 'timestamp'), (PaymentTransaction, logs[1], 'timestamp'),
+                (PaymentTransaction, logs[2], 'timestamp'), (Refund, refund, 'created_at'),
+                (PaymentTransaction, logs[3], 'timestamp')]
+        for minutes, (model, row, field) in enumerate(rows):
+            model.objects.filter(pk=row.pk).update(**{field: start + timedelta(minutes=minutes)})
+        self.expected = [
+            ('payment', logs[3].pk), ('refund', refund.pk), ('payment', logs[2].pk), ('payment', logs[1].pk),
+            ('delivery', tracking.pk), ('payment', logs[0].pk), ('order', history.pk),
+        ]
+        cache.clear()
+
+    def test_streams_are_merged_newest_first(self):
+        with self.assertNumQueries(4):
+            events = build_timelines([self.order.pk])[self.order.pk]
+        self.assertEqual([(event['kind'], event['id']) for event in events], self.expected)
+        self.assertEqual(events[1]['label'], 'রিফান্ড ৳40.00 - অপেক্ষমান')
+
+    def test_timeline_is_cached_until_a_stream_is_written(self):
+        order_timeline(self.order)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(order_timeline(self.order)), 7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_transition([self.order.pk], 'confirmed')
+        self.assertEqual(order_timeline(self.order)[0]['status'], 'confirmed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentTransaction.objects.create(payment=Payment.objects.first(), action='late', status='ok')
+        self.assertEqual(order_timeline(self.order)[0]['label'], 'late')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Refund.objects.all().delete()
+        self.assertNotIn('refund', [event['kind'] for event in order_timeline(self.order)])
+
+    def test_timeline_built_before_a_write_is_not_stored_over_it(self):
+        original = build_timelines
+
+        def build_then_write(order_ids, archived=False):
+            built = original(order_ids, archived)
+            with self.captureOnCommitCallbacks(execute=True):
+                OrderStatusHistory.objects.create(order=self.order, status='processing')
+            return built
+
+        with mock.patch('orders.timeline.build_timelines', build_then_write):
+            self.assertEqual(order_timeline(self.order)[0]['kind'], 'payment')
+        self.assertEqual(order_timeline(self.order)[0]['status'], 'processing')
+
+    def test_api_pages_the_timeline(self):
+        self.client.login(username='customer', password='pass')
+        url = reverse('orders:order_timeline_api', args=[self.order.pk])
+        data = self.client.get(url, {'per_page': 3, 'page': 3}).json()
+
+        self.assertEqual((data['total'], data['pages'], data['has_next']), (7, 3, False))
+        self.assertEqual([(event['kind'], event['id']) for event in data['events']], self.expected[6:])
+
+        other = User.objects.create_user(username='other', password='pass', phone_number='01700000143')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_track_page_shows_the_timeline(self):
+        self.client.login(username='customer', password='pass')
+        response = self.client.get(reverse('orders:order_track', args=[self.order.pk]))
+        self.assertContains(response, 'Damaged')
+        self.assertEqual(len(response.context['timeline']), 7)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Tests for cursor pagination of order lists
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000031'
+        )
+        Order.objects.bulk_create([
+            Order(order_number=f'KS{i:04d}', customer=self.customer, delivery_address='x',
+                  delivery_city='ঢাকা', total_amount=Decimal('1.00'))
+            for i in range(7)
+        ])
+        # Ties on created_at must still give a stable order
+        Order.objects.update(created_at=timezone.now())
+        self.expected = list(Order.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def test_walk_forward_and_back(self):
+        paginator = KeysetPaginator(Order.objects.all(), 3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+
+        self.assertEqual([o.pk for o in first] + [o.pk for o in second] + [o.pk for o in third], self.expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual([o.pk for o in paginator.page(third.previous_cursor)], self.expected[3:6])
+        self.assertEqual(paginator.count, 7)
+
+    def test_order_list_view_uses_cursor(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('orders:order_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertEqual(self.client.get(reverse('orders:order_list') + '?cursor=bogus').status_code, 404)
+
+
+class OrderQueryPlanTests(QueryPlanMixin, TestCase):
+    """
+    Order list queries must stay on their indexes
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000041'
+        )
+        self.staff = User.objects.create_user(
+            username='staff', password='pass', phone_number='01700000042', is_staff=True
+        )
+
+    def test_customer_order_list(self):
+        for view_class in (OrderListView, OrderHistoryView):
+            self.assertIndexed(
+                self.list_view_sql(view_class, self.customer),
+                ['orders_order'], index='order_customer_created_idx'
+            )
+
+    def test_customer_order_list_deep_page(self):
+        cursor = encode_cursor(timezone.now(), 100, 'next')
+        request = RequestFactory().get('/', {'cursor': cursor})
+        request.user = self.customer
+        view = OrderListView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        with self.capture_sql() as statements:
+            view.get_context_data()
+        self.assertIndexed(statements, ['orders_order'], index='order_customer_created_idx')
+
+    def test_admin_order_list(self):
+        for view_class in (OrderListView, AdminOrderListView):
+            self.assertIndexed(
+                self.list_view_sql(view_class, self.staff),
+                ['orders_order'], index='order_created_idx'
+            )
+
+    def test_status_counts(self):
+        with self.capture_sql() as statements:
+            Order.objects.filter(status='pending').count()
+        self.assertIndexed(statements, ['orders_order'], index='order_status_idx')
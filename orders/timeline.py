@@ -0,0 +1,187 @@
+import heapq
+import time
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from delivery.models import DeliveryStatus
+from payments.models import PaymentTransaction, Refund
+
+from .models import ArchivedOrderStatusHistory, Order, OrderStatusHistory
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+ORDER_STATUS_LABELS = dict(Order.ORDER_STATUS_CHOICES)
+DELIVERY_STATUS_LABELS = dict(DeliveryStatus.STATUS_CHOICES)
+REFUND_STATUS_LABELS = dict(Refund.REFUND_STATUS_CHOICES)
+
+
+def cache_timeout():
+    """
+    How long a cached timeline lives if none of its streams is written
+    """
+    return getattr(settings, 'ORDER_TIMELINE_TIMEOUT', 10 * 60)
+
+
+def _generation_key(order_id):
+    return f'order_timeline:{order_id}:generation'
+
+
+def _key(order_id, generation):
+    return f'order_timeline:{order_id}:{generation}'
+
+
+def _generations(order_ids):
+    # Each write moves an order's timeline to a new generation, so a
+    # timeline built from rows read before the write is stored under a key
+    # nobody reads any more instead of overwriting the fresh one
+    keys = {order_id: _generation_key(order_id) for order_id in order_ids}
+    generations = cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), cache_timeout())
+        generations.update(cache.get_many(missing))
+    return {order_id: generations.get(key) for order_id, key in keys.items()}
+
+
+def _history(model, order_ids):
+    rows = (
+        model.objects.filter(order_id__in=order_ids)
+        .order_by('order_id', '-created_at', '-id')
+        .values_list('order_id', 'pk', 'created_at', 'status', 'notes')
+    )
+    for order_id, pk, created_at, status, notes in rows:
+        yield order_id, order_id, {
+            'kind': 'order', 'id': pk, 'timestamp': created_at, 'status': status,
+            'label': ORDER_STATUS_LABELS.get(status, status), 'notes': notes or '',
+        }
+
+
+def _delivery(order_ids):
+    rows = (
+        DeliveryStatus.objects.filter(delivery_assignment__order_id__in=order_ids)
+        .order_by('delivery_assignment_id', '-timestamp', '-id')
+        .values_list('delivery_assignment__order_id', 'delivery_assignment_id', 'pk', 'timestamp',
+                     'status', 'location', 'notes')
+    )
+    for order_id, stream, pk, timestamp, status, location, notes in rows:
+        yield order_id, stream, {
+            'kind': 'delivery', 'id': pk, 'timestamp': timestamp, 'status': status,
+            'label': DELIVERY_STATUS_LABELS.get(status, status),
+            'notes': ' - '.join(part for part in (location, notes) if part),
+        }
+
+
+def _transactions(order_ids):
+    rows = (
+        PaymentTransaction.objects.filter(payment__order_id__in=order_ids)
+        .order_by('payment_id', '-timestamp', '-id')
+        .values_list('payment__order_id', 'payment_id', 'pk', 'timestamp', 'action', 'status', 'message')
+    )
+    for order_id, stream, pk, timestamp, action, status, message in rows:
+        yield order_id, stream, {
+            'kind': 'payment', 'id': pk, 'timestamp': timestamp, 'status': status,
+            'label': action, 'notes': message or '',
+        }
+
+
+def _refunds(order_ids):
+    rows = (
+        Refund.objects.filter(payment__order_id__in=order_ids)
+        .order_by('payment_id', '-created_at', '-id')
+        .values_list('payment__order_id', 'payment_id', 'pk', 'created_at', 'amount', 'status', 'reason')
+    )
+    for order_id, stream, pk, created_at, amount, status, reason in rows:
+        yield order_id, stream, {
+            'kind': 'refund', 'id': pk, 'timestamp': created_at, 'status': status,
+            'label': f'রিফান্ড ৳{amount} - {REFUND_STATUS_LABELS.get(status, status)}', 'notes': reason,
+        }
+
+
+def build_timelines(order_ids, archived=False):
+    """
+    ``{order id: events}`` for the given orders, newest first.
+
+    Each source is read with one query for all the orders through its
+    (parent, time) index and comes back grouped by parent, so the order's
+    history, its delivery updates and every payment's transactions and
+    refunds each form a stream already in time order. The streams of an
+    order are then combined with a k-way heap merge instead of sorting
+    everything again. Archived orders only keep their status history.
+    """
+    order_ids = list(order_ids)
+    if archived:
+        sources = [_history(ArchivedOrderStatusHistory, order_ids)]
+    else:
+        sources = [
+            _history(OrderStatusHistory, order_ids), _delivery(order_ids),
+            _transactions(order_ids), _refunds(order_ids),
+        ]
+
+    streams = {order_id: [] for order_id in order_ids}
+    for rows in sources:
+        for (order_id, stream), events in groupby(rows, key=itemgetter(0, 1)):
+            streams[order_id].append([event for order_id, stream, event in events])
+    return {
+        order_id: list(heapq.merge(*order_streams, key=itemgetter('timestamp'), reverse=True))
+        for order_id, order_streams in streams.items()
+    }
+
+
+def order_timelines(order_ids, archived=False):
+    """
+    Timelines for many orders, from the cache where possible.
+
+    The generations are read before anything is built, so a timeline is
+    only stored under the generation that was current when its rows were.
+    """
+    order_ids = list(order_ids)
+    keys = {
+        order_id: _key(order_id, generation)
+        for order_id, generation in _generations(order_ids).items() if generation is not None
+    }
+    cached = cache.get_many(keys.values())
+    timelines = {order_id: cached[key] for order_id, key in keys.items() if key in cached}
+    missing = [order_id for order_id in order_ids if order_id not in timelines]
+    if missing:
+        built = build_timelines(missing, archived)
+        cache.set_many(
+            {keys[order_id]: events for order_id, events in built.items() if order_id in keys}, cache_timeout()
+        )
+        timelines.update(built)
+    return timelines
+
+
+def order_timeline(order):
+    """
+    The events of one order, newest first
+    """
+    return order_timelines([order.pk], archived=order.is_archived)[order.pk]
+
+
+def timeline_changed(order_ids):
+    """
+    Move the given orders to a new timeline generation once the current transaction commits
+    """
+    keys = [_generation_key(order_id) for order_id in set(order_ids)]
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many({key: time.time_ns() for key in keys}, cache_timeout())
+        )
+
+
+def timeline_page(events, page=None, per_page=None):
+    """
+    One page of a timeline; bad page numbers fall back to the nearest page
+    """
+    try:
+        per_page = min(max(int(per_page), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        per_page = PAGE_SIZE
+    return Paginator(events, per_page).get_page(page)
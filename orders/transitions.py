@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard import events, rollups
+
+from .models import Order, OrderStatusHistory
+from .timeline import timeline_changed
+
+# Allowed order status changes: current status -> statuses it may move to
+ALLOWED_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('processing', 'dispatched', 'cancelled'),
+    'processing': ('dispatched', 'cancelled'),
+    'dispatched': ('delivered', 'returned'),
+    'delivered': ('returned',),
+    'cancelled': (),
+    'returned': (),
+}
+
+# Precompiled lookups so a status check is a single set or dict probe
+TRANSITIONS = frozenset(
+    (source, target) for source, targets in ALLOWED_TRANSITIONS.items() for target in targets
+)
+SOURCES = {
+    status: tuple(source for source, targets in ALLOWED_TRANSITIONS.items() if status in targets)
+    for status in ALLOWED_TRANSITIONS
+}
+
+# Cancelling also restores stock and raises refunds, which a bare status
+# change would skip, so it goes through orders.cancellation instead: it is
+# no bulk target and transition() refuses it.
+BULK_TARGETS = ('confirmed', 'processing', 'dispatched', 'delivered', 'returned')
+
+MAX_BULK_ORDERS = 1000
+
+
+class TransitionError(Exception):
+    """
+    Raised when a requested status change is not allowed at all
+    """
+
+
+class TransitionConflict(Exception):
+    """
+    Raised when the order's status changed after the caller read it
+    """
+    def __init__(self, order_id, expected, current):
+        super().__init__(f'Order {order_id} is {current}, not {expected}')
+        self.expected = expected
+        self.current = current
+
+
+def can_transition(source, target):
+    """
+    Whether the state graph allows moving from ``source`` to ``target``
+    """
+    return (source, target) in TRANSITIONS
+
+
+def transition(order, status, user=None, notes='', **fields):
+    """
+    Move one order from the status it was read with to ``status``.
+
+    The change is a compare-and-set: a single UPDATE of the status (plus any
+    extra ``fields``, e.g. cancellation details) guarded by
+    ``WHERE id = ? AND status = ?``. No row is read or locked beforehand, so
+    concurrent writers cannot overwrite each other; the loser gets a
+    TransitionConflict with the current status instead of retrying.
+    """
+    expected = order.status
+    if status == 'cancelled':
+        raise TransitionError('Orders are cancelled through orders.cancellation')
+    if not can_transition(expected, status):
+        raise TransitionError(f'Cannot move from {expected} to {status}')
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Order.objects.filter(pk=order.pk, status=expected).update(
+            status=status, updated_at=now, status_changed_at=now, **fields
+        )
+        if not updated:
+            current = Order.objects.filter(pk=order.pk).values_list('status', flat=True).first()
+            raise TransitionConflict(order.pk, expected, current)
+        OrderStatusHistory.objects.create(
+            order=order,
+            status=status,
+            notes=notes or f'Status changed from {expected} to {status}',
+            created_by=user
+        )
+        rollups.touch('orders', order.created_at)
+        events.orders_changed([order.pk])
+
+    order.status = status
+    order.updated_at = now
+    order.status_changed_at = now
+    for field, value in fields.items():
+        setattr(order, field, value)
+    return order
+
+
+def bulk_transition(order_ids, status, user=None, notes=''):
+    """
+    Move many orders to ``status`` at once.
+
+    Eligible orders are changed with one conditional UPDATE guarded by
+    ``status IN (allowed sources)`` and their history rows are written with
+    one bulk INSERT. Returns one result dict per requested order id, in the
+    order given, saying whether it moved and why not.
+    """
+    if status not in BULK_TARGETS:
+        raise TransitionError(f'Orders cannot be moved to {status} in bulk')
+    order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise TransitionError(f'At most {MAX_BULK_ORDERS} orders per request')
+    sources = SOURCES[status]
+
+    with transaction.atomic():
+        current, created = {}, {}
+        for pk, order_status, created_at in (
+            Order.objects.select_for_update().filter(pk__in=order_ids).values_list('pk', 'status', 'created_at')
+        ):
+            current[pk] = order_status
+            created[pk] = created_at
+        eligible = [pk for pk in order_ids if current.get(pk) in sources]
+
+        moved = set()
+        if eligible:
+            now = timezone.now()
+            updated = Order.objects.filter(pk__in=eligible, status__in=sources).update(
+                status=status, updated_at=now, status_changed_at=now
+            )
+            moved = set(eligible)
+            if updated != len(eligible):
+                # Without row locks (SQLite) a concurrent writer may have won;
+                # the timestamp written here tells our rows from theirs
+                moved = set(
+                    Order.objects.filter(pk__in=eligible, status=status, status_changed_at=now)
+                    .values_list('pk', flat=True)
+                )
+
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(
+                order_id=pk,
+                status=status,
+                notes=f'Status changed from {current[pk]} to {status}' + (f'. {notes}' if notes else ''),
+                created_by=user
+            )
+            for pk in order_ids if pk in moved
+        ])
+        # Neither UPDATE nor bulk_create send post_save, so timelines,
+        # rollups and event streams are refreshed here
+        timeline_changed(moved)
+        rollups.touch('orders', *(created[pk] for pk in moved))
+        events.orders_changed(moved)
+
+    results = []
+    for pk in order_ids:
+        if pk in moved:
+            results.append({'order_id': pk, 'success': True, 'from': current[pk], 'status': status})
+        elif pk not in current:
+            results.append({'order_id': pk, 'success': False, 'message': 'Order not found'})
+        elif pk in eligible:
+            results.append({'order_id': pk, 'success': False, 'status': current[pk],
+                            'message': 'Order was changed by someone else'})
+        else:
+            results.append({'order_id': pk, 'success': False, 'status': current[pk],
+                            'message': f'Cannot move from {current[pk]} to {status}'})
+    return results
@@ -27,12 +27,21 @@ urlpatterns = [
     
     # API endpoints
     path('api/admin/update-status/', views.admin_update_order_status, name='admin_update_order_status'),
+    path('api/admin/bulk-update-status/', views.bulk_update_order_status, name='bulk_update_order_status'),
     path('api/dashboard-data/', views.dashboard_data_api, name='dashboard_data_api'),
     path('api/create-order/', views.create_order_from_cart, name='create_order_from_cart'),
+    path('api/orders/<int:pk>/timeline/', views.order_timeline_api, name='order_timeline_api'),
+    path('api/cart/', views.cart_api, name='cart_api'),
+    path('api/cart/add/', views.cart_add, name='cart_add'),
+    path('api/cart/remove/', views.cart_remove, name='cart_remove'),
+    path('api/cart/reserve/', views.reserve_cart_stock, name='reserve_cart_stock'),
+    path('api/cart/release/', views.release_cart_stock, name='release_cart_stock'),
+    path('api/products/search/', views.product_search_api, name='product_search_api'),
     
     # Products/Services
     path('products/', views.ProductListView.as_view(), name='products'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
+    path('products/search/', views.ProductSearchView.as_view(), name='product_search'),
     path('products/category/<str:category>/', views.ProductCategoryView.as_view(), name='product_category'),
     
     # Order items
@@ -56,4 +65,6 @@ urlpatterns = [
     path('api/add-product/', views.add_product, name='add_product_api'),
     path('api/update-product/<int:product_id>/', views.update_product, name='update_product_api'),
     path('api/delete-product/<int:product_id>/', views.delete_product, name='delete_product_api'),
+    path('api/products/import/', views.import_products_api, name='import_products_api'),
+    path('api/products/export/', views.export_products_api, name='export_products_api'),
 ]
@@ -4,19 +4,34 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Q, Sum
-from django.http import JsonResponse
+from django.db.models import Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
-import uuid
 import json
 
-from .models import ProductService, Order, OrderItem, OrderStatusHistory
+from .models import ArchivedOrder, ProductService, Order, OrderItem
 from .forms import OrderForm, OrderItemForm, OrderCancellationForm
-from payments.models import Payment
+from .idempotency import idempotent
+from . import catalog, product_feed, search
+from .archive import find_archived_order
+from .cancellation import cancel_order, cancel_orders
+from .cart import Cart
+from .checkout import CheckoutError, place_order
+from .pagination import KeysetPaginationMixin
+from .reservations import release_customer_holds, reserve_cart
+from .summary import refresh_item_counts
+from .stock import set_stock
+from .timeline import order_timeline, timeline_page
+from .transitions import TransitionConflict, TransitionError, bulk_transition, transition
+from dashboard.stats import dashboard_state
+
+# Latest timeline events shown on the order detail page
+TIMELINE_PREVIEW = 5
+
 
 class ProductListView(ListView):
     """
@@ -28,11 +43,11 @@ class ProductListView(ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return ProductService.objects.filter(is_available=True).order_by('-created_at')
+        return catalog.CachedProductList(per_page=self.paginate_by)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = ProductService.objects.values_list('category', flat=True).distinct()
+        context['categories'] = catalog.categories(self.object_list.version)
         return context
 
 
@@ -43,6 +58,12 @@ class ProductDetailView(DetailView):
     model = ProductService
     template_name = 'orders/product_detail.html'
     context_object_name = 'product'
+    
+    def get_object(self, queryset=None):
+        product = catalog.get_product(self.kwargs['pk'])
+        if product is None:
+            raise Http404('Product not found')
+        return catalog.with_live_stock([product])[0]
 
 
 class ProductCategoryView(ListView):
@@ -55,10 +76,7 @@ class ProductCategoryView(ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        return ProductService.objects.filter(
-            category=self.kwargs['category'],
-            is_available=True
-        ).order_by('-created_at')
+        return catalog.CachedProductList(category=self.kwargs['category'], per_page=self.paginate_by)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -66,7 +84,76 @@ class ProductCategoryView(ListView):
         return context
 
 
-class OrderListView(LoginRequiredMixin, ListView):
+class ProductSearchView(ListView):
+    """
+    Product search results, ranked by relevance
+    """
+    template_name = 'orders/products.html'
+    context_object_name = 'products'
+    per_page = 24
+    
+    def get_page_number(self):
+        try:
+            return max(int(self.request.GET.get('page', 1)), 1)
+        except ValueError:
+            return 1
+    
+    def get_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+        if not query:
+            return []
+        offset = (self.get_page_number() - 1) * self.per_page
+        # One extra row tells us whether there is a next page without a COUNT
+        return search.search_products(
+            query, self.request.GET.get('category') or None,
+            limit=self.per_page + 1, offset=offset
+        )
+    
+    def get_context_data(self, **kwargs):
+        page = self.get_page_number()
+        has_next = len(self.object_list) > self.per_page
+        self.object_list = self.object_list[:self.per_page]
+        context = super().get_context_data(**kwargs)
+        context['categories'] = catalog.categories()
+        context['search_query'] = self.request.GET.get('q', '')
+        context['search_category'] = self.request.GET.get('category', '')
+        context['next_page'] = page + 1 if has_next else None
+        context['previous_page'] = page - 1 if page > 1 else None
+        return context
+
+
+@require_http_methods(["GET"])
+def product_search_api(request):
+    """
+    JSON product search; with ``autocomplete=1`` returns name suggestions
+    """
+    query = request.GET.get('q', '').strip()
+    category = request.GET.get('category') or None
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid limit'}, status=400)
+    
+    if request.GET.get('autocomplete'):
+        return JsonResponse({'success': True, 'suggestions': search.autocomplete(query, category, limit)})
+    
+    products = search.search_products(query, category, limit) if query else []
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'category': product.category,
+                'price': str(product.price),
+                'in_stock': product.is_in_stock(),
+            }
+            for product in products
+        ]
+    })
+
+
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Order list view
     """
@@ -75,15 +162,25 @@ class OrderListView(LoginRequiredMixin, ListView):
     context_object_name = 'orders'
     paginate_by = 20
     
-    def get_queryset(self):
+    def get_base_queryset(self):
         if self.request.user.is_staff or self.request.user.is_superuser:
-            return Order.objects.all().order_by('-created_at')
-        else:
-            return Order.objects.filter(customer=self.request.user).order_by('-created_at')
+            return Order.objects.all()
+        return Order.objects.filter(customer=self.request.user)
+    
+    def cancellable_only(self):
+        return self.request.GET.get('cancellable') == '1'
+    
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        if self.cancellable_only():
+            queryset = queryset.cancellable()
+        return queryset.with_cancellation().select_related('customer').order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_admin'] = self.request.user.is_staff or self.request.user.is_superuser
+        context['cancellable_only'] = self.cancellable_only()
+        context['cancellable_count'] = self.get_base_queryset().cancellable().count()
         return context
 
 
@@ -97,9 +194,25 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     
     def get_queryset(self):
         if self.request.user.is_staff or self.request.user.is_superuser:
-            return Order.objects.all()
+            queryset = Order.objects.all()
         else:
-            return Order.objects.filter(customer=self.request.user)
+            queryset = Order.objects.filter(customer=self.request.user)
+        return queryset.select_related('customer', 'cancelled_by').prefetch_related('items__product')
+    
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            # Finished orders move to the archive after a while
+            order = find_archived_order(self.request.user, pk=self.kwargs.get('pk'))
+            if order is None:
+                raise
+            return order
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['timeline'] = order_timeline(self.object)[:TIMELINE_PREVIEW]
+        return context
 
 
 class OrderCreateView(TemplateView):
@@ -124,8 +237,9 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get cart data from session or localStorage (handled by JavaScript)
-        context['cart_items'] = []  # Will be populated by JavaScript
+        # The server cart; pages that still keep the cart in localStorage send it with the order
+        context['cart'] = Cart.for_request(self.request).detail()
+        context['cart_items'] = context['cart']['items']
         return context
 
 
@@ -147,14 +261,16 @@ class InvoiceView(LoginRequiredMixin, DetailView):
     def get_object(self):
         order_id = self.kwargs.get('order_id')
         try:
-            order = Order.objects.get(order_number=order_id)
+            order = Order.objects.select_related('customer').prefetch_related(
+                'items__product'
+            ).get(order_number=order_id)
             # Check if user has permission to view this order
             if self.request.user.is_staff or self.request.user.is_superuser or order.customer == self.request.user:
                 return order
             else:
                 return None
         except Order.DoesNotExist:
-            return None
+            return find_archived_order(self.request.user, order_number=order_id)
 
 
 class OrderTrackView(LoginRequiredMixin, DetailView):
@@ -170,6 +286,20 @@ class OrderTrackView(LoginRequiredMixin, DetailView):
             return Order.objects.all()
         else:
             return Order.objects.filter(customer=self.request.user)
+    
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            order = find_archived_order(self.request.user, pk=self.kwargs.get('pk'))
+            if order is None:
+                raise
+            return order
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['timeline'] = timeline_page(order_timeline(self.object), self.request.GET.get('page'))
+        return context
 
 
 class OrderEditView(LoginRequiredMixin, UpdateView):
@@ -232,57 +362,26 @@ class OrderCancelView(LoginRequiredMixin, TemplateView):
         form = OrderCancellationForm(request.POST)
         
         if form.is_valid():
-            # Update order with cancellation details
-            order.status = 'cancelled'
-            order.cancellation_reason = form.cleaned_data['reason']
-            order.cancellation_notes = form.cleaned_data['additional_notes']
-            order.cancelled_at = timezone.now()
-            order.cancelled_by = request.user
-            order.refund_preference = form.cleaned_data['refund_preference']
-            order.save()
-            
-            # Create status history entry
-            OrderStatusHistory.objects.create(
-                order=order,
-                status='cancelled',
-                notes=f'Order cancelled by {request.user.get_full_name()}. Reason: {form.cleaned_data["reason"]}',
-                created_by=request.user
-            )
-            
-            # Create refund if needed
-            if form.cleaned_data['refund_preference'] and form.cleaned_data['refund_preference'] != 'no_refund_needed':
-                self._create_refund(order, form.cleaned_data['refund_preference'])
+            # One conditional UPDATE, guarded by the cancellation rules, plus
+            # history, stock and refund rows in the same transaction
+            result = cancel_orders(
+                [order.pk], user=request.user,
+                reason=form.cleaned_data['reason'],
+                notes=form.cleaned_data['additional_notes'],
+                refund_preference=form.cleaned_data['refund_preference']
+            )[0]
+            if not result['success']:
+                messages.error(request, 'এই অর্ডার আর বাতিল করা যাবে না।')
+                return redirect('orders:order_detail', pk=order.pk)
             
             messages.success(request, 'অর্ডার সফলভাবে বাতিল হয়েছে। রিফান্ড প্রক্রিয়াকরণ শুরু হয়েছে।')
             return redirect('orders:order_detail', pk=order.pk)
         else:
             messages.error(request, 'ফর্মে কিছু ত্রুটি আছে। দয়া করে আবার চেষ্টা করুন।')
             return self.get(request, *args, **kwargs)
-    
-    def _create_refund(self, order, refund_preference):
-        """
-        Create refund record for cancelled order
-        """
-        try:
-            from payments.models import Refund, Payment
-            
-            # Find the payment for this order
-            payment = Payment.objects.filter(order=order).first()
-            
-            if payment:
-                Refund.objects.create(
-                    payment=payment,
-                    amount=order.total_amount,
-                    reason=f'Order cancellation: {order.cancellation_reason}',
-                    status='pending',
-                    processed_by=order.cancelled_by
-                )
-        except Exception as e:
-            # Log error but don't fail the cancellation
-            print(f"Error creating refund: {e}")
 
 
-class OrderHistoryView(LoginRequiredMixin, ListView):
+class OrderHistoryView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Order history view
     """
@@ -293,6 +392,9 @@ class OrderHistoryView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         return Order.objects.filter(customer=self.request.user).order_by('-created_at')
+    
+    def get_merged_querysets(self):
+        return [ArchivedOrder.objects.filter(customer=self.request.user)]
 
 
 class OrderHistoryDetailView(LoginRequiredMixin, DetailView):
@@ -308,7 +410,7 @@ class OrderHistoryDetailView(LoginRequiredMixin, DetailView):
 
 
 # Admin views
-class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     """
     Admin order list view
     """
@@ -321,7 +423,7 @@ class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return self.request.user.is_staff or self.request.user.is_superuser
     
     def get_queryset(self):
-        return Order.objects.all().order_by('-created_at')
+        return Order.objects.order_by('-created_at')
 
 
 class AdminOrderDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
@@ -331,6 +433,9 @@ class AdminOrderDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = Order
     template_name = 'orders/admin_order_detail.html'
     context_object_name = 'order'
+    queryset = Order.objects.select_related('customer', 'cancelled_by').prefetch_related(
+        'items__product', 'status_history__created_by'
+    )
     
     def test_func(self):
         return self.request.user.is_staff or self.request.user.is_superuser
@@ -368,7 +473,7 @@ class OrderItemListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         order = get_object_or_404(Order, pk=self.kwargs['order_pk'])
         if order.customer == self.request.user or self.request.user.is_staff:
-            return OrderItem.objects.filter(order=order)
+            return OrderItem.objects.filter(order=order).select_related('product')
         return OrderItem.objects.none()
 
 
@@ -383,9 +488,14 @@ class OrderItemAddView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         order = get_object_or_404(Order, pk=self.kwargs['order_pk'])
         form.instance.order = order
+        form.instance.unit_price = form.instance.product.price
         response = super().form_valid(form)
+        refresh_item_counts([order.pk])
         messages.success(self.request, 'পণ্য সফলভাবে যোগ করা হয়েছে।')
         return response
+    
+    def get_success_url(self):
+        return reverse_lazy('orders:order_item_list', kwargs={'order_pk': self.kwargs['order_pk']})
 
 
 class OrderItemEditView(LoginRequiredMixin, UpdateView):
@@ -398,6 +508,16 @@ class OrderItemEditView(LoginRequiredMixin, UpdateView):
     
     def get_queryset(self):
         return OrderItem.objects.filter(order__pk=self.kwargs['order_pk'])
+    
+    def form_valid(self, form):
+        if 'product' in form.changed_data:
+            form.instance.unit_price = form.instance.product.price
+        response = super().form_valid(form)
+        refresh_item_counts([self.kwargs['order_pk']])
+        return response
+    
+    def get_success_url(self):
+        return reverse_lazy('orders:order_item_list', kwargs={'order_pk': self.kwargs['order_pk']})
 
 
 class OrderItemDeleteView(LoginRequiredMixin, DeleteView):
@@ -410,6 +530,11 @@ class OrderItemDeleteView(LoginRequiredMixin, DeleteView):
     def get_queryset(self):
         return OrderItem.objects.filter(order__pk=self.kwargs['order_pk'])
     
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        refresh_item_counts([self.kwargs['order_pk']])
+        return response
+    
     def get_success_url(self):
         return reverse_lazy('orders:order_item_list', kwargs={'order_pk': self.kwargs['order_pk']})
 
@@ -445,22 +570,20 @@ class OrderStatusUpdateView(LoginRequiredMixin, TemplateView):
         new_status = request.POST.get('status')
         
         try:
-            order = Order.objects.get(id=order_id)
-            old_status = order.status
-            order.status = new_status
-            order.save()
-            
-            # Create status history
-            OrderStatusHistory.objects.create(
-                order=order,
-                status=new_status,
-                notes=f'Status changed from {old_status} to {new_status}',
-                created_by=request.user
-            )
+            order = Order.objects.only('id', 'order_number', 'status').get(id=order_id)
+            if new_status == 'cancelled':
+                # Also puts the stock back and refunds paid orders
+                cancel_order(order, user=request.user)
+            else:
+                transition(order, new_status, user=request.user)
             
             messages.success(request, f'অর্ডার #{order.order_number} এর স্ট্যাটাস সফলভাবে আপডেট করা হয়েছে।')
         except Order.DoesNotExist:
             messages.error(request, 'অর্ডার খুঁজে পাওয়া যায়নি।')
+        except TransitionError:
+            messages.error(request, 'এই স্ট্যাটাস পরিবর্তন অনুমোদিত নয়।')
+        except TransitionConflict:
+            messages.error(request, 'অর্ডারটি ইতিমধ্যে অন্য কেউ পরিবর্তন করেছে। দয়া করে আবার দেখুন।')
         except Exception as e:
             messages.error(request, f'একটি সমস্যা হয়েছে: {str(e)}')
         
@@ -485,18 +608,15 @@ def admin_update_order_status(request):
         if not order_id or not new_status:
             return JsonResponse({'success': False, 'message': 'Order ID and status required'})
         
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('customer').get(id=order_id)
         old_status = order.status
-        order.status = new_status
-        order.save()
-        
-        # Create status history
-        OrderStatusHistory.objects.create(
-            order=order,
-            status=new_status,
-            notes=f'Status changed from {old_status} to {new_status} by admin',
-            created_by=request.user
-        )
+        if new_status == 'cancelled':
+            cancel_order(order, user=request.user, notes=f'Cancelled from {old_status} by admin')
+        else:
+            transition(
+                order, new_status, user=request.user,
+                notes=f'Status changed from {old_status} to {new_status} by admin'
+            )
         
         return JsonResponse({
             'success': True, 
@@ -506,7 +626,7 @@ def admin_update_order_status(request):
                 'order_number': order.order_number,
                 'status': order.status,
                 'status_display': order.get_status_display(),
-                'customer_name': order.customer.get_full_name() or order.customer.username,
+                'customer_name': order.customer_name,
                 'total_amount': str(order.total_amount),
                 'created_at': order.created_at.strftime('%d %b %Y, %I:%M %p')
             }
@@ -514,10 +634,52 @@ def admin_update_order_status(request):
         
     except Order.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Order not found'})
+    except TransitionError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except TransitionConflict as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Order was changed by someone else; it is now {e.current}',
+            'current_status': e.current
+        }, status=409)
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def bulk_update_order_status(request):
+    """
+    API endpoint for dispatchers to move many orders to one status (AJAX)
+    """
+    if not request.user.is_authenticated or not request.user.is_admin:
+        return JsonResponse({'success': False, 'message': 'Admin access required'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        order_ids = data.get('order_ids') or []
+        new_status = data.get('status')
+        
+        if not order_ids or not new_status:
+            return JsonResponse({'success': False, 'message': 'Order IDs and status required'}, status=400)
+        
+        results = bulk_transition(order_ids, new_status, user=request.user, notes=data.get('notes', ''))
+    except TransitionError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'message': 'Invalid order IDs'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Error: {str(e)}'}, status=500)
+    
+    updated = sum(1 for result in results if result['success'])
+    return JsonResponse({
+        'success': True,
+        'message': f'{updated} of {len(results)} orders moved to {new_status}',
+        'updated': updated,
+        'results': results
+    })
+
+
 # API View for Dashboard Data
 @require_http_methods(["GET"])
 def dashboard_data_api(request):
@@ -528,59 +690,8 @@ def dashboard_data_api(request):
         return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
     
     try:
-        if request.user.is_admin:
-            # Admin dashboard data
-            today = timezone.now().date()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-            
-            # Recent orders for admin
-            recent_orders = Order.objects.all().order_by('-created_at')[:10]
-            
-            data = {
-                'user_type': 'admin',
-                'total_orders': Order.objects.count(),
-                'pending_orders': Order.objects.filter(status='pending').count(),
-                'confirmed_orders': Order.objects.filter(status='confirmed').count(),
-                'completed_orders': Order.objects.filter(status='delivered').count(),
-                'recent_orders': [
-                    {
-                        'id': order.id,
-                        'order_number': order.order_number,
-                        'customer_name': order.customer.get_full_name() or order.customer.username,
-                        'status': order.status,
-                        'status_display': order.get_status_display(),
-                        'total_amount': str(order.total_amount),
-                        'created_at': order.created_at.strftime('%d %b %Y, %I:%M %p')
-                    } for order in recent_orders
-                ]
-            }
-        else:
-            # User dashboard data
-            user_orders = Order.objects.filter(customer=request.user)
-            recent_orders = user_orders.order_by('-created_at')[:5]
-            
-            data = {
-                'user_type': 'user',
-                'total_orders': user_orders.count(),
-                'pending_orders': user_orders.filter(status='pending').count(),
-                'completed_orders': user_orders.filter(status='delivered').count(),
-                'cancelled_orders': user_orders.filter(status='cancelled').count(),
-                'total_spent': str(Payment.objects.filter(
-                    order__customer=request.user,
-                    status='completed'
-                ).aggregate(total=Sum('amount'))['total'] or 0),
-                'recent_orders': [
-                    {
-                        'id': order.id,
-                        'order_number': order.order_number,
-                        'status': order.status,
-                        'status_display': order.get_status_display(),
-                        'total_amount': str(order.total_amount),
-                        'created_at': order.created_at.strftime('%d %b %Y, %I:%M %p')
-                    } for order in recent_orders
-                ]
-            }
+        # Figures, recent orders and unread count, as the event stream sends them
+        data = dashboard_state(request.user)
         
         return JsonResponse({'success': True, 'data': data})
         
@@ -591,121 +702,184 @@ def dashboard_data_api(request):
 # Real-time Order Creation API
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent('create_order')
 def create_order_from_cart(request):
     """
-    Create order from cart data (AJAX endpoint)
+    Create order from cart data (AJAX endpoint).
+
+    Clients should send an ``Idempotency-Key`` header so a retried request
+    returns the first order instead of placing another one.
     """
-    print(f"DEBUG: User authenticated: {request.user.is_authenticated}")
-    print(f"DEBUG: User: {request.user}")
-    
     if not request.user.is_authenticated:
         return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
     
     try:
         data = json.loads(request.body)
         cart_items = data.get('cart_items', [])
-        
-        print(f"DEBUG: Cart items: {cart_items}")
-        print(f"DEBUG: Data: {data}")
+        cart = snapshot = None
+        if not cart_items:
+            # No lines sent: order the server cart
+            cart = Cart.for_request(request)
+            cart_items = cart.items()
+            snapshot = cart.fresh_snapshot()
         
         if not cart_items:
             return JsonResponse({'success': False, 'message': 'Cart is empty'})
         
-        # Create order
-        order = Order.objects.create(
-            order_number=f'ORD{uuid.uuid4().hex[:8].upper()}',
+        order = place_order(
             customer=request.user,
+            cart_items=cart_items,
             delivery_address=data.get('delivery_address', ''),
             delivery_city=data.get('delivery_city', 'ঢাকা'),
-            total_amount=Decimal('0.00'),
-            status='pending',
-            special_instructions=data.get('special_instructions', '')
-        )
-        
-        total_amount = Decimal('0.00')
-        out_of_stock_items = []
-        
-        # First pass: Check stock availability
-        for item in cart_items:
-            try:
-                product = ProductService.objects.get(id=item['id'])
-                quantity = int(item['quantity'])
-                
-                if not product.is_in_stock(quantity):
-                    out_of_stock_items.append({
-                        'name': product.name,
-                        'requested': quantity,
-                        'available': product.stock_quantity,
-                        'status': product.get_stock_status()
-                    })
-            except ProductService.DoesNotExist:
-                print(f"DEBUG: Product not found with ID: {item.get('id')}")
-                return JsonResponse({'success': False, 'message': f'Product {item.get("id")} not found'})
-        
-        # If any items are out of stock, return error
-        if out_of_stock_items:
-            error_message = "নিম্নলিখিত পণ্যগুলি স্টকে নেই:\n"
-            for item in out_of_stock_items:
-                error_message += f"• {item['name']}: {item['status']}\n"
-            return JsonResponse({
-                'success': False, 
-                'message': error_message,
-                'out_of_stock_items': out_of_stock_items
-            })
-        
-        # Second pass: Create order items and reduce stock
-        for item in cart_items:
-            try:
-                product = ProductService.objects.get(id=item['id'])
-                quantity = int(item['quantity'])
-                unit_price = product.price
-                item_total = unit_price * quantity
-                
-                # Create order item
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    unit_price=unit_price,
-                    total_price=item_total
-                )
-                
-                # Reduce stock
-                product.reduce_stock(quantity)
-                
-                total_amount += item_total
-                
-            except ProductService.DoesNotExist:
-                print(f"DEBUG: Product not found with ID: {item.get('id')}")
-                continue
-            except Exception as e:
-                print(f"DEBUG: Error creating order item: {e}")
-                continue
-        
-        # Update order total
-        order.total_amount = total_amount
-        order.save()
-        
-        # Create status history
-        OrderStatusHistory.objects.create(
-            order=order,
-            status='pending',
-            notes='Order created from cart',
-            created_by=request.user
+            special_instructions=data.get('special_instructions', ''),
+            snapshot=snapshot
         )
+        if cart is not None:
+            cart.clear()
         
         return JsonResponse({
             'success': True,
             'message': 'Order created successfully',
             'order_id': order.id,
             'order_number': order.order_number,
-            'total_amount': str(total_amount)
+            'total_amount': str(order.total_amount)
         })
         
+    except CheckoutError as e:
+        response = {'success': False, 'message': e.message}
+        if e.out_of_stock_items:
+            response['out_of_stock_items'] = e.out_of_stock_items
+        return JsonResponse(response)
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
 
+@require_http_methods(["GET"])
+def order_timeline_api(request, pk):
+    """
+    One page of an order's timeline: status history, delivery updates, payment logs and refunds
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
+    
+    orders = Order.objects.filter(pk=pk)
+    archived = ArchivedOrder.objects.filter(pk=pk)
+    if not (request.user.is_staff or request.user.is_superuser):
+        orders = orders.filter(customer=request.user)
+        archived = archived.filter(customer=request.user)
+    order = orders.only('pk').first() or archived.only('pk').first()
+    if order is None:
+        return JsonResponse({'success': False, 'message': 'Order not found'}, status=404)
+    
+    page = timeline_page(order_timeline(order), request.GET.get('page'), request.GET.get('per_page'))
+    return JsonResponse({
+        'success': True,
+        'order_id': order.pk,
+        'events': page.object_list,
+        'page': page.number,
+        'pages': page.paginator.num_pages,
+        'total': page.paginator.count,
+        'has_next': page.has_next(),
+    })
+
+
+@require_http_methods(["GET"])
+def cart_api(request):
+    """
+    The current server cart (AJAX endpoint)
+    """
+    return JsonResponse({'success': True, 'cart': Cart.for_request(request).detail()})
+
+
+@require_http_methods(["POST"])
+def cart_add(request):
+    """
+    Add a product to the server cart (AJAX endpoint)
+    """
+    try:
+        data = json.loads(request.body)
+        cart = Cart.for_request(request)
+        line = cart.add(data.get('product_id'), data.get('quantity', 1))
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Added to cart',
+            'quantity': line[0],
+            'cart': cart.summary()
+        })
+        
+    except CheckoutError as e:
+        return JsonResponse({'success': False, 'message': e.message})
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+
+@require_http_methods(["POST"])
+def cart_remove(request):
+    """
+    Remove a product, or some of its quantity, from the server cart (AJAX endpoint)
+    """
+    try:
+        data = json.loads(request.body)
+        cart = Cart.for_request(request)
+        line = cart.remove(data.get('product_id'), data.get('quantity'))
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Removed from cart',
+            'quantity': line[0] if line else 0,
+            'cart': cart.summary()
+        })
+        
+    except CheckoutError as e:
+        return JsonResponse({'success': False, 'message': e.message})
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+
+@require_http_methods(["POST"])
+def reserve_cart_stock(request):
+    """
+    Hold stock for every line of the cart for a limited time (AJAX endpoint)
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
+    
+    try:
+        data = json.loads(request.body)
+        expires_at = reserve_cart(request.user, data.get('cart_items', []))
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Stock reserved',
+            'expires_at': expires_at.isoformat()
+        })
+        
+    except CheckoutError as e:
+        response = {'success': False, 'message': e.message}
+        if e.out_of_stock_items:
+            response['out_of_stock_items'] = e.out_of_stock_items
+        return JsonResponse(response)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+
+
+@require_http_methods(["POST"])
+def release_cart_stock(request):
+    """
+    Release all stock held by the current user's cart (AJAX endpoint)
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
+    
+    released = release_customer_holds(request.user)
+    return JsonResponse({
+        'success': True,
+        'message': 'Stock released',
+        'released_items': len(released)
+    })
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def add_product(request):
@@ -726,6 +900,7 @@ def add_product(request):
             stock_quantity=int(data.get('stock_quantity', 0)),
             is_available=True
         )
+        catalog.catalog_changed()
         
         return JsonResponse({
             'success': True,
@@ -755,7 +930,14 @@ def update_product(request, product_id):
         product.price = Decimal(data.get('price', str(product.price)))
         product.category = data.get('category', product.category)
         product.stock_quantity = int(data.get('stock_quantity', product.stock_quantity))
-        product.save()
+        # Only write what was sent so concurrent stock and hold changes survive
+        fields = [f for f in ('name', 'description', 'price', 'category', 'stock_quantity') if f in data]
+        product.save(update_fields=fields + ['updated_at'])
+        
+        # The row's stock_quantity is only a snapshot of the shards
+        if product.stock_shards and 'stock_quantity' in data:
+            set_stock(product, product.stock_quantity)
+        catalog.catalog_changed()
         
         return JsonResponse({
             'success': True,
@@ -780,6 +962,7 @@ def delete_product(request, product_id):
     try:
         product = ProductService.objects.get(id=product_id)
         product.delete()
+        catalog.catalog_changed()
         
         return JsonResponse({
             'success': True,
@@ -789,4 +972,50 @@ def delete_product(request, product_id):
     except ProductService.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Product not found'}, status=404)
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def import_products_api(request):
+    """
+    Upsert products from an uploaded CSV or JSONL feed (Admin only)
+    """
+    if not request.user.is_authenticated or not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'success': False, 'message': 'Admin access required'}, status=403)
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'success': False, 'message': 'Upload the feed as "file"'}, status=400)
+    fmt = request.GET.get('format') or product_feed.feed_format(upload.name)
+    if fmt not in product_feed.FORMATS:
+        return JsonResponse({'success': False, 'message': f'Unsupported format {fmt}'}, status=400)
+    
+    try:
+        report = product_feed.import_products(product_feed.iter_rows(upload.file, fmt))
+    except UnicodeDecodeError:
+        return JsonResponse({'success': False, 'message': 'Feed must be UTF-8 encoded'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+    
+    return JsonResponse({'success': True, 'message': 'Import finished', **report.as_dict()})
+
+
+@require_http_methods(["GET"])
+def export_products_api(request):
+    """
+    Stream the whole catalog as CSV or JSONL (Admin only)
+    """
+    if not request.user.is_authenticated or not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'success': False, 'message': 'Admin access required'}, status=403)
+    
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in product_feed.FORMATS:
+        return JsonResponse({'success': False, 'message': f'Unsupported format {fmt}'}, status=400)
+    
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        product_feed.export_products(fmt), content_type=f'{content_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
+from orders.admin import ArchivedOrderRowsMixin
 from .models import Payment, PaymentMethod, PaymentTransaction, Refund
 
 
@@ -12,11 +13,11 @@ class PaymentTransactionInline(admin.TabularInline):
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Payment Admin
     """
-    list_display = ('transaction_id', 'order', 'payment_method', 'amount', 'status', 'created_at')
+    list_display = ('transaction_id', 'order_number', 'payment_method', 'amount', 'status', 'created_at')
     list_filter = ('payment_method', 'status', 'created_at')
     search_fields = ('transaction_id', 'order__order_number', 'payment_reference')
     readonly_fields = ('transaction_id', 'created_at', 'updated_at', 'paid_at')
@@ -37,7 +38,7 @@ class PaymentAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('order')
+        return super().get_queryset(request).prefetch_related('order')
 
 
 @admin.register(PaymentMethod)
@@ -69,24 +70,26 @@ class PaymentMethodAdmin(admin.ModelAdmin):
 
 
 @admin.register(PaymentTransaction)
-class PaymentTransactionAdmin(admin.ModelAdmin):
+class PaymentTransactionAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Payment Transaction Admin
     """
+    order_field = 'payment__order'
     list_display = ('payment', 'action', 'status', 'timestamp')
     list_filter = ('action', 'status', 'timestamp')
     search_fields = ('payment__transaction_id', 'payment__order__order_number')
     readonly_fields = ('timestamp',)
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('payment__order')
+        return super().get_queryset(request).select_related('payment').prefetch_related('payment__order')
 
 
 @admin.register(Refund)
-class RefundAdmin(admin.ModelAdmin):
+class RefundAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Refund Admin
     """
+    order_field = 'payment__order'
     list_display = ('payment', 'amount', 'status', 'reason', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('payment__transaction_id', 'payment__order__order_number', 'refund_reference')
@@ -106,4 +109,4 @@ class RefundAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('payment__order', 'processed_by')
\ No newline at end of file
+        return super().get_queryset(request).select_related('payment', 'processed_by').prefetch_related('payment__order')
\ No newline at end of file
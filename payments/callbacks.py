@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard import events, rollups
+from orders.summary import refresh_payment_states
+
+from .models import Payment, PaymentTransaction
+
+# Gateway status values -> Payment.status
+OUTCOMES = {
+    'success': 'completed',
+    'completed': 'completed',
+    'failure': 'failed',
+    'failed': 'failed',
+    'cancel': 'cancelled',
+    'cancelled': 'cancelled',
+    'aborted': 'cancelled',
+}
+
+# A callback may only settle a payment that is still open
+OPEN_STATUSES = ('pending', 'processing')
+
+SIGNATURE_PARAM = 'signature'
+
+
+class CallbackError(Exception):
+    """
+    Raised when a gateway callback cannot be applied
+    """
+
+
+class SignatureError(CallbackError):
+    """
+    Raised when a callback was not signed by the gateway
+    """
+
+
+def sign(secret, params):
+    """
+    HMAC-SHA256 of the callback parameters, sorted by name, with the gateway's shared secret
+    """
+    message = '&'.join(f'{name}={value}' for name, value in sorted(params.items()) if name != SIGNATURE_PARAM)
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def verify_signature(method, params):
+    """
+    Raise SignatureError unless ``params`` carry a valid signature of the ``method`` gateway
+    """
+    secret = getattr(settings, 'PAYMENT_CALLBACK_SECRETS', {}).get(method)
+    if not secret:
+        raise SignatureError(f'{method} callbacks are not configured')
+    if not hmac.compare_digest(sign(secret, params), params.get(SIGNATURE_PARAM, '')):
+        raise SignatureError('Invalid callback signature')
+
+
+def apply_callback(method, reference, outcome, data=None):
+    """
+    Settle the ``method`` payment with gateway reference ``reference``.
+
+    The status change is a conditional UPDATE on the open statuses, so a
+    callback delivered twice (browser redirect plus server notification, or a
+    gateway retry) settles the payment once; every delivery is still logged
+    as a ``PaymentTransaction``. A success must report the payment's own
+    amount. Callers verify the gateway's signature first. Returns the
+    payment and whether it changed.
+    """
+    status = OUTCOMES.get((outcome or '').strip().lower())
+    if status is None:
+        raise CallbackError(f'Unknown payment status {outcome!r}')
+    payment = Payment.objects.filter(payment_method=method, payment_reference=reference).first()
+    if payment is None:
+        raise CallbackError(f'No {method} payment with reference {reference!r}')
+    if status == 'completed':
+        try:
+            amount = Decimal((data or {}).get('amount', ''))
+        except InvalidOperation:
+            raise CallbackError('Callback amount is missing')
+        if amount != payment.amount:
+            raise CallbackError(f'Callback amount {amount} does not match the payment')
+
+    now = timezone.now()
+    fields = {'status': status, 'updated_at': now}
+    if status == 'completed':
+        fields['paid_at'] = now
+    with transaction.atomic():
+        changed = bool(
+            Payment.objects.filter(pk=payment.pk, status__in=OPEN_STATUSES).update(**fields)
+        )
+        if changed:
+            for field, value in fields.items():
+                setattr(payment, field, value)
+            refresh_payment_states([payment.order_id])
+            rollups.touch('revenue', payment.created_at)
+            events.payments_changed([payment.pk])
+        else:
+            payment.refresh_from_db(fields=['status', 'paid_at', 'updated_at'])
+        PaymentTransaction.objects.create(
+            payment=payment,
+            action=f'{method}_callback',
+            status=status,
+            message='' if changed else f'Ignored, payment already {payment.status}',
+            response_data=data
+        )
+    return payment, changed
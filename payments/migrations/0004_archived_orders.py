@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_saved_carts'),
+        ('payments', '0003_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='order',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='orders.order', verbose_name='অর্ডার'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from orders.archive import order_number_of
 from orders.models import Order
 
 User = get_user_model()
@@ -32,6 +33,8 @@ class Payment(models.Model):
     order = models.ForeignKey(
         Order,
         on_delete=models.CASCADE,
+        # The archive moves finished orders out from under this row
+        db_constraint=False,
         related_name='payments',
         verbose_name=_('অর্ডার')
     )
@@ -97,9 +100,14 @@ class Payment(models.Model):
         verbose_name = _('পেমেন্ট')
         verbose_name_plural = _('পেমেন্ট')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+            models.Index(fields=['order', 'status'], name='payment_order_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='payment_created_idx'),
+        ]
     
     def __str__(self):
-        return f"পেমেন্ট #{self.id} - অর্ডার #{self.order.order_number} - ৳{self.amount}"
+        return f"পেমেন্ট #{self.id} - অর্ডার #{order_number_of(self)} - ৳{self.amount}"
     
     def save(self, *args, **kwargs):
         if not self.transaction_id:
@@ -222,6 +230,9 @@ class PaymentTransaction(models.Model):
         verbose_name = _('পেমেন্ট লেনদেন')
         verbose_name_plural = _('পেমেন্ট লেনদেন')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['payment', '-timestamp', '-id'], name='transaction_payment_idx'),
+        ]
     
     def __str__(self):
         return f"{self.payment} - {self.action} - {self.timestamp}"
@@ -294,6 +305,9 @@ class Refund(models.Model):
         verbose_name = _('রিফান্ড')
         verbose_name_plural = _('রিফান্ড')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['payment', '-created_at', '-id'], name='refund_payment_idx'),
+        ]
     
     def __str__(self):
         return f"রিফান্ড #{self.id} - ৳{self.amount} - {self.get_status_display()}"
\ No newline at end of file
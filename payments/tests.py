@@ -1,3 +1,109 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from orders.models import Order
+from orders.tests import QueryPlanMixin
+from .callbacks import sign
+from .models import Payment, PaymentTransaction
+from .views import PaymentListView
+
+User = get_user_model()
+
+
+class PaymentQueryPlanTests(QueryPlanMixin, TestCase):
+    """
+    Payment list and revenue queries must stay on their indexes
+    """
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000051'
+        )
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', phone_number='01700000052', user_type='admin'
+        )
+
+    def test_admin_payment_list(self):
+        self.assertIndexed(
+            self.list_view_sql(PaymentListView, self.admin),
+            ['payments_payment'], index='payment_created_idx'
+        )
+
+    def test_customer_payment_list(self):
+        # One customer's payments are found through their orders and sorted in memory
+        self.assertIndexed(
+            self.list_view_sql(PaymentListView, self.customer),
+            ['payments_payment', 'orders_order'], allow_sort=True
+        )
+
+    def test_revenue_by_status(self):
+        with self.capture_sql() as statements:
+            Payment.objects.filter(status='completed').aggregate(total=Sum('amount'))
+            Payment.objects.filter(
+                order__customer=self.customer, status='completed'
+            ).aggregate(total=Sum('amount'))
+        self.assertIndexed(statements, ['payments_payment', 'orders_order'])
+
+
+@override_settings(PAYMENT_CALLBACK_SECRETS={'bkash': 'bkash-secret'})
+class GatewayCallbackTests(TestCase):
+    """
+    Only signed gateway callbacks settle a payment, and repeats settle it once
+    """
+    def setUp(self):
+        customer = User.objects.create_user(
+            username='customer', password='pass', phone_number='01700000053'
+        )
+        order = Order.objects.create(
+            customer=customer, delivery_address='Dhaka', delivery_city='ঢাকা', total_amount=500
+        )
+        self.payment = Payment.objects.create(
+            order=order, payment_method='bkash', amount=500, payment_reference='BK123'
+        )
+
+    def callback(self, status='success', reference='BK123', amount='500.00', secret='bkash-secret'):
+        params = {'paymentID': reference, 'status': status, 'amount': amount}
+        params['signature'] = sign(secret, params)
+        return self.client.post(reverse('payments:bkash_callback'), params)
+
+    def test_success_completes_payment(self):
+        response = self.callback()
+        self.assertTrue(response.json()['success'])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertIsNotNone(self.payment.paid_at)
+
+    def test_retry_is_replayed(self):
+        first = self.callback()
+        retry = self.callback()
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(PaymentTransaction.objects.filter(payment=self.payment).count(), 1)
+
+    def test_late_failure_does_not_reopen_payment(self):
+        self.callback()
+        response = self.callback(status='failure')
+        self.assertEqual(response.json()['message'], 'Payment already settled')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+
+    def test_unknown_reference(self):
+        self.assertEqual(self.callback(reference='NOPE').status_code, 400)
+
+    def test_forged_callbacks_are_refused(self):
+        url = reverse('payments:bkash_callback')
+        self.assertEqual(self.client.get(url, {'paymentID': 'BK123', 'status': 'success'}).status_code, 405)
+        self.assertEqual(self.client.post(url, {'paymentID': 'BK123', 'status': 'success'}).status_code, 403)
+        self.assertEqual(self.callback(secret='guessed').status_code, 403)
+        with override_settings(PAYMENT_CALLBACK_SECRETS={}):
+            self.assertEqual(self.callback().status_code, 403)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        # A forged attempt leaves nothing behind for the genuine callback to replay
+        self.assertEqual(self.callback().json()['status'], 'completed')
+
+    def test_success_must_report_the_payment_amount(self):
+        self.assertEqual(self.callback(amount='1.00').status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
@@ -1,12 +1,19 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from django.http import JsonResponse
 from django.contrib import messages
 from django.urls import reverse_lazy
+from orders.archive import customer_orders_q
+from orders.idempotency import idempotent
+from orders.pagination import KeysetPaginationMixin
+from .callbacks import CallbackError, SignatureError, apply_callback, verify_signature
 from .models import Payment, PaymentMethod, PaymentTransaction, Refund
 
-class PaymentListView(LoginRequiredMixin, ListView):
+class PaymentListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Payment list view
     """
@@ -17,9 +24,9 @@ class PaymentListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         if self.request.user.is_admin:
-            return Payment.objects.all().order_by('-created_at')
+            return Payment.objects.prefetch_related('order__customer').order_by('-created_at')
         else:
-            return Payment.objects.filter(order__customer=self.request.user).order_by('-created_at')
+            return Payment.objects.filter(customer_orders_q(customer=self.request.user)).prefetch_related('order').order_by('-created_at')
 
 
 class PaymentDetailView(LoginRequiredMixin, DetailView):
@@ -104,25 +111,78 @@ class CardPaymentView(LoginRequiredMixin, TemplateView):
 
 
 # Payment callbacks
-class BkashCallbackView(TemplateView):
+@method_decorator(csrf_exempt, name='dispatch')
+class GatewayCallbackView(View):
+    """
+    Settle a payment from the gateway's signed server notification.
+
+    Only POSTs signed with the gateway's shared secret are accepted; the
+    customer's browser redirect cannot settle anything. Gateways retry on
+    timeouts, so each (reference, status) pair is handled once and every
+    repeat gets the first response replayed.
+    """
+    payment_method = None
+    reference_param = None
+    http_method_names = ['post']
+
+    def callback_params(self, request):
+        params = request.POST
+        return params.get(self.reference_param, '').strip(), params.get('status', '').strip(), params
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method.lower() not in self.http_method_names:
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        # Checked before the idempotency key is claimed, so a forged
+        # callback cannot store the response a genuine one would replay
+        try:
+            verify_signature(self.payment_method, request.POST.dict())
+        except SignatureError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=403)
+        reference, outcome, _ = self.callback_params(request)
+        key = f'{reference}:{outcome.lower()}' if reference else ''
+        handler = idempotent(
+            f'{self.payment_method}_callback', key_func=lambda request: key, fingerprint=None
+        )(super().dispatch)
+        return handler(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        reference, outcome, params = self.callback_params(request)
+        if not reference:
+            return JsonResponse({'success': False, 'message': f'{self.reference_param} is required'}, status=400)
+        try:
+            payment, changed = apply_callback(self.payment_method, reference, outcome, params.dict())
+        except CallbackError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        return JsonResponse({
+            'success': True,
+            'message': 'Payment updated' if changed else 'Payment already settled',
+            'payment_id': payment.id,
+            'status': payment.status
+        })
+
+
+class BkashCallbackView(GatewayCallbackView):
     """
     bKash callback view
     """
-    template_name = 'payments/bkash_callback.html'
+    payment_method = 'bkash'
+    reference_param = 'paymentID'
 
 
-class NagadCallbackView(TemplateView):
+class NagadCallbackView(GatewayCallbackView):
     """
     Nagad callback view
     """
-    template_name = 'payments/nagad_callback.html'
+    payment_method = 'nagad'
+    reference_param = 'payment_ref_id'
 
 
-class RocketCallbackView(TemplateView):
+class RocketCallbackView(GatewayCallbackView):
     """
     Rocket callback view
     """
-    template_name = 'payments/rocket_callback.html'
+    payment_method = 'rocket'
+    reference_param = 'transaction_id'
 
 
 # Payment processing
@@ -159,9 +219,11 @@ class RefundListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         if self.request.user.is_admin:
-            return Refund.objects.all().order_by('-created_at')
+            return Refund.objects.select_related('payment').prefetch_related('payment__order').order_by('-created_at')
         else:
-            return Refund.objects.filter(payment__order__customer=self.request.user).order_by('-created_at')
+            return Refund.objects.filter(
+                customer_orders_q('payment__order', customer=self.request.user)
+            ).select_related('payment').prefetch_related('payment__order').order_by('-created_at')
 
 
 class RefundDetailView(LoginRequiredMixin, DetailView):
@@ -209,7 +271,7 @@ class PaymentHistoryView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        return Payment.objects.filter(order__customer=self.request.user).order_by('-created_at')
+        return Payment.objects.filter(customer_orders_q(customer=self.request.user)).prefetch_related('order').order_by('-created_at')
 
 
 class PaymentHistoryDetailView(LoginRequiredMixin, DetailView):
@@ -221,7 +283,7 @@ class PaymentHistoryDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'payment'
     
     def get_queryset(self):
-        return Payment.objects.filter(order__customer=self.request.user)
+        return Payment.objects.filter(customer_orders_q(customer=self.request.user))
 
 
 # Admin views
@@ -238,7 +300,7 @@ class AdminPaymentListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return self.request.user.is_admin
     
     def get_queryset(self):
-        return Payment.objects.all().order_by('-created_at')
+        return Payment.objects.prefetch_related('order__customer').order_by('-created_at')
 
 
 class AdminPaymentDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
@@ -266,7 +328,7 @@ class AdminRefundListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return self.request.user.is_admin
     
     def get_queryset(self):
-        return Refund.objects.all().order_by('-created_at')
+        return Refund.objects.select_related('payment').prefetch_related('payment__order').order_by('-created_at')
 
 
 class AdminRefundDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
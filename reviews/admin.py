@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
+from orders.admin import ArchivedOrderRowsMixin
 from .models import Review, ReviewImage, ReviewHelpful, ReviewResponse, ReviewReport
 
 
@@ -11,11 +12,11 @@ class ReviewImageInline(admin.TabularInline):
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(ArchivedOrderRowsMixin, admin.ModelAdmin):
     """
     Review Admin
     """
-    list_display = ('customer', 'product', 'order', 'rating', 'is_verified', 'is_public', 'helpful_count', 'created_at')
+    list_display = ('customer', 'product', 'order_number', 'rating', 'is_verified', 'is_public', 'helpful_count', 'created_at')
     list_filter = ('rating', 'is_verified', 'is_public', 'created_at', 'product__category')
     search_fields = ('customer__username', 'customer__first_name', 'product__name', 'order__order_number')
     readonly_fields = ('helpful_count', 'created_at', 'updated_at')
@@ -35,7 +36,7 @@ class ReviewAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('customer', 'order', 'product')
+        return super().get_queryset(request).select_related('customer', 'product').prefetch_related('order')
 
 
 @admin.register(ReviewImage)
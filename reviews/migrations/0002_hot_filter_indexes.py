@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_hot_filter_indexes'),
+        ('reviews', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-created_at'], name='review_public_created_idx'),
+        ),
+    ]
@@ -30,6 +30,8 @@ class Review(models.Model):
     order = models.ForeignKey(
         Order,
         on_delete=models.CASCADE,
+        # The archive moves finished orders out from under this row
+        db_constraint=False,
         related_name='reviews',
         verbose_name=_('অর্ডার')
     )
@@ -89,6 +91,9 @@ class Review(models.Model):
         verbose_name = _('রিভিউ')
         verbose_name_plural = _('রিভিউ')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(is_public=True), name='review_public_created_idx'),
+        ]
         unique_together = ['customer', 'order', 'product']
     
     def __str__(self):
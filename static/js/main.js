@@ -122,13 +122,14 @@ $(document).ready(function() {
         }, 2000);
     });
 
-    // Real-time notifications
-    if (typeof(EventSource) !== "undefined") {
-        var source = new EventSource("/notifications/stream/");
-        source.onmessage = function(event) {
+    // Real-time notifications; pages add their own listeners to window.eventStream
+    var streamUrl = document.body.dataset.eventStream;
+    if (streamUrl && typeof(EventSource) !== "undefined") {
+        window.eventStream = new EventSource(streamUrl);
+        window.eventStream.addEventListener('notification', function(event) {
             var notification = JSON.parse(event.data);
             showNotification(notification.title, notification.message, notification.type);
-        };
+        });
     }
 
     // Location tracking for delivery agents
@@ -293,6 +293,8 @@ class ToggleAvailabilityView(LoginRequiredMixin, TemplateView):
     """
     Toggle delivery agent availability
     """
+    http_method_names = ['post']
+
     def post(self, request, *args, **kwargs):
         delivery_agent = User.objects.get(pk=kwargs['pk'], user_type='delivery_agent')
         try: